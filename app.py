@@ -1,18 +1,31 @@
-from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 import os
 import glob
+import json
 import asyncio
-import re
-import subprocess
-from gwdatafind import find_types
-from gwpy.detector import ChannelList
 import requests
 from core.gravfetch import download_osdf, download_nds
-from core.omicron import run_omicron, generate_fin_ffl
-import zipfile
+from core.omicron import (OMICRON_OUT, data_blocks, ffl_segments, ffl_span, filter_triggers, generate_fin_ffl,
+                          run_config as pointed_config, run_directory, run_omicron_async, run_omicron_parallel_async)
+from core.omicron_config import OmicronConfig
+from core.omicron_ledger import run_omicron_incremental_async
+from core.omicron_cache import get_result_cache, superset_config
+from core.omicron_sweep import expand_grid, run_omicron_sweep_async
+from core.trigger_store import StalePartition, get_trigger_store
+from core.omiviz import get_omiviz
+from core.datafind import get_client
+from core.nds_catalog import get_catalog
+from core.availability import get_availability_index
+from core.singleflight import AsyncSingleFlight
+from core.executor import run_blocking
+from core.jobs import JobManager
+from core.jobstore import SQLiteJobStore
+from core.resources import summarize
+from core.fileserve import RangeFileResponse
+from core.archive import ARCHIVE_DIR, ARCHIVE_FORMATS, ArchiveBuilder, prune_archives, stream_archive
 
 app = FastAPI(title="GWcloud - GWeasy Web")
 
@@ -22,9 +35,24 @@ templates = Jinja2Templates(directory="templates")
 # Uploads directory
 UPLOADS = "./uploads"
 os.makedirs(UPLOADS, exist_ok=True)
+GWF_OUT = os.path.join(UPLOADS, "GWFout")
 
-# Global log for live streaming
-current_job_log: list[str] = []
+# Omicron settings edited from the web page; runs take a snapshot at submission
+CONFIG_PATH = "config.txt"
+
+# Shared in-process GWDataFind client
+datafind = get_client()
+
+# On-disk NDS channel catalog (refreshed in the background)
+nds_catalog = get_catalog()
+nds_availability = get_availability_index()
+
+# Identical concurrent metadata lookups share one upstream call
+metadata_flight = AsyncSingleFlight()
+
+# Downloads and Omicron runs, each with its own log, status and artifacts.
+# State lives in SQLite so any gunicorn worker can stream or cancel any job.
+jobs = JobManager(store=SQLiteJobStore())
 
 # === Pages ===
 @app.get("/", response_class=HTMLResponse)
@@ -43,38 +71,341 @@ async def omicron_page(request: Request):
 @app.post("/api/gravfetch/nds")
 async def api_nds(channel: str, segments: str):
     segs = [s.strip() for s in segments.split(",") if s.strip()]
-    def generator():
-        for line in download_nds(channel, segs):
-            yield line
-    return StreamingResponse(generator(), media_type="text/plain")
+    job = jobs.submit("nds", run_nds_job, channel, segs, params={"channel": channel, "segments": segs})
+    return {"status": "started", "job_id": job.id}
+
+def run_nds_job(job, channel: str, segments: list[str]):
+    job.update(segments_total=len(segments), files_saved=0)
+    yield f"[INFO] Starting NDS download for {channel}"
+    yield from download_nds(channel, segments, on_saved=lambda path: job.increment("files_saved"))
 
 # === Omicron Run ===
+class OmicronRequest(BaseModel):
+    channel_dir: str
+    segments: str
+    parallel: bool = False      # split the span across CPU cores
+    workers: int = None         # parallel processes, default one per core
+    config: dict = None         # parameter overrides, e.g. {"snr_threshold": 7, "timing": [64, 4]}
+    incremental: bool = False   # only analyse segments without triggers for this channel and config
+    superset: bool = False      # run at a low SNR threshold over the full band, so stricter requests are filtered from it
+
 @app.post("/api/omicron/run")
-async def api_omicron(channel_dir: str, segments: str):
-    segs = [s.strip() for s in segments.split(",") if s.strip()]
-    ffl = generate_fin_ffl(channel_dir, segs)
-    def generator():
-        for line in run_omicron(ffl):
+async def api_omicron(request: OmicronRequest):
+    segs = [s.strip() for s in request.segments.split(",") if s.strip()]
+    # The run gets its own copy of the settings now; later edits to config.txt don't affect it
+    try:
+        config = OmicronConfig.read(CONFIG_PATH).with_params(request.config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = jobs.submit_async("omicron", run_omicron_job, request.channel_dir, segs, config,
+                            parallel=request.parallel, workers=request.workers, incremental=request.incremental,
+                            superset=request.superset,
+                            params={"channel_dir": request.channel_dir, "segments": segs,
+                                    "parallel": request.parallel, "workers": request.workers,
+                                    "incremental": request.incremental, "superset": request.superset,
+                                    "config": request.config, "config_hash": config.digest()})
+    return {"status": "started", "job_id": job.id, "config_hash": config.digest()}
+
+def download_url(path: str) -> str:
+    return f"/download/{os.path.relpath(path, UPLOADS)}"
+
+def trigger_channel(channel_dir: str, config: OmicronConfig) -> str:
+    return next((c for c in config.channels if ":" in c), os.path.basename(os.path.normpath(channel_dir)))
+
+def analysed_spans(ffl: str, config: OmicronConfig) -> list:
+    """The blocks of an FFL a run actually analyses (see data_blocks); gaps
+    and blocks shorter than PSDLENGTH are not among them."""
+    return data_blocks(ffl_segments(ffl), config.psd_length)
+
+async def index_triggers(job, source: str, fmt: str, channel: str, config: OmicronConfig, spans=None):
+    """Copy a finished run's triggers into the columnar trigger store,
+    replacing what it had inside `spans` (everything when None)."""
+    yield f"[INFO] Indexing triggers for {channel}..."
+    store = get_trigger_store()
+    try:
+        count = await asyncio.get_running_loop().run_in_executor(
+            None, store.ingest_source, source, fmt, channel, config.digest(), spans)
+    except Exception as e:
+        # The run's own trigger files are still there; only fast queries are missing
+        yield f"[WARNING] Could not index triggers: {e}"
+        return
+    job.update(indexed=count, trigger_dataset={"channel": channel, "config": config.digest()})
+    yield f"[INFO] Indexed {count} triggers in {store.dataset_dir(channel, config.digest())}"
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, get_omiviz().precompute, channel, config.digest())
+    except Exception as e:
+        yield f"[WARNING] Could not precompute Omiviz views: {e}"
+
+async def filter_run_triggers(job, source: str, fmt: str, ffl: str, run_dir: str, channel: str,
+                              config: OmicronConfig):
+    """Cut a superset of triggers down to `config`'s threshold and band, as this run's result."""
+    first_time, last_time = ffl_span(ffl)
+    dest = os.path.join(run_dir, f"{channel.replace(':', '_')}_OMICRON-{first_time}-{last_time - first_time}.h5")
+    low, high = config.frequency_range
+    yield f"[INFO] Keeping triggers with SNR >= {config.snr_threshold:g} between {low:g} and {high:g} Hz..."
+    count = await asyncio.get_running_loop().run_in_executor(
+        None, filter_triggers, source, fmt, dest, config.snr_threshold, config.frequency_range)
+    job.update(percent=100.0, run_dir=run_dir, triggers=count)
+    if not os.path.exists(dest):
+        yield f"[SUCCESS] No triggers in {source}"
+        return
+    job.add_artifact("triggers", dest)
+    yield f"[SUCCESS] {count} trigger(s) written to {dest}"
+    async for line in index_triggers(job, dest, "hdf5", channel, config, analysed_spans(ffl, config)):
+        yield line
+
+async def run_omicron_job(job, channel_dir: str, segments: list[str], config: OmicronConfig,
+                          parallel: bool = False, workers: int = None, incremental: bool = False,
+                          superset: bool = False):
+    run_dir = run_directory(OMICRON_OUT, job.id)
+    # The FFL lives with the run too, so runs over different segments of one channel don't collide
+    ffl = generate_fin_ffl(channel_dir, segments, os.path.join(run_dir, "fin.ffl"))
+    job.add_artifact("ffl", ffl)
+    yield f"[INFO] Generated {ffl}"
+
+    def add_run_artifacts(config_path, log_dir):
+        job.add_artifact("config", download_url(config_path))
+        if os.path.exists(os.path.join(log_dir, "omicron.out")) or not parallel:
+            job.add_artifact("log", download_url(os.path.join(log_dir, "omicron.out")))
+
+    channel = trigger_channel(channel_dir, config)
+    finished = {}
+
+    def on_progress(progress):
+        job.update(**progress)
+        if "merged" in progress:
+            job.add_artifact("triggers", progress["merged"])
+        if progress.get("succeeded"):
+            finished.update(progress)
+
+    if incremental:
+        add_run_artifacts(pointed_config(ffl, config, run_dir).snapshot_path(run_dir), run_dir)
+        async for line in run_omicron_incremental_async(ffl, channel, config, workers=workers, run_id=job.id,
+                                                        on_progress=on_progress, should_stop=lambda: job.cancelled):
+            yield line
+        if finished.get("merged"):
+            # The ledger's table holds every analysed interval; mirror all of it
+            async for line in index_triggers(job, finished["merged"], "hdf5", channel, config):
+                yield line
+        return
+
+    # Same frames and same settings as an earlier run: hand back its results
+    cache = get_result_cache()
+    mode = "parallel" if parallel else "single"
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(None, cache.key, ffl, config.digest(), mode)
+    cached = await loop.run_in_executor(None, cache.lookup, key)
+    if cached is not None:
+        # The cached run's snapshot points at its own FFL, so look it up by settings digest
+        snapshots = glob.glob(os.path.join(glob.escape(cached), f"config-{config.digest()}*.txt"))
+        add_run_artifacts(snapshots[0] if snapshots else config.snapshot(cached), cached)
+        merged = glob.glob(os.path.join(glob.escape(cached), "*.h5"))
+        if merged:
+            job.add_artifact("triggers", merged[0])
+        job.update(percent=100.0, run_dir=cached, cached=True)
+        yield f"[SUCCESS] Same frames and config as an earlier run – results in {cached}"
+        return
+
+    # An earlier run over these frames kept every trigger this one would: filter instead of rerunning
+    base_key = await loop.run_in_executor(None, cache.superset_key, ffl, config)
+    covering = await loop.run_in_executor(None, cache.find_superset, base_key, config.snr_threshold,
+                                          config.frequency_range)
+    if covering is not None:
+        # The config that produced these triggers is the covering run's own snapshot
+        snapshots = glob.glob(os.path.join(glob.escape(covering["run_dir"]), "config-*.txt"))
+        if snapshots:
+            job.add_artifact("config", download_url(snapshots[0]))
+        job.update(refiltered_from=covering["triggers"])
+        yield (f"[INFO] Filtering triggers of an earlier run (SNR >= {covering['snr_threshold']:g}) "
+               f"from {covering['triggers']}")
+        async for line in filter_run_triggers(job, covering["triggers"], covering["format"], ffl, run_dir,
+                                              channel, config):
+            yield line
+        return
+
+    # A superset run keeps its own directory inside this one; the filtered result sits next to it
+    run_config, output_dir, run_id = config, OMICRON_OUT, job.id
+    if superset:
+        run_config, output_dir, run_id = superset_config(config), run_dir, "superset"
+        run_key = await loop.run_in_executor(None, cache.key, ffl, run_config.digest(), mode)
+        superset_dir = run_directory(run_dir, run_id)
+        add_run_artifacts(pointed_config(ffl, run_config, superset_dir).snapshot_path(superset_dir), superset_dir)
+        yield f"[INFO] Keeping a superset of triggers with {run_config.digest()} for later filtering"
+    else:
+        run_key = key
+        add_run_artifacts(pointed_config(ffl, config, run_dir).snapshot_path(run_dir), run_dir)
+
+    if parallel:
+        async for line in run_omicron_parallel_async(ffl, run_config, output_dir=output_dir, workers=workers,
+                                                     run_id=run_id, on_progress=on_progress,
+                                                     should_stop=lambda: job.cancelled):
+            yield line
+    else:
+        async for line in run_omicron_async(ffl, run_config, output_dir=output_dir, run_id=run_id,
+                                            on_progress=on_progress, should_stop=lambda: job.cancelled):
+            yield line
+    if finished:
+        # Sizing the cache and evicting old runs walks and deletes directories: keep it off the loop
+        merged = finished.get("merged")
+        await loop.run_in_executor(None, lambda: cache.store(run_key, finished["run_dir"], superset={
+            "base": base_key,
+            "snr_threshold": run_config.snr_threshold,
+            "frequency_range": list(run_config.frequency_range),
+            "triggers": merged or finished["run_dir"],
+            "format": "hdf5" if merged else run_config.output_format,
+        }))
+    if finished and superset:
+        source = finished.get("merged") or finished["run_dir"]
+        fmt = "hdf5" if finished.get("merged") else run_config.output_format
+        async for line in filter_run_triggers(job, source, fmt, ffl, run_dir, channel, config):
+            yield line
+    elif finished:
+        # Replace what the store had inside the analysed blocks only, so reruns don't
+        # duplicate triggers and earlier runs over the gaps keep theirs
+        source, fmt = finished.get("merged"), "hdf5"
+        if source is None:
+            source, fmt = finished["run_dir"], config.output_format
+        async for line in index_triggers(job, source, fmt, channel, config, analysed_spans(ffl, config)):
             yield line
-    return StreamingResponse(generator(), media_type="text/plain")
+
+class OmicronSweepRequest(BaseModel):
+    channel_dir: str
+    segments: str
+    grid: dict                  # values to sweep, e.g. {"snr_threshold": "6:8:1", "q_range": [[4, 100], [4, 64]]}
+    config: dict = None         # overrides applied to every run
+    workers: int = None         # concurrent runs, default bounded by cores and memory
+
+@app.post("/api/omicron/sweep")
+async def api_omicron_sweep(request: OmicronSweepRequest):
+    segs = [s.strip() for s in request.segments.split(",") if s.strip()]
+    try:
+        config = OmicronConfig.read(CONFIG_PATH).with_params(request.config)
+        runs = expand_grid(config, request.grid)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = jobs.submit_async("omicron_sweep", run_sweep_job, request.channel_dir, segs, config, request.grid,
+                            workers=request.workers,
+                            params={"channel_dir": request.channel_dir, "segments": segs, "grid": request.grid,
+                                    "config": request.config, "workers": request.workers})
+    return {"status": "started", "job_id": job.id, "runs": len(runs)}
+
+async def run_sweep_job(job, channel_dir: str, segments: list[str], config: OmicronConfig, grid: dict,
+                        workers: int = None):
+    run_dir = run_directory(OMICRON_OUT, job.id)
+    ffl = generate_fin_ffl(channel_dir, segments, os.path.join(run_dir, "fin.ffl"))
+    job.add_artifact("ffl", ffl)
+    yield f"[INFO] Generated {ffl}"
+
+    def on_progress(progress):
+        job.update(**progress)
+        if "comparison" in progress:
+            job.add_artifact("comparison", download_url(progress["comparison"]))
+
+    async for line in run_omicron_sweep_async(ffl, config, grid, workers=workers, run_id=job.id,
+                                              on_progress=on_progress, should_stop=lambda: job.cancelled):
+        yield line
+
+@app.get("/api/omicron/sweep/{job_id}")
+async def omicron_sweep_comparison(job_id: str):
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    path = os.path.join(run_directory(OMICRON_OUT, job_id), "comparison.json")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Sweep has not finished yet")
+    with open(path) as f:
+        return json.load(f)
+
+@app.get("/api/omicron/stream")
+async def omicron_stream(request: Request, job_id: str = None):
+    if job_id is None:
+        recent = jobs.list("omicron")
+        if not recent:
+            raise HTTPException(status_code=404, detail="No Omicron run")
+        job_id = recent[0].id
+    return await job_stream(job_id, request)
+
+# === Trigger Queries ===
+class NotIndexed(Exception):
+    """The trigger store has nothing for the requested channel/config."""
+
+@app.get("/api/triggers/datasets")
+async def trigger_datasets():
+    return await run_blocking(get_trigger_store().datasets)
+
+@app.get("/api/triggers")
+async def query_triggers(channel: str, config: str = None, start: float = None, end: float = None,
+                         snr_min: float = None, snr_max: float = None, fmin: float = None, fmax: float = None,
+                         offset: int = 0, limit: int = 1000, order: str = "time"):
+    store = get_trigger_store()
+
+    def query():
+        # Every read of the store, the existence checks included, stays off the event loop
+        if config is not None and not store.index(channel, config)["partitions"]:
+            raise NotIndexed(f"No indexed triggers for {channel} with config {config}")
+        result = store.query(channel, config, start, end, snr_min, snr_max, fmin, fmax, offset, limit, order)
+        if not result["total"] and config is None and not store.configs(channel):
+            raise NotIndexed(f"No indexed triggers for {channel}")
+        return result
+
+    try:
+        return await run_blocking(query)
+    except NotIndexed as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StalePartition as e:
+        raise HTTPException(status_code=409, detail=f"{e}, retry")
+
+# === Omiviz ===
+def omiviz_view(view, channel: str, *args):
+    """`view(channel, *args)`; raises NotIndexed when the channel has no indexed triggers."""
+    if not get_trigger_store().configs(channel):
+        raise NotIndexed(f"No indexed triggers for {channel}")
+    return view(channel, *args)
+
+@app.get("/omiviz", response_class=HTMLResponse)
+async def omiviz_page(request: Request):
+    return templates.TemplateResponse("omiviz.html", {"request": request})
+
+@app.get("/api/omiviz/tiles")
+async def omiviz_tiles(channel: str, config: str = None, start: float = None, end: float = None,
+                       bins: int = 1000, fmin: float = None, fmax: float = None):
+    # First views of a large dataset may build its aggregates, allow more than a metadata call
+    try:
+        return await run_blocking(omiviz_view, get_omiviz().tiles, channel, config, start, end, bins, fmin, fmax,
+                                  timeout=300)
+    except NotIndexed as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/omiviz/scatter")
+async def omiviz_scatter(channel: str, config: str = None, start: float = None, end: float = None,
+                         points: int = 2000, snr_min: float = None, fmin: float = None, fmax: float = None):
+    try:
+        return await run_blocking(omiviz_view, get_omiviz().scatter, channel, config, start, end, points, snr_min,
+                                  fmin, fmax, timeout=300)
+    except NotIndexed as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 # === File Download ===
 @app.get("/download/{path:path}")
 async def download(path: str):
     file = os.path.join(UPLOADS, path)
-    if os.path.exists(file):
-        return FileResponse(file)
+    if os.path.isfile(file):
+        return RangeFileResponse(file)
     return {"error": "File not found"}
 
 # === Config.txt ===
 @app.get("/config.txt")
 async def get_config():
-    return FileResponse("config.txt")
+    return FileResponse(CONFIG_PATH)
 
 @app.post("/api/config")
 async def save_config(content: str):
-    with open("config.txt", "w") as f:
+    # Replace atomically: a run being submitted must never read a half-written file
+    tmp_path = f"{CONFIG_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
         f.write(content)
+    os.replace(tmp_path, CONFIG_PATH)
     return {"status": "saved"}
 
 # === List channels and segments in GWFout ===
@@ -96,15 +427,18 @@ async def list_segments(dir: str):
     return sorted(segments)
 
 # === OSDF Dropdown APIs ===
+# Upstream queries run on the bounded metadata executor with a timeout, so a
+# slow GWOSC query never stalls the event loop (SSE streams, downloads);
+# metadata_flight coalesces identical concurrent requests.
 @app.get("/api/osdf/frametypes")
 async def api_osdf_frametypes(detector: str):
     if detector not in ["H", "L", "V", "K"]:
         return []
     try:
-        cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", detector, "--show-types"]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        types = [line.strip() for line in result.stdout.splitlines() if line.strip() and not line.startswith("#")]
+        types = await metadata_flight.do(("frametypes", detector), run_blocking, datafind.frame_types, detector)
         return types or ["No frame types available"]
+    except asyncio.TimeoutError:
+        return ["Error: GWDataFind query timed out"]
     except Exception as e:
         return [f"Error: {str(e)}"]
 
@@ -113,17 +447,11 @@ async def api_osdf_segments(detector: str, frametype: str):
     if not detector or not frametype:
         return []
     try:
-        cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", detector, "-t", frametype, "--show-times"]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        segments = []
-        for line in result.stdout.splitlines():
-            line = line.strip()
-            if line and not line.startswith("#"):
-                parts = line.split()
-                if len(parts) >= 4:
-                    start, end = int(parts[1]), int(parts[2])
-                    segments.append(f"{start}_{end}")
+        found = await metadata_flight.do(("segments", detector, frametype), run_blocking, datafind.segments, detector, frametype)
+        segments = [seg.label for seg in found]
         return segments or ["No segments available"]
+    except asyncio.TimeoutError:
+        return ["Error: GWDataFind query timed out"]
     except Exception as e:
         return [f"Error: {str(e)}"]
 
@@ -133,93 +461,261 @@ async def api_nds_groups(detector: str):
     if detector not in ["H1", "L1", "V1", "K1"]:
         return ["Invalid detector"]
     try:
-        chanlist = ChannelList.query_nds2(f'{detector}:*', host='nds.gwosc.org')
-        groups = set()
-        for chan in chanlist:
-            match = re.match(rf'^{detector}:([A-Z]+)-?.*', chan.name)
-            if match:
-                groups.add(match.group(1))
-        return sorted(groups) or ["No groups available"]
-    except Exception as e:
+        groups = await metadata_flight.do(("nds-groups", detector), run_blocking, nds_catalog.groups, detector)
+        return groups or ["No groups available"]
+    except asyncio.TimeoutError:
+        return ["Error: NDS query timed out"]
+    except Exception:
         return ["Error fetching groups"]
 
 @app.get("/api/nds/channels")
 async def api_nds_channels(detector: str, group: str):
     try:
-        chanlist = ChannelList.query_nds2(f'{detector}:*', host='nds.gwosc.org')
-        channels = []
-        for chan in chanlist:
-            if re.match(rf'^{detector}:{group}-?.*', chan.name):
-                channels.append(f"{chan.name} ({chan.sample_rate})")
+        found = await metadata_flight.do(("nds-channels", detector, group), run_blocking, nds_catalog.channels, detector, group)
+        channels = [f"{name} ({rate} Hz)" for name, rate in found]
         return channels or ["No channels available"]
-    except Exception as e:
+    except asyncio.TimeoutError:
+        return ["Error: NDS query timed out"]
+    except Exception:
         return ["Error fetching channels"]
 
+@app.get("/api/nds/search")
+async def api_nds_search(detector: str, q: str, limit: int = 200):
+    try:
+        table = await metadata_flight.do(("nds-table", detector), run_blocking, nds_catalog.table, detector)
+        # The first substring search builds the trigram index, keep it off the loop
+        matches = table.prefix(q) if q.startswith(f"{detector}:") else await run_blocking(table.search, q, limit)
+        return [f"{name} ({rate} Hz)" for name, rate in matches[:limit]] or ["No channels available"]
+    except asyncio.TimeoutError:
+        return ["Error: NDS query timed out"]
+    except Exception:
+        return ["Error searching channels"]
+
+@app.get("/api/nds/availability")
+async def api_nds_availability(channel: str, start: int, end: int):
+    if end <= start:
+        return ["Invalid GPS window"]
+    try:
+        found = await metadata_flight.do(("nds-availability", channel, start, end), run_blocking,
+                                         nds_availability.query, channel, start, end)
+        segments = [f"{int(seg[0])}_{int(seg[1])}" for seg in found]
+        return segments or ["No segments available"]
+    except asyncio.TimeoutError:
+        return ["Error: NDS query timed out"]
+    except Exception:
+        return ["Error fetching availability"]
+
 # === OSDF DOWNLOAD SYSTEM ===
 class OSDFRequest(BaseModel):
     detector: str
     frametype: str
     segments: list[str]
+    archive: bool = False  # build a ZIP alongside the download
 
 @app.post("/api/gravfetch/osdf")
-async def trigger_osdf_download(request: OSDFRequest, background_tasks: BackgroundTasks):
-    global current_job_log
-    current_job_log = []  # Reset for new job
-    current_job_log.append(f"[INFO] Starting OSDF download for {request.detector}:{request.frametype}")
-    current_job_log.append(f"[INFO] Requested segments: {', '.join(request.segments)}")
-    background_tasks.add_task(run_osdf_background, request.detector, request.frametype, request.segments)
-    return {"status": "started", "message": "Download started – see live terminal"}
-
-def run_osdf_background(detector: str, frametype: str, segments: list[str]):
-    global current_job_log
+async def trigger_osdf_download(request: OSDFRequest):
+    job = jobs.submit("osdf", run_osdf_job, request.detector, request.frametype, request.segments,
+                      archive=request.archive, params=request.dict())
+    return {"status": "started", "job_id": job.id, "message": "Download started – see live terminal"}
+
+def run_osdf_job(job, detector: str, frametype: str, segments: list[str], archive: bool = False):
+    yield f"[INFO] Starting OSDF download for {detector}:{frametype}"
+    yield f"[INFO] Requested segments: {', '.join(segments)}"
+    job.update(segments_total=len(segments), files_saved=0, bytes_saved=0)
+
+    channel = f"{detector}:{frametype}"
+    ch_dir_name = channel.replace(":", "_")
+    channel_path = os.path.join(GWF_OUT, ch_dir_name)
+
+    builder = None
+    if archive:
+        # Frames are packed as they land, so the ZIP is done when the download is
+        prune_archives()
+        builder = ArchiveBuilder(os.path.join(ARCHIVE_DIR, f"{ch_dir_name}.{job.id}.zip"))
+        builder.add_existing(channel_path)
+
+    def on_saved(path):
+        job.increment("files_saved")
+        job.increment("bytes_saved", os.path.getsize(path))
+        if builder is not None:
+            builder.add(path, os.path.relpath(path, channel_path).replace("\\", "/"))
+
     try:
-        for log_line in download_osdf(detector, frametype, segments):
-            current_job_log.append(log_line)
-
-        # Create ZIP
-        channel = f"{detector}:{frametype}"
-        ch_dir_name = channel.replace(":", "_")
-        channel_path = os.path.join("./uploads/GWFout", ch_dir_name)
-        zip_path = f"/tmp/{ch_dir_name}.zip"
-
-        if os.path.exists(channel_path):
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, _, files in os.walk(channel_path):
-                    for file in files:
-                        full_path = os.path.join(root, file)
-                        arcname = os.path.relpath(full_path, channel_path)
-                        zipf.write(full_path, arcname)
-
-            # Check size
-            if os.path.getsize(zip_path) > 0:
-                current_job_log.append(f"[ZIP_READY]{ch_dir_name}")
-            else:
-                current_job_log.append("[ERROR] ZIP created but empty")
-
-        current_job_log.append("[SUCCESS] OSDF job completed!")
-    except Exception as e:
-        current_job_log.append(f"[ERROR] {str(e)}")
+        yield from download_osdf(detector, frametype, segments, on_saved=on_saved)
+    except BaseException:
+        if builder is not None:
+            builder.abort()
+        raise
+
+    if builder is not None:
+        fin_path = os.path.join(channel_path, "fin.ffl")
+        builder.close(extra=[(fin_path, "fin.ffl")] if os.path.exists(fin_path) else [])
+        job.update(archive_files=builder.files, archive_bytes=builder.bytes)
+        job.add_artifact("archive", f"/api/jobs/{job.id}/archive")
+        yield f"[INFO] Archive ready: {builder.files} file(s)"
+
+    # Without a prebuilt archive /download_zip streams one on request
+    if os.path.isdir(channel_path) and any(os.scandir(channel_path)):
+        job.add_artifact("zip", f"/download_zip/{ch_dir_name}")
+        yield f"[ZIP_READY]{ch_dir_name}"
+    else:
+        yield "[ERROR] No files downloaded"
+
+    yield "[SUCCESS] OSDF job completed!"
 
 @app.get("/api/gravfetch/osdf/stream")
-async def osdf_stream():
+async def osdf_stream(request: Request, job_id: str = None):
+    if job_id is None:
+        # Older clients: follow the most recent OSDF job
+        recent = jobs.list("osdf")
+        if not recent:
+            raise HTTPException(status_code=404, detail="No OSDF job")
+        job_id = recent[0].id
+    return await job_stream(job_id, request)
+
+# === Jobs ===
+@app.get("/api/jobs")
+async def list_jobs(kind: str = None):
+    return [job.to_dict() for job in jobs.list(kind)]
+
+def segment_seconds(segments) -> int:
+    """Seconds of data in "start_end" segment names."""
+    total = 0
+    for seg in segments or []:
+        try:
+            start, end = (int(x) for x in str(seg).split("_")[:2])
+        except ValueError:
+            continue
+        total += max(0, end - start)
+    return total
+
+def job_channel(params: dict):
+    if "channel" in params:
+        return params["channel"]
+    if "detector" in params:
+        return f"{params['detector']}:{params['frametype']}"
+    if "channel_dir" in params:
+        return os.path.basename(os.path.normpath(params["channel_dir"]))
+    return None
+
+@app.get("/api/jobs/resources")
+async def job_resources(kind: str = None, channel: str = None, by: str = "kind"):
+    """Percentiles of the CPU, memory, I/O and wall time recorded for recent
+    jobs, in total and per hour of data, grouped by kind (or kind and channel)."""
+    if by not in ("kind", "channel"):
+        raise HTTPException(status_code=400, detail="by must be 'kind' or 'channel'")
+    records = []
+    for row in await run_blocking(jobs.resource_usage, kind):
+        params = row["params"]
+        record = {"kind": row["kind"], "channel": job_channel(params),
+                  "data_seconds": segment_seconds(params.get("segments")), **row["resources"]}
+        if channel is None or record["channel"] == channel:
+            records.append(record)
+    return {"jobs": len(records), "groups": summarize(records, ("kind",) if by == "kind" else ("kind", "channel"))}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"cancelled": jobs.cancel(job_id)}
+
+@app.get("/api/jobs/{job_id}/archive")
+async def get_job_archive(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    info = job.to_dict()
+    if "archive" not in info["artifacts"]:
+        raise HTTPException(status_code=404, detail="Job has no archive (yet)")
+    ch_dir_name = f"{info['params']['detector']}_{info['params']['frametype']}"
+    path = os.path.join(ARCHIVE_DIR, f"{ch_dir_name}.{job_id}.zip")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Archive has been removed")
+    return RangeFileResponse(path, media_type="application/zip", filename=f"{ch_dir_name.replace('_', ':')}_data.zip")
+
+SSE_KEEPALIVE = 15  # seconds between keep-alive comments on an idle stream
+
+@app.get("/api/jobs/{job_id}/stream")
+async def job_stream(job_id: str, request: Request = None, last_event_id: int = None):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    # Resume after the last line the client saw (EventSource sends Last-Event-ID on reconnect)
+    header = request.headers.get("last-event-id") if request is not None else None
+    if last_event_id is None and header and header.isdigit():
+        last_event_id = int(header)
+    next_seq = last_event_id + 1 if last_event_id is not None else 0
+
     async def event_generator():
-        global current_job_log
-        last_seen = 0
+        nonlocal next_seq
         while True:
-            if last_seen < len(current_job_log):
-                for i in range(last_seen, len(current_job_log)):
-                    yield f"data: {current_job_log[i]}\n\n"
-                last_seen = len(current_job_log)
-            await asyncio.sleep(0.5)
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
-
-# === ZIP Download Endpoint ===
+            event = job.hub.event()  # take the event before reading, see LogHub
+            done = job.done
+            if next_seq < job.first_seq:
+                yield f": {job.first_seq - next_seq} earlier line(s) no longer buffered\n\n"
+            lines = job.lines_since(next_seq)
+            for seq, line in lines:
+                yield f"id: {seq}\ndata: {line}\n\n"
+                next_seq = seq + 1
+            if done and not lines:
+                # Another worker's log is read a page at a time: only end once it is drained
+                yield f"event: end\ndata: {job.status}\n\n"
+                break
+            if not lines:
+                try:
+                    await asyncio.wait_for(event.wait(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# === Archive Download Endpoints ===
+def archive_response(ch_dir_name: str, fmt: str = "zip", segments: str = None):
+    if fmt not in ARCHIVE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {fmt!r}")
+    channel_path = os.path.join(GWF_OUT, os.path.basename(ch_dir_name))
+    if not os.path.isdir(channel_path):
+        raise HTTPException(status_code=404, detail="No data for this channel")
+    wanted = [s.strip() for s in segments.split(",") if s.strip()] if segments else None
+    media_type, suffix = ARCHIVE_FORMATS[fmt]
+    filename = f"{ch_dir_name.replace('_', ':')}_data{suffix}"
+    # Sync generator: Starlette iterates it in the threadpool, so file reads stay off the loop
+    return StreamingResponse(stream_archive(channel_path, fmt, wanted), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                                      "Accept-Ranges": "none"})
+
+def prebuilt_archive(ch_dir_name: str):
+    """Newest archive built by an OSDF job that still matches the channel
+    directory (fin.ffl is rewritten on every new frame and packed last)."""
+    fin_path = os.path.join(GWF_OUT, ch_dir_name, "fin.ffl")
+    candidates = glob.glob(os.path.join(ARCHIVE_DIR, glob.escape(ch_dir_name) + ".*.zip"))
+    if not candidates or not os.path.exists(fin_path):
+        return None
+    newest = max(candidates, key=os.path.getmtime)
+    return newest if os.path.getmtime(newest) >= os.path.getmtime(fin_path) else None
+
 @app.get("/download_zip/{ch_dir_name}")
 async def download_zip(ch_dir_name: str):
-    zip_path = f"/tmp/{ch_dir_name}.zip"
-    if os.path.exists(zip_path) and os.path.getsize(zip_path) > 0:
-        return FileResponse(zip_path, media_type="application/zip", filename=f"{ch_dir_name.replace('_', ':')}_data.zip")
-    return {"error": "ZIP not ready or empty"}
+    # A prebuilt archive is a real file, so it can be resumed with Range requests
+    path = prebuilt_archive(os.path.basename(ch_dir_name))
+    if path is not None:
+        return RangeFileResponse(path, media_type="application/zip",
+                                 filename=f"{ch_dir_name.replace('_', ':')}_data.zip")
+    return archive_response(ch_dir_name, "zip")
+
+@app.get("/api/archive/{ch_dir_name}")
+async def download_archive(ch_dir_name: str, format: str = "zip", segments: str = None):
+    """Stream a channel's frames as zip or tar, optionally only some segments
+    (comma-separated "start_end" directory names)."""
+    return archive_response(ch_dir_name, format, segments)
 
 # === Debug ===
 @app.get("/debug/files")
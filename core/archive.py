@@ -0,0 +1,213 @@
+# core/archive.py
+# Streaming archives of a channel directory. Entries are written straight to
+# the response as files are read, so nothing is staged in /tmp and the first
+# bytes go out immediately. GWF frames are already compressed, so entries are
+# stored rather than deflated.
+#
+# ArchiveBuilder is the prebuilt alternative: it appends each frame to a ZIP
+# on disk as soon as a download job saves it, so the archive is complete when
+# the last frame lands instead of being packed after the job.
+import io
+import logging
+import os
+import queue
+import tarfile
+import threading
+import zipfile
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+ARCHIVE_DIR = "./uploads/archives"
+ARCHIVE_KEEP = 20  # prebuilt archives kept on disk, oldest removed first
+GWF_MAGIC = b"IGWD"
+
+logger = logging.getLogger("archive")
+
+ARCHIVE_FORMATS = {
+    "zip": ("application/zip", ".zip"),
+    "tar": ("application/x-tar", ".tar"),
+}
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, unseekable buffer that zipfile writes into and we drain.
+
+    Because it cannot seek, zipfile writes data descriptors after each entry
+    instead of going back to patch sizes/CRCs into the local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_channel_files(channel_path: str, segments=None):
+    """Yield (path, arcname) for files under a GWFout channel directory.
+
+    With `segments` (e.g. ["1238112018_1238112082"]) only those segment
+    directories are included; top-level files such as fin.ffl always are.
+    """
+    wanted = set(segments) if segments else None
+    for root, dirs, files in os.walk(channel_path):
+        rel_root = os.path.relpath(root, channel_path)
+        if rel_root == "." and wanted is not None:
+            dirs[:] = [d for d in dirs if d in wanted]
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield path, os.path.relpath(path, channel_path).replace("\\", "/")
+
+
+def stream_zip(files, chunk_size: int = CHUNK_SIZE):
+    """Yield a stored, zip64 ZIP archive of `files` chunk by chunk."""
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, "rb") as src, zf.open(info, "w", force_zip64=True) as dst:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()  # data descriptor
+    yield sink.drain()  # central directory
+
+
+def stream_tar(files, chunk_size: int = CHUNK_SIZE):
+    """Yield a POSIX (pax) tar archive of `files` chunk by chunk."""
+    for path, arcname in files:
+        st = os.stat(path)
+        info = tarfile.TarInfo(arcname)
+        info.size = st.st_size
+        info.mtime = int(st.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        remaining = info.size
+        with open(path, "rb") as src:
+            while remaining > 0:
+                chunk = src.read(min(chunk_size, remaining))
+                if not chunk:
+                    raise IOError(f"{path} shrank while archiving")
+                remaining -= len(chunk)
+                yield chunk
+        if info.size % tarfile.BLOCKSIZE:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - info.size % tarfile.BLOCKSIZE)
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)  # end-of-archive marker
+
+
+def stream_archive(channel_path: str, fmt: str = "zip", segments=None):
+    files = iter_channel_files(channel_path, segments)
+    return stream_zip(files) if fmt == "zip" else stream_tar(files)
+
+
+def verify_frame(path: str) -> bool:
+    """Cheap sanity check before packing: non-empty, and GWF files carry the IGWD header."""
+    try:
+        if os.path.getsize(path) == 0:
+            return False
+        if path.endswith(".gwf"):
+            with open(path, "rb") as f:
+                return f.read(len(GWF_MAGIC)) == GWF_MAGIC
+        return True
+    except OSError:
+        return False
+
+
+def prune_archives(directory: str = ARCHIVE_DIR, keep: int = ARCHIVE_KEEP):
+    try:
+        entries = [e for e in os.scandir(directory) if e.name.endswith(".zip")]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class ArchiveBuilder:
+    """Stored ZIP written by a background thread while files are still arriving.
+
+    Call add() from the download's on_saved callback, then close() once the
+    download is done. The archive is written to `<path>.part` and renamed into
+    place by close(), so a half-built archive is never served.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.files = 0
+        self.bytes = 0
+        self.error = None
+        self._queue = queue.Queue()
+        self._added = set()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+        self._thread.start()
+
+    def add(self, path: str, arcname: str):
+        self._queue.put((path, arcname))
+
+    def add_existing(self, channel_path: str, segments=None):
+        """Queue frames that are already on disk (the download skips those)."""
+        for path, arcname in iter_channel_files(channel_path, segments):
+            if os.path.dirname(arcname):  # fin.ffl is still changing, added by close()
+                self.add(path, arcname)
+
+    def _run(self):
+        try:
+            with zipfile.ZipFile(self.part_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+                while True:
+                    item = self._queue.get()
+                    if item is None:
+                        break
+                    path, arcname = item
+                    if arcname in self._added:
+                        continue
+                    if not verify_frame(path):
+                        logger.warning(f"Not archiving {path}: failed verification")
+                        continue
+                    zf.write(path, arcname)
+                    self._added.add(arcname)
+                    self.files += 1
+                    self.bytes += os.path.getsize(path)
+        except Exception as e:
+            logger.exception(f"Building {self.path} failed")
+            self.error = e
+
+    def close(self, extra=()) -> str:
+        """Add `extra` (path, arcname) pairs, finish the archive and move it into place."""
+        for path, arcname in extra:
+            self.add(path, arcname)
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            self._discard()
+            raise self.error
+        os.replace(self.part_path, self.path)
+        return self.path
+
+    def abort(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._discard()
+
+    def _discard(self):
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,122 @@
+# core/availability.py
+# Cached NDS availability index. Remembers which GPS windows have already
+# been asked about for each channel and only queries NDS for the parts of a
+# new window that are not covered yet.
+import json
+import logging
+import os
+import threading
+
+from gwpy.detector import ChannelList
+from gwpy.segments import Segment, SegmentList
+
+from .nds_catalog import CATALOG_DIR, NDS_HOST
+from .singleflight import SingleFlight
+
+AVAILABILITY_VERSION = 1
+
+logger = logging.getLogger("availability")
+
+
+def _to_json(segments: SegmentList) -> list:
+    return [[int(seg[0]), int(seg[1])] for seg in segments]
+
+
+def _from_json(rows) -> SegmentList:
+    return SegmentList(Segment(start, end) for start, end in rows).coalesce()
+
+
+class _ChannelState:
+    __slots__ = ("queried", "available", "lock")
+
+    def __init__(self, queried=None, available=None):
+        self.queried = queried if queried is not None else SegmentList()
+        self.available = available if available is not None else SegmentList()
+        self.lock = threading.Lock()
+
+
+class AvailabilityIndex:
+    def __init__(self, host: str = NDS_HOST, directory: str = CATALOG_DIR):
+        self.host = host
+        self.directory = os.path.join(directory, host, "availability")
+        self._states = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, channel: str) -> str:
+        return os.path.join(self.directory, f"{channel.replace(':', '_')}.json")
+
+    def _state(self, channel: str) -> _ChannelState:
+        with self._lock:
+            state = self._states.get(channel)
+            if state is not None:
+                return state
+            state = _ChannelState()
+            try:
+                with open(self.path(channel)) as f:
+                    data = json.load(f)
+                if data.get("version") == AVAILABILITY_VERSION:
+                    state = _ChannelState(_from_json(data["queried"]), _from_json(data["available"]))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable availability cache for {channel}: {e}")
+            self._states[channel] = state
+            return state
+
+    def _save(self, channel: str, state: _ChannelState):
+        path = self.path(channel)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": AVAILABILITY_VERSION,
+                "host": self.host,
+                "channel": channel,
+                "queried": _to_json(state.queried),
+                "available": _to_json(state.available),
+            }, f)
+        os.replace(tmp_path, path)
+
+    def _fetch(self, channel: str, start: int, end: int) -> SegmentList:
+        found = ChannelList.query_nds2_availability([channel], start, end, host=self.host)
+        segments = SegmentList()
+        for segs in found.values():
+            segments.extend(segs)
+        return segments.coalesce()
+
+    def missing(self, channel: str, start: int, end: int) -> SegmentList:
+        """Parts of [start, end) that have not been queried yet."""
+        return SegmentList([Segment(start, end)]) - self._state(channel).queried
+
+    def query(self, channel: str, start: int, end: int) -> SegmentList:
+        """Segments of `channel` with data in [start, end).
+
+        Only the uncovered parts of the window go to NDS; once the whole
+        window has been seen the answer comes straight from the index.
+        """
+        state = self._state(channel)
+        window = SegmentList([Segment(start, end)])
+        gaps = self.missing(channel, start, end)
+        for gap in gaps:
+            found = self._flight.do((channel, gap[0], gap[1]), self._fetch, channel, int(gap[0]), int(gap[1]))
+            with state.lock:
+                state.available = (state.available | found).coalesce()
+                state.queried = (state.queried | SegmentList([gap])).coalesce()
+        if gaps:
+            with state.lock:
+                self._save(channel, state)
+        return (state.available & window).coalesce()
+
+
+_indexes: dict[str, AvailabilityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_availability_index(host: str = NDS_HOST) -> AvailabilityIndex:
+    """Return the shared availability index for `host`."""
+    with _indexes_lock:
+        index = _indexes.get(host)
+        if index is None:
+            index = _indexes[host] = AvailabilityIndex(host)
+        return index
@@ -0,0 +1,82 @@
+# core/channel_table.py
+# Compact, array-backed channel table for one detector with group, prefix
+# and substring indexes. Replaces per-click regex scans over lists of
+# gwpy Channel objects / (name, rate) tuples.
+import re
+import sys
+from bisect import bisect_left
+
+import numpy as np
+
+
+def channel_group(detector: str, name: str):
+    """Return the subsystem group of `name` (e.g. "GDS" for "H1:GDS-CALIB_STRAIN")."""
+    match = re.match(rf'^{detector}:([A-Z]+)-?.*', name)
+    return match.group(1) if match else None
+
+
+class ChannelTable:
+    """Channels of one detector, sorted by name.
+
+    names  -- list of interned channel names (sorted, so prefix lookups bisect)
+    rates  -- float64 array of sample rates, aligned with `names`
+    Group lookups go through a precomputed {group: int32 row array} index and
+    substring lookups through a lazily built trigram index, so queries cost
+    O(log n + k) rather than a regex scan of the whole detector.
+    """
+
+    def __init__(self, detector: str, channels):
+        pairs = sorted(channels)
+        self.detector = detector
+        self.names = [sys.intern(name) for name, _ in pairs]
+        self.rates = np.fromiter((rate for _, rate in pairs), dtype=np.float64, count=len(pairs))
+
+        groups = {}
+        for row, name in enumerate(self.names):
+            group = channel_group(detector, name)
+            if group:
+                groups.setdefault(group, []).append(row)
+        self._groups = {group: np.asarray(rows, dtype=np.int32) for group, rows in groups.items()}
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def rows(self, rows) -> list[tuple[str, float]]:
+        return [(self.names[row], float(self.rates[row])) for row in rows]
+
+    def groups(self) -> list[str]:
+        return sorted(self._groups)
+
+    def group(self, group: str) -> list[tuple[str, float]]:
+        return self.rows(self._groups.get(group, ()))
+
+    def prefix(self, prefix: str) -> list[tuple[str, float]]:
+        lo = bisect_left(self.names, prefix)
+        hi = bisect_left(self.names, prefix + "\U0010ffff", lo)
+        return self.rows(range(lo, hi))
+
+    def search(self, text: str, limit: int = None) -> list[tuple[str, float]]:
+        """Case-insensitive substring search."""
+        text = text.upper()
+        if len(text) < 3:
+            rows = [row for row, name in enumerate(self.names) if text in name.upper()]
+        else:
+            candidates = None
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                posting = self._trigram_index().get(gram)
+                if posting is None:
+                    return []
+                candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            rows = [row for row in candidates.tolist() if text in self.names[row].upper()]
+        return self.rows(rows[:limit] if limit else rows)
+
+    def _trigram_index(self) -> dict:
+        if self._trigrams is None:
+            index = {}
+            for row, name in enumerate(self.names):
+                name = name.upper()
+                for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                    index.setdefault(gram, []).append(row)
+            self._trigrams = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in index.items()}
+        return self._trigrams
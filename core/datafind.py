@@ -0,0 +1,74 @@
+# core/datafind.py
+# In-process GWDataFind client. Replaces the `gw_data_find` CLI subprocesses
+# that used to back the frame type / segment dropdowns.
+import threading
+from collections import namedtuple
+
+from gwdatafind import find_types, find_times, find_urls
+from igwn_auth_utils import Session as IgwnSession
+
+DATAFIND_HOST = "datafind.gwosc.org"
+
+
+class Segment(namedtuple("Segment", ["start", "end"])):
+    __slots__ = ()
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    @property
+    def label(self) -> str:
+        # Same "<start>_<end>" form used for segment directories under GWFout
+        return f"{self.start}_{self.end}"
+
+
+class DatafindClient:
+    """Pooled GWDataFind client with structured results.
+
+    Each worker thread keeps one HTTP session (requests sessions are not
+    thread-safe), so repeated queries reuse their keep-alive connection
+    instead of paying for a new process, imports and TLS handshake.
+    """
+
+    def __init__(self, host: str = DATAFIND_HOST):
+        self.host = host
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            # Public GWOSC data needs no credentials, don't go looking for any
+            session = IgwnSession(token=False, cert=False)
+            self._local.session = session
+        return session
+
+    def frame_types(self, observatory: str) -> list[str]:
+        types = find_types(observatory, host=self.host, session=self._session())
+        return sorted(t for t in types if t)
+
+    def segments(self, observatory: str, frametype: str, start=None, end=None) -> list[Segment]:
+        seglist = find_times(
+            observatory, frametype, gpsstart=start, gpsend=end,
+            host=self.host, session=self._session(),
+        )
+        return [Segment(int(seg[0]), int(seg[1])) for seg in seglist]
+
+    def urls(self, observatory: str, frametype: str, start: int, end: int, urltype: str = "osdf") -> list[str]:
+        return find_urls(
+            observatory, frametype, start, end,
+            urltype=urltype, host=self.host, session=self._session(),
+        )
+
+
+_clients: dict[str, DatafindClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host: str = DATAFIND_HOST) -> DatafindClient:
+    """Return the shared client for `host`."""
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = _clients[host] = DatafindClient(host)
+        return client
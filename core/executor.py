@@ -0,0 +1,23 @@
+# core/executor.py
+# Bounded thread pool for blocking upstream calls (GWDataFind, NDS) made from
+# async request handlers, so they never run on the event loop itself.
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+METADATA_WORKERS = 8        # upstream queries running at once per process
+METADATA_TIMEOUT = 30.0     # seconds, including time spent queued
+
+metadata_executor = ThreadPoolExecutor(max_workers=METADATA_WORKERS, thread_name_prefix="metadata")
+
+
+async def run_blocking(fn, *args, timeout: float = METADATA_TIMEOUT, executor=None, **kwargs):
+    """Await `fn(*args, **kwargs)` on `executor` (the metadata pool by default).
+
+    Raises asyncio.TimeoutError after `timeout` seconds. The worker thread
+    cannot be interrupted and finishes in the background, but the event
+    loop and the caller are released immediately.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor or metadata_executor, functools.partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout)
@@ -0,0 +1,191 @@
+# core/fileserve.py
+# File responses for large frame and archive downloads: byte ranges (single
+# and multipart), ETag / Last-Modified validators for conditional and resumed
+# requests, and zero-copy transfer when the ASGI server offers it.
+import mimetypes
+import os
+import re
+import stat
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+CHUNK_SIZE = 1 << 20  # 1 MiB per read when the server cannot send the file itself
+MAX_RANGES = 16       # more ranges than this is almost certainly abuse; serve the whole file
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def parse_range(header: str, size: int):
+    """Parse a Range header into sorted, merged (start, end) pairs, end inclusive.
+
+    Returns None if the header should be ignored (not a bytes range, malformed,
+    too many ranges) and [] if it is valid but nothing in it is satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        m = _RANGE_RE.match(part)
+        if m is None:
+            return None
+        first, last = m.groups()
+        if not first and not last:
+            return None
+        if not first:  # suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+        ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFileResponse(Response):
+    """FileResponse replacement that honours Range, If-Range, If-None-Match
+    and If-Modified-Since."""
+
+    def __init__(self, path: str, media_type: str = None, filename: str = None, headers: dict = None):
+        self.path = path
+        self.status_code = 200
+        self.media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.filename = filename
+        self.extra_headers = headers or {}
+        self.background = None
+        self.body = b""
+        self.init_headers({})
+
+    def _validators(self, st):
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        return etag, formatdate(st.st_mtime, usegmt=True)
+
+    def _not_modified(self, request_headers, etag, st) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _range_applies(self, request_headers, etag, last_modified) -> bool:
+        if_range = request_headers.get("if-range")
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    async def _send_headers(self, send, status: int, headers: dict):
+        raw = [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers.items()]
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+
+    async def _send_file(self, scope, send, f, offset: int, count: int, more_body: bool):
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            await send({"type": "http.response.zerocopysend", "file": f, "offset": offset,
+                        "count": count, "more_body": more_body})
+            return
+        await run_in_threadpool(f.seek, offset)
+        while count > 0:
+            chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, count))
+            if not chunk:
+                break
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        if not more_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def __call__(self, scope, receive, send):
+        request_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        try:
+            st = await run_in_threadpool(os.stat, self.path)
+        except FileNotFoundError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            await Response("File not found", status_code=404)(scope, receive, send)
+            return
+
+        size = st.st_size
+        etag, last_modified = self._validators(st)
+        headers = {"accept-ranges": "bytes", "etag": etag, "last-modified": last_modified}
+        if self.filename:
+            headers["content-disposition"] = f'attachment; filename="{self.filename}"'
+        headers.update(self.extra_headers)
+
+        if self._not_modified(request_headers, etag, st):
+            await self._send_headers(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        ranges = None
+        if "range" in request_headers and self._range_applies(request_headers, etag, last_modified):
+            ranges = parse_range(request_headers["range"], size)
+
+        head = scope.get("method") == "HEAD"
+        if ranges == []:
+            headers["content-range"] = f"bytes */{size}"
+            await self._send_headers(send, 416, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not ranges:
+            headers.update({"content-type": self.media_type, "content-length": size})
+            await self._send_headers(send, 200, headers)
+            if head:
+                await send({"type": "http.response.body", "body": b""})
+            elif "http.response.pathsend" in scope.get("extensions", {}):
+                await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+            else:
+                with open(self.path, "rb") as f:
+                    await self._send_file(scope, send, f, 0, size, False)
+            return
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers.update({"content-type": self.media_type, "content-length": end - start + 1,
+                            "content-range": f"bytes {start}-{end}/{size}"})
+            await self._send_headers(send, 206, headers)
+            if head:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            with open(self.path, "rb") as f:
+                await self._send_file(scope, send, f, start, end - start + 1, False)
+            return
+
+        # multipart/byteranges: a small header before each part, a closing boundary after
+        boundary = uuid.uuid4().hex
+        parts = [(f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                  f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("latin-1")
+                 for start, end in ranges]
+        trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        length = sum(len(p) for p in parts) + sum(e - s + 1 for s, e in ranges) \
+            + 2 * (len(ranges) - 1) + len(trailer)
+        headers.update({"content-type": f"multipart/byteranges; boundary={boundary}", "content-length": length})
+        await self._send_headers(send, 206, headers)
+        if head:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as f:
+            for i, ((start, end), part) in enumerate(zip(ranges, parts)):
+                await send({"type": "http.response.body", "body": (b"\r\n" if i else b"") + part, "more_body": True})
+                await self._send_file(scope, send, f, start, end - start + 1, True)
+            await send({"type": "http.response.body", "body": trailer, "more_body": False})
@@ -7,6 +7,7 @@ import requests
 
 from requests_pelican import get as rp_get
 from gwdatafind import find_urls
+from gwpy.timeseries import TimeSeries
 import os
 from gwdatafind import Session
 from igwn_auth_utils import Session as IgwnSession
@@ -44,7 +45,7 @@ def log(msg: str, level: str = "info") -> str:
     prefix = f'<span class="{color_class} font-bold">[{level.upper()}]</span>'
     return f"{prefix} {msg}"
     
-def download_osdf(detector_code: str, frametype: str, segments: list[str], output_dir: str = DEFAULT_GWFOUT):
+def download_osdf(detector_code: str, frametype: str, segments: list[str], output_dir: str = DEFAULT_GWFOUT, on_saved=None):
     os.makedirs(output_dir, exist_ok=True)
     channel = f"{detector_code}:{frametype}"
     ch_dir = os.path.join(output_dir, channel.replace(":", "_"))
@@ -108,6 +109,8 @@ def download_osdf(detector_code: str, frametype: str, segments: list[str], outpu
                     fin.write(f"./{rel_path} {timestamp} {duration} 0 0\n")
 
                 downloaded += 1
+                if on_saved:
+                    on_saved(filepath)
                 yield log(f"Saved {filename}", "success")
                 time.sleep(1.5)  # Polite rate-limiting
             except Exception as e:
@@ -115,7 +118,7 @@ def download_osdf(detector_code: str, frametype: str, segments: list[str], outpu
 
     yield log(f"OSDF complete – {downloaded} file(s) downloaded", "success")
 
-def download_nds(channel: str, segments: list[str], output_dir: str = DEFAULT_GWFOUT):
+def download_nds(channel: str, segments: list[str], output_dir: str = DEFAULT_GWFOUT, on_saved=None):
     os.makedirs(output_dir, exist_ok=True)
     ch_dir = os.path.join(output_dir, channel.replace(":", "_"))
     os.makedirs(ch_dir, exist_ok=True)
@@ -145,6 +148,8 @@ def download_nds(channel: str, segments: list[str], output_dir: str = DEFAULT_GW
             with open(fin_path, "a") as f:
                 f.write(f"./{rel_path} {start} {end - start} 0 0\n")
 
+            if on_saved:
+                on_saved(outfile)
             yield log(f"Saved {seg}", "success")
         except Exception as e:
             yield log(f"NDS fetch failed {seg}: {e}", "error")
@@ -0,0 +1,315 @@
+# core/jobs.py
+# Job manager for the web service: every download / Omicron run gets its own
+# ID, bounded log buffer, status, progress counters and result artifacts, so
+# concurrent jobs no longer share (and wipe) one global log. With a job store
+# attached, state is also written through so every worker process can list,
+# stream and cancel any job (see core/jobstore.py); the store batches those
+# writes on its own thread, so jobs on the event loop never block on them.
+# Each job's CPU, memory, I/O and wall time are recorded when it ends (see
+# core/resources.py).
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .loghub import LogHub, PollingHub
+from .resources import monitor_resources
+
+JOB_WORKERS = 4             # jobs running at once per process
+JOB_LOG_LINES = 5000        # log lines kept per job
+JOB_HISTORY = 200           # finished jobs kept before the oldest are forgotten
+REMOTE_POLL = 0.5           # seconds between store reads when streaming another worker's job
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+logger = logging.getLogger("jobs")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, params: dict = None, store=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = {}
+        self.artifacts = {}
+        self.resources = None       # usage recorded by the resource monitor when the job ends
+        self._log = deque(maxlen=JOB_LOG_LINES)
+        self._seq = 0               # sequence number of the next log line
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.hub = LogHub()         # wakes stream subscribers on new lines / completion
+        self.store = store
+        if store is not None:
+            store.create_job(self.to_dict())
+
+    def persist(self):
+        if self.store is not None:
+            self.store.save_job(self.to_dict())
+
+    def set_status(self, status: str, error: str = None):
+        now = time.time()
+        with self._lock:
+            self.status = status
+            if error is not None:
+                self.error = error
+            if status == "running":
+                self.started = now
+            elif status in FINISHED:
+                self.finished = now
+        self.persist()
+        if status in FINISHED:
+            self.hub.publish()  # let streams see the final status and close
+
+    # --- log -------------------------------------------------------------
+    def log(self, line: str):
+        with self._lock:
+            self._log.append(line)
+            seq = self._seq
+            self._seq += 1
+        if self.store is not None:
+            self.store.append_log(self.id, seq, line, keep=JOB_LOG_LINES)
+        self.hub.publish()
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest line still in the buffer."""
+        with self._lock:
+            return self._seq - len(self._log)
+
+    def lines_since(self, seq: int) -> list[tuple[int, str]]:
+        """(seq, line) pairs with sequence number >= `seq` still in the buffer."""
+        with self._lock:
+            first = self._seq - len(self._log)
+            start = max(seq, first)
+            return [(i, self._log[i - first]) for i in range(start, self._seq)]
+
+    # --- progress / cancellation ----------------------------------------
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+        self.persist()
+
+    def increment(self, key: str, amount=1):
+        with self._lock:
+            self.progress[key] = self.progress.get(key, 0) + amount
+        self.persist()
+
+    def add_artifact(self, name: str, value):
+        with self._lock:
+            self.artifacts[name] = value
+        self.persist()
+
+    def set_resources(self, usage: dict):
+        with self._lock:
+            self.resources = usage
+        self.persist()
+
+    @property
+    def cancelled(self) -> bool:
+        # A cancel requested through another worker arrives via the store's writer thread
+        if not self._cancel.is_set() and self.store is not None and self.store.cancel_requested(self.id):
+            self._cancel.set()
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled from inside a job body once cancel was requested."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "progress": dict(self.progress),
+                "artifacts": dict(self.artifacts),
+                "resources": self.resources,
+                "log_lines": self._seq,
+            }
+
+
+class RemoteJob:
+    """Read-only view of a job owned by another worker process."""
+
+    def __init__(self, store, job_id: str, snapshot: dict = None):
+        self.store = store
+        self.id = job_id
+        self._snapshot = snapshot
+        self.hub = PollingHub(REMOTE_POLL)
+
+    def to_dict(self) -> dict:
+        if self._snapshot is None:
+            return self.store.get_job(self.id)
+        return self._snapshot
+
+    @property
+    def kind(self) -> str:
+        return self.to_dict()["kind"]
+
+    @property
+    def status(self) -> str:
+        return self.store.get_job(self.id)["status"]
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def first_seq(self) -> int:
+        return self.store.first_seq(self.id)
+
+    def lines_since(self, seq: int) -> list[tuple[int, str]]:
+        return self.store.lines_since(self.id, seq)
+
+
+class JobManager:
+    def __init__(self, max_workers: int = JOB_WORKERS, store=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._tasks = set()  # running async jobs, referenced so they are not collected
+        self.store = store
+
+    def submit(self, kind: str, fn, *args, params: dict = None, **kwargs) -> Job:
+        """Queue `fn(job, *args, **kwargs)`.
+
+        `fn` may return an iterable of log lines (e.g. download_osdf or
+        run_omicron); each line is appended to the job's log as it arrives
+        and cancellation is checked in between lines.
+        """
+        job = Job(kind, params, store=self.store)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        if job.cancelled:
+            job.set_status("cancelled")
+            return
+        job.set_status("running")
+        try:
+            # The job runs on this thread, so its own CPU and I/O count along with any children
+            with monitor_resources(job.set_resources, thread=True):
+                lines = fn(job, *args, **kwargs)
+                if lines is not None:
+                    try:
+                        for line in lines:
+                            job.log(line)
+                            job.check_cancelled()
+                    finally:
+                        close = getattr(lines, "close", None)
+                        if close:
+                            close()
+            job.check_cancelled()
+            job.set_status("succeeded")
+        except JobCancelled:
+            job.log("[WARNING] Job cancelled")
+            job.set_status("cancelled")
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            job.log(f"[ERROR] {e}")
+            job.set_status("failed", str(e))
+
+    def submit_async(self, kind: str, fn, *args, params: dict = None, **kwargs) -> Job:
+        """Run `fn(job, *args, **kwargs)`, an async generator of log lines, as
+        a task on the running event loop instead of a worker thread. Must be
+        called from the loop (i.e. from an async endpoint)."""
+        job = Job(kind, params, store=self.store)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        task = asyncio.get_running_loop().create_task(self._run_async(job, fn, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run_async(self, job: Job, fn, args, kwargs):
+        if job.cancelled:
+            job.set_status("cancelled")
+            return
+        job.set_status("running")
+        try:
+            # The event loop is shared, so only the processes the job starts are counted
+            with monitor_resources(job.set_resources):
+                lines = fn(job, *args, **kwargs)
+                try:
+                    async for line in lines:
+                        job.log(line)
+                        job.check_cancelled()
+                finally:
+                    await lines.aclose()
+            job.check_cancelled()
+            job.set_status("succeeded")
+        except JobCancelled:
+            job.log("[WARNING] Job cancelled")
+            job.set_status("cancelled")
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            job.log(f"[ERROR] {e}")
+            job.set_status("failed", str(e))
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in sorted(finished, key=lambda j: j.finished)[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job.id]
+        if self.store is not None:
+            self.store.prune(JOB_HISTORY)
+
+    def get(self, job_id: str):
+        """The job with `job_id`, whichever worker process runs it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None and self.store.get_job(job_id) is not None:
+            job = RemoteJob(self.store, job_id)
+        return job
+
+    def list(self, kind: str = None) -> list:
+        with self._lock:
+            local = dict(self._jobs)
+        if self.store is not None:
+            return [local.get(row["id"]) or RemoteJob(self.store, row["id"], row)
+                    for row in self.store.list_jobs(kind, JOB_HISTORY)]
+        return sorted((j for j in local.values() if kind is None or j.kind == kind), key=lambda j: j.created, reverse=True)
+
+    def resource_usage(self, kind: str = None):
+        """{"kind", "params", "resources"} of finished jobs that recorded their usage."""
+        if self.store is not None:
+            return self.store.list_resources(kind, JOB_HISTORY)
+        with self._lock:
+            return [{"kind": job.kind, "params": job.params, "resources": job.resources}
+                    for job in self._jobs.values()
+                    if job.resources is not None and (kind is None or job.kind == kind)]
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        if isinstance(job, Job):
+            job._cancel.set()
+        if self.store is not None:
+            return self.store.request_cancel(job_id) or isinstance(job, Job)
+        return True
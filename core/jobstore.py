@@ -0,0 +1,261 @@
+# core/jobstore.py
+# Job and log state shared by all worker processes. gunicorn runs several
+# workers and any of them may receive the stream/status request for a job
+# another one is running, so job state is written through to SQLite (WAL
+# mode: one writer, many concurrent readers, no external service).
+#
+# A new job's row is written straight away; later job state and log lines
+# are queued and a writer thread commits them in batches every
+# FLUSH_INTERVAL seconds, so a running job never waits on SQLite. The same
+# thread reads back cancel requests for this process's jobs.
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Kept outside ./uploads, which /download serves to anyone
+JOB_DB = os.environ.get("GWCLOUD_JOB_DB", "./state/jobs.sqlite3")
+FLUSH_INTERVAL = 0.2   # seconds between batched writes
+CANCEL_REFRESH = 1.0   # seconds between reads of cancel requests for this process's jobs
+LOG_TRIM_EVERY = 500   # log lines appended to a job between trims of its oldest lines
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    error       TEXT,
+    created     REAL NOT NULL,
+    started     REAL,
+    finished    REAL,
+    progress    TEXT NOT NULL DEFAULT '{}',
+    artifacts   TEXT NOT NULL DEFAULT '{}',
+    resources   TEXT,
+    log_lines   INTEGER NOT NULL DEFAULT 0,
+    cancel      INTEGER NOT NULL DEFAULT 0,
+    owner_pid   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_kind_created ON jobs (kind, created);
+CREATE TABLE IF NOT EXISTS job_log (
+    job_id  TEXT NOT NULL,
+    seq     INTEGER NOT NULL,
+    line    TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+logger = logging.getLogger("jobstore")
+
+_JOB_COLUMNS = ("id", "kind", "params", "status", "error", "created", "started", "finished",
+                "progress", "artifacts", "resources", "log_lines", "cancel", "owner_pid")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteJobStore:
+    def __init__(self, path: str = JOB_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_jobs = {}     # job id -> latest state, only the last save matters
+        self._pending_log = []      # (job id, seq, line)
+        self._pending_trim = {}     # job id -> (last seq, lines to keep)
+        self._pending_prune = None
+        self._cancelled = set()     # ids of this process's jobs with a cancel request
+        self._cancel_read = 0.0
+        self._writer = None
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        self.reap()
+
+    def _migrate(self, conn):
+        # Databases created before resource accounting lack the column
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "resources" not in columns:
+            try:
+                conn.execute("ALTER TABLE jobs ADD COLUMN resources TEXT")
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # --- batched writes ----------------------------------------------------
+    def _queue(self):
+        # Caller holds _pending_lock
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="jobstore-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Writing job state failed")
+
+    def flush(self):
+        """Commit queued job state, log lines and pruning now."""
+        with self._pending_lock:
+            jobs, self._pending_jobs = self._pending_jobs, {}
+            lines, self._pending_log = self._pending_log, []
+            trims, self._pending_trim = self._pending_trim, {}
+            prune, self._pending_prune = self._pending_prune, None
+        conn = self._conn()
+        if jobs or lines or trims or prune is not None:
+            with conn:  # one transaction per batch
+                conn.execute("BEGIN")
+                for job in jobs.values():
+                    self._save_job(conn, job)
+                conn.executemany("INSERT OR REPLACE INTO job_log (job_id, seq, line) VALUES (?, ?, ?)", lines)
+                for job_id, (seq, keep) in trims.items():
+                    conn.execute("DELETE FROM job_log WHERE job_id = ? AND seq <= ?", (job_id, seq - keep))
+                if prune is not None:
+                    self._prune(conn, prune)
+        now = time.monotonic()
+        if now - self._cancel_read >= CANCEL_REFRESH:
+            self._cancel_read = now
+            rows = conn.execute("SELECT id FROM jobs WHERE cancel = 1 AND owner_pid = ? "
+                                "AND status IN ('queued', 'running')", (os.getpid(),)).fetchall()
+            self._cancelled = {row[0] for row in rows}
+
+    # --- jobs ------------------------------------------------------------
+    def save_job(self, job: dict):
+        """Queue `job` (a Job.to_dict()) to be written by the writer thread."""
+        with self._pending_lock:
+            self._pending_jobs[job["id"]] = job
+            self._queue()
+
+    def create_job(self, job: dict):
+        """Write a new job's row now rather than on the next flush, so every
+        worker can find it (to stream or cancel it) as soon as its ID is out."""
+        self._save_job(self._conn(), job)
+
+    def _save_job(self, conn, job: dict):
+        conn.execute(
+            """INSERT INTO jobs (id, kind, params, status, error, created, started, finished,
+                                 progress, artifacts, resources, log_lines, owner_pid)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (id) DO UPDATE SET
+                   status=excluded.status, error=excluded.error, started=excluded.started,
+                   finished=excluded.finished, progress=excluded.progress,
+                   artifacts=excluded.artifacts, resources=excluded.resources,
+                   log_lines=excluded.log_lines""",
+            (job["id"], job["kind"], json.dumps(job["params"]), job["status"], job["error"],
+             job["created"], job["started"], job["finished"], json.dumps(job["progress"]),
+             json.dumps(job["artifacts"]), json.dumps(job.get("resources")), job["log_lines"], os.getpid()),
+        )
+
+    def _row_to_dict(self, row) -> dict:
+        job = dict(zip(_JOB_COLUMNS, row))
+        for key in ("params", "progress", "artifacts"):
+            job[key] = json.loads(job[key])
+        job["resources"] = json.loads(job["resources"]) if job["resources"] else None
+        job["cancel"] = bool(job["cancel"])
+        return job
+
+    def get_job(self, job_id: str):
+        row = self._conn().execute(
+            f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_jobs(self, kind: str = None, limit: int = 200) -> list[dict]:
+        query = f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs"
+        args = ()
+        if kind:
+            query += " WHERE kind = ?"
+            args = (kind,)
+        rows = self._conn().execute(query + " ORDER BY created DESC LIMIT ?", args + (limit,)).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def list_resources(self, kind: str = None, limit: int = 200) -> list[dict]:
+        """{"kind", "params", "resources"} of the most recent jobs with recorded usage."""
+        query = "SELECT kind, params, resources FROM jobs WHERE resources IS NOT NULL AND resources != 'null'"
+        args = ()
+        if kind:
+            query += " AND kind = ?"
+            args = (kind,)
+        rows = self._conn().execute(query + " ORDER BY created DESC LIMIT ?", args + (limit,)).fetchall()
+        return [{"kind": row[0], "params": json.loads(row[1]), "resources": json.loads(row[2])} for row in rows]
+
+    def request_cancel(self, job_id: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE jobs SET cancel = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,)
+        )
+        return cur.rowcount > 0
+
+    def cancel_requested(self, job_id: str) -> bool:
+        """Whether a cancel was requested for one of this process's jobs, as of
+        the writer thread's last read; never touches the database."""
+        return job_id in self._cancelled
+
+    def reap(self):
+        """Fail jobs whose worker process died while they were running."""
+        conn = self._conn()
+        rows = conn.execute("SELECT id, owner_pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        for job_id, pid in rows:
+            if not _pid_alive(pid):
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'worker exited', finished = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+
+    def prune(self, keep: int):
+        """Queue forgetting all but the `keep` most recently finished jobs."""
+        with self._pending_lock:
+            self._pending_prune = keep
+            self._queue()
+
+    def _prune(self, conn, keep: int):
+        conn.execute(
+            """DELETE FROM job_log WHERE job_id IN (
+                   SELECT id FROM jobs WHERE finished IS NOT NULL
+                   ORDER BY finished DESC LIMIT -1 OFFSET ?)""", (keep,))
+        conn.execute(
+            """DELETE FROM jobs WHERE id IN (
+                   SELECT id FROM jobs WHERE finished IS NOT NULL
+                   ORDER BY finished DESC LIMIT -1 OFFSET ?)""", (keep,))
+
+    # --- log -------------------------------------------------------------
+    def append_log(self, job_id: str, seq: int, line: str, keep: int = None):
+        """Queue one log line; with `keep`, lines older than the last `keep` are dropped now and then."""
+        with self._pending_lock:
+            self._pending_log.append((job_id, seq, line))
+            if keep and seq >= keep and seq % LOG_TRIM_EVERY == 0:
+                self._pending_trim[job_id] = (seq, keep)
+            self._queue()
+
+    def first_seq(self, job_id: str) -> int:
+        row = self._conn().execute("SELECT MIN(seq) FROM job_log WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+    def lines_since(self, job_id: str, seq: int, limit: int = 1000) -> list[tuple[int, str]]:
+        return [tuple(row) for row in self._conn().execute(
+            "SELECT seq, line FROM job_log WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (job_id, seq, limit),
+        )]
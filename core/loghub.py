@@ -0,0 +1,60 @@
+# core/loghub.py
+# Push notification for log streams. Publishers (job threads) wake every
+# waiting SSE subscriber at once instead of each subscriber polling.
+import asyncio
+import threading
+
+
+class LogHub:
+    """One shared fan-out per log.
+
+    All subscribers on an event loop wait on the same asyncio.Event; a
+    publish sets it (thread-safely) and starts a new generation, so the
+    cost of a new line is one wake-up per loop, not one per viewer.
+
+    Subscribers must take the event *before* reading the log and only then
+    wait on it, so a line published in between is never missed:
+
+        event = hub.event()
+        lines = job.lines_since(last)
+        if not lines:
+            await event.wait()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}   # {loop: asyncio.Event} for the current generation
+
+    def event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            event = self._events.get(loop)
+            if event is None:
+                event = self._events[loop] = asyncio.Event()
+            return event
+
+    def publish(self):
+        with self._lock:
+            events, self._events = self._events, {}
+        for loop, event in events.items():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+
+class PollingHub:
+    """LogHub stand-in for logs written by another process.
+
+    There is nobody in this process to publish, so each event simply fires
+    after `interval` seconds and the subscriber re-reads the shared store.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+
+    def event(self) -> asyncio.Event:
+        event = asyncio.Event()
+        asyncio.get_running_loop().call_later(self.interval, event.set)
+        return event
+
+    def publish(self):
+        pass
@@ -0,0 +1,144 @@
+# core/nds_catalog.py
+# Persistent, versioned NDS channel catalog. Channel listings are fetched
+# once per host/detector, written to disk and refreshed in the background,
+# so dropdowns never wait on a full `query_nds2` listing.
+import json
+import logging
+import os
+import threading
+import time
+
+from gwpy.detector import ChannelList
+
+from .channel_table import ChannelTable
+from .singleflight import SingleFlight
+
+NDS_HOST = "nds.gwosc.org"
+CATALOG_DIR = "./uploads/catalog"
+CATALOG_VERSION = 1             # bump when the on-disk layout changes
+CATALOG_MAX_AGE = 24 * 3600     # seconds before a background refresh is started
+
+logger = logging.getLogger("nds_catalog")
+
+
+class ChannelCatalog:
+    def __init__(self, host: str = NDS_HOST, directory: str = CATALOG_DIR, max_age: float = CATALOG_MAX_AGE):
+        self.host = host
+        self.directory = os.path.join(directory, host)
+        self.max_age = max_age
+        self._entries = {}          # {detector: (mtime, entry)}
+        self._tables = {}           # {detector: ((revision, updated), ChannelTable)}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, detector: str) -> str:
+        return os.path.join(self.directory, f"{detector}.json")
+
+    # --- reading ---------------------------------------------------------
+    def _load(self, detector: str):
+        path = self.path(detector)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._entries.get(detector)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable catalog {path}: {e}")
+            return None
+        if entry.get("version") != CATALOG_VERSION:
+            return None
+        with self._lock:
+            self._entries[detector] = (mtime, entry)
+        return entry
+
+    def entry(self, detector: str) -> dict:
+        """Catalog entry for `detector`, fetching it on first use.
+
+        A stale entry is still served immediately; a refresh is started in
+        the background and picked up on the next call once written.
+        """
+        entry = self._load(detector)
+        if entry is None:
+            # First use: many callers may arrive at once, only one lists the host
+            return self._flight.do(detector, self.refresh, detector)
+        if time.time() - entry["updated"] > self.max_age:
+            self.refresh_async(detector)
+        return entry
+
+    def table(self, detector: str) -> ChannelTable:
+        """Indexed in-memory table for `detector`, rebuilt only when the catalog changes."""
+        entry = self.entry(detector)
+        key = (entry["revision"], entry["updated"])
+        with self._lock:
+            cached = self._tables.get(detector)
+        if cached and cached[0] == key:
+            return cached[1]
+        table = ChannelTable(detector, entry["channels"])
+        with self._lock:
+            self._tables[detector] = (key, table)
+        return table
+
+    def groups(self, detector: str) -> list[str]:
+        return self.table(detector).groups()
+
+    def channels(self, detector: str, group: str = None) -> list[tuple[str, float]]:
+        table = self.table(detector)
+        return table.group(group) if group else table.rows(range(len(table)))
+
+    # --- writing ---------------------------------------------------------
+    def refresh(self, detector: str) -> dict:
+        chanlist = ChannelList.query_nds2(f'{detector}:*', host=self.host)
+        previous = self._load(detector)
+        entry = {
+            "version": CATALOG_VERSION,
+            "revision": (previous["revision"] + 1) if previous else 1,
+            "host": self.host,
+            "detector": detector,
+            "updated": time.time(),
+            "channels": [[chan.name, float(chan.sample_rate.value)] for chan in chanlist],
+        }
+        path = self.path(detector)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # readers never see a half-written catalog
+        logger.info(f"Catalog {self.host}/{detector} revision {entry['revision']}: {len(entry['channels'])} channels")
+        return entry
+
+    def refresh_async(self, detector: str):
+        with self._lock:
+            if detector in self._refreshing:
+                return
+            self._refreshing.add(detector)
+
+        def worker():
+            try:
+                self.refresh(detector)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.host}/{detector} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(detector)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+
+_catalogs: dict[str, ChannelCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(host: str = NDS_HOST) -> ChannelCatalog:
+    """Return the shared catalog for `host`."""
+    with _catalogs_lock:
+        catalog = _catalogs.get(host)
+        if catalog is None:
+            catalog = _catalogs[host] = ChannelCatalog(host)
+        return catalog
@@ -1,15 +1,30 @@
 # core/omicron.py
+import asyncio
 import os
+import re
+import signal
 import subprocess
 import platform
+import math
+import time
 from pathlib import Path
 
+import numpy as np
+from astropy.table import vstack
+from gwpy.segments import Segment, SegmentList
+from gwpy.table import EventTable
+
+from .omicron_config import OmicronConfig
+from .resources import track_process
+
 OMICRON_OUT = "./uploads/OmicronOut"
 os.makedirs(OMICRON_OUT, exist_ok=True)
 
-def generate_fin_ffl(channel_dir, selected_segments):
-    """Same logic as your generate_fin_ffl()"""
-    fin_path = Path(channel_dir) / "fin.ffl"
+def generate_fin_ffl(channel_dir, selected_segments, fin_path=None):
+    """Same logic as your generate_fin_ffl(); written to `fin_path` if given,
+    else <channel_dir>/fin.ffl"""
+    fin_path = Path(fin_path) if fin_path else Path(channel_dir) / "fin.ffl"
+    fin_path.parent.mkdir(parents=True, exist_ok=True)
     with open(fin_path, "w") as f:
         for seg in selected_segments:
             seg_path = Path(channel_dir) / seg
@@ -23,40 +38,511 @@ def generate_fin_ffl(channel_dir, selected_segments):
             f.write(f"./{rel} {start} {duration} 0 0\n")
     return str(fin_path)
 
-def run_omicron(ffl_path, config_path="config.txt", output_dir=OMICRON_OUT):
-    if not os.path.exists(ffl_path):
-        yield "[ERROR] .ffl file not found"
-        return
+OMICRON_POLL = 0.5        # seconds between reads of the growing omicron.out
+OMICRON_READ = 64 * 1024  # bytes read from the log per poll
+
+# Omicron reports the chunk it is working on; the wording differs between
+# versions and verbosity levels, so only the numbers are picked out.
+_CHUNK_RE = re.compile(r"chunk\D{0,5}(\d+)(?:\s*/\s*(\d+))?", re.IGNORECASE)
+_GPS_RE = re.compile(r"\b(\d{9,10})(?:\.\d+)?\s*-\s*(\d{9,10})\b")
 
+
+def read_ffl(ffl_path):
+    """[(path, start, duration)] for each frame listed in an FFL file."""
+    frames = []
     with open(ffl_path) as f:
-        lines = [l.strip().split() for l in f if l.strip()]
-    if not lines:
-        yield "[ERROR] Empty .ffl"
-        return
-    first_time = lines[0][1]
-    last_time = lines[-1][1]
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3:
+                frames.append((parts[0], int(float(parts[1])), int(float(parts[2]))))
+    return frames
+
+
+def ffl_span(ffl_path):
+    """(first, last) GPS times covered by an FFL, or None if it is empty."""
+    frames = read_ffl(ffl_path)
+    if not frames:
+        return None
+    return min(f[1] for f in frames), max(f[1] + f[2] for f in frames)
+
 
+def ffl_segments(ffl_path) -> SegmentList:
+    """Data covered by the frames listed in an FFL."""
+    return SegmentList(Segment(start, start + duration) for _, start, duration in read_ffl(ffl_path)).coalesce()
+
+
+def data_blocks(segments, min_duration=0):
+    """[(start, end)] of each contiguous stretch of `segments` lasting at least
+    `min_duration` seconds. Omicron can't estimate a PSD over anything shorter
+    than PSDLENGTH, so those stretches are left out of a run."""
+    return [(int(seg[0]), int(seg[1])) for seg in segments if abs(seg) >= min_duration]
+
+
+def describe_blocks(blocks, segments) -> str:
+    """One log line on what a gap-aware plan runs over and what it skips."""
+    covered = sum(end - start for start, end in blocks)
+    skipped = int(abs(segments)) - covered
+    text = f"{len(blocks)} contiguous block(s), {covered} s of data"
+    if skipped:
+        text += f"; skipping {skipped} s in block(s) shorter than PSDLENGTH"
+    return text
+
+
+def omicron_command(first_time, last_time, config_path):
     if platform.system() == "Windows":
         # Exact same WSL logic you wrote
-        cmd = [
+        return [
             "wsl", "bash", "-lic",
-            f"cd '{os.getcwd()}' && "
-            f"omicron {first_time} {last_time} {config_path} > omicron.out 2>&1"
+            f"cd '{os.getcwd()}' && omicron {first_time} {last_time} {config_path}"
         ]
+    return ["omicron", str(first_time), str(last_time), config_path]
+
+
+def parse_progress(line, first_time=None, last_time=None):
+    """Progress fields found in one omicron.out line, e.g. {"chunk": 3, "gps": 1238112210}."""
+    progress = {}
+    m = _CHUNK_RE.search(line)
+    if m:
+        progress["chunk"] = int(m.group(1))
+        if m.group(2):
+            progress["chunks"] = int(m.group(2))
+    m = _GPS_RE.search(line)
+    if m:
+        progress["gps"] = int(m.group(2))
+        if first_time is not None and last_time is not None and float(last_time) > float(first_time):
+            done = (int(m.group(2)) - float(first_time)) / (float(last_time) - float(first_time))
+            progress["percent"] = round(100 * min(max(done, 0.0), 1.0), 1)
+    return progress
+
+
+class LogTail:
+    """Incremental reader for a log file another process is appending to."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._partial = b""
+
+    def read_lines(self, final=False):
+        """Complete lines appended since the last call (plus the unterminated
+        remainder when `final`). Never blocks waiting for output."""
+        if self._file is None:
+            try:
+                self._file = open(self.path, "rb")
+            except FileNotFoundError:
+                return []
+        data = self._partial + self._file.read(-1 if final else OMICRON_READ)
+        *lines, self._partial = data.split(b"\n")
+        if final and self._partial:
+            lines.append(self._partial)
+            self._partial = b""
+        return [l.decode("utf-8", "replace").rstrip("\r") for l in lines if l.strip()]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _kill(process, posix):
+    if posix:
+        os.killpg(process.pid, signal.SIGKILL)  # omicron and anything it started
     else:
-        cmd = f"omicron {first_time} {last_time} {config_path} > omicron.out 2>&1"
+        process.kill()
 
-    yield "[INFO] Starting OMICRON..."
-    process = subprocess.Popen(cmd, shell=isinstance(cmd, str), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
 
-    while True:
-        line = process.stdout.readline()
-        if line == "" and process.poll() is not None:
-            break
-        if line:
-            yield line.strip()
+def load_config(config):
+    """OmicronConfig from a config file path, or `config` itself if it already is one."""
+    return config if isinstance(config, OmicronConfig) else OmicronConfig.read(config)
+
+
+def run_directory(output_dir=OMICRON_OUT, run_id=None):
+    """Where a run keeps its config snapshot, log and triggers."""
+    return os.path.join(output_dir, f"run-{run_id or time.strftime('%Y%m%d-%H%M%S')}")
+
+
+def run_config(ffl_path, config, run_dir):
+    """`config` pointed at `ffl_path` and writing its output to `run_dir`."""
+    return load_config(config).with_params({"OUTPUT DIRECTORY": run_dir, "DATA FFL": ffl_path})
+
+
+def prepare_run(ffl_path, config, run_dir):
+    """Snapshot the run's config into `run_dir`, pointed at `ffl_path` and
+    writing its output there. Returns (config, snapshot path)."""
+    config = run_config(ffl_path, config, run_dir)
+    return config, config.snapshot(run_dir)
+
+
+def run_omicron(ffl_path, config="config.txt", output_dir=OMICRON_OUT, run_id=None):
+    if not os.path.exists(ffl_path):
+        yield "[ERROR] .ffl file not found"
+        return
+    span = ffl_span(ffl_path)
+    if span is None:
+        yield "[ERROR] Empty .ffl"
+        return
+    run_dir = run_directory(output_dir, run_id)
+    config, config_path = prepare_run(ffl_path, config, run_dir)
+    segments = ffl_segments(ffl_path)
+    blocks = data_blocks(segments, config.psd_length)
+    if not blocks:
+        yield f"[ERROR] No stretch of data in the .ffl lasts PSDLENGTH ({config.psd_length} s)"
+        return
+    log_path = os.path.join(run_dir, "omicron.out")
+
+    yield f"[INFO] Starting OMICRON with {config_path} over {describe_blocks(blocks, segments)}..."
+    posix = platform.system() != "Windows"
+    open(log_path, "wb").close()
+    tail = LogTail(log_path)
+    process = None
+    try:
+        # One omicron per block, so no time goes to the gaps between them
+        for block in blocks:
+            # omicron writes to log_path directly; we tail the file rather than a pipe
+            with open(log_path, "ab") as out:
+                process = subprocess.Popen(omicron_command(*block, config_path), stdout=out,
+                                           stderr=subprocess.STDOUT, start_new_session=posix)
+            track_process(process.pid)
+            while True:
+                finished = process.poll() is not None
+                yield from tail.read_lines(final=finished)
+                if finished:
+                    break
+                time.sleep(OMICRON_POLL)
+            if process.returncode != 0:
+                break
+    finally:
+        tail.close()
+        # Generator closed early (e.g. job cancelled): don't leave OMICRON running
+        if process is not None and process.poll() is None:
+            _kill(process, posix)
+            process.wait()
+
+    if process.returncode == 0:
+        yield f"[SUCCESS] OMICRON finished – results in {run_dir}"
+    else:
+        yield f"[ERROR] OMICRON failed (code {process.returncode})"
+
+
+async def run_omicron_async(ffl_path, config="config.txt", output_dir=OMICRON_OUT, run_id=None,
+                            on_progress=None, should_stop=None):
+    """Async version of run_omicron for the web service.
+
+    The process runs without a pipe and its log file is polled from the event
+    loop, so no thread is tied up for the length of the run. `on_progress`
+    receives parsed progress dicts; `should_stop()` is checked on every poll
+    and stops the run (the process is killed) when it returns True.
+    """
+    if not os.path.exists(ffl_path):
+        yield "[ERROR] .ffl file not found"
+        return
+    span = ffl_span(ffl_path)
+    if span is None:
+        yield "[ERROR] Empty .ffl"
+        return
+    first_time, last_time = span
+    run_dir = run_directory(output_dir, run_id)
+    config, config_path = prepare_run(ffl_path, config, run_dir)
+    segments = ffl_segments(ffl_path)
+    blocks = data_blocks(segments, config.psd_length)
+    if not blocks:
+        yield f"[ERROR] No stretch of data in the .ffl lasts PSDLENGTH ({config.psd_length} s)"
+        return
+    log_path = os.path.join(run_dir, "omicron.out")
+
+    yield f"[INFO] Starting OMICRON with {config_path} over {describe_blocks(blocks, segments)}..."
+    posix = platform.system() != "Windows"
+    open(log_path, "wb").close()
+    tail = LogTail(log_path)
+    process = None
+    try:
+        # One omicron per block in turn; they share the log and the output directory
+        for block in blocks:
+            with open(log_path, "ab") as out:
+                process = await asyncio.create_subprocess_exec(*omicron_command(*block, config_path),
+                                                               stdout=out, stderr=subprocess.STDOUT,
+                                                               start_new_session=posix)
+            track_process(process.pid)
+            while True:
+                finished = process.returncode is not None
+                for line in tail.read_lines(final=finished):
+                    progress = parse_progress(line, first_time, last_time)
+                    if progress and on_progress is not None:
+                        on_progress(progress)
+                    yield line
+                if finished:
+                    break
+                if should_stop is not None and should_stop():
+                    yield "[WARNING] Stopping OMICRON"
+                    return
+                try:
+                    await asyncio.wait_for(process.wait(), OMICRON_POLL)
+                except asyncio.TimeoutError:
+                    pass
+            if process.returncode != 0:
+                break
+    finally:
+        tail.close()
+        if process is not None and process.returncode is None:
+            _kill(process, posix)
+            await process.wait()
 
     if process.returncode == 0:
-        yield "[SUCCESS] OMICRON finished – results in ./uploads/OmicronOut"
+        if on_progress is not None:
+            on_progress({"percent": 100.0, "run_dir": run_dir, "succeeded": True})
+        yield f"[SUCCESS] OMICRON finished – results in {run_dir}"
     else:
-        yield f"[ERROR] OMICRON failed (code {process.returncode})"
\ No newline at end of file
+        yield f"[ERROR] OMICRON failed (code {process.returncode})"
+
+
+# --- parallel runs -------------------------------------------------------
+TRIGGER_EXTENSIONS = {"root": (".root",), "hdf5": (".h5", ".hdf5"), "xml": (".xml", ".xml.gz")}
+
+
+def plan_chunks(first, last, timing, psd_length, workers, bounds=None):
+    """Split [first, last) into up to `workers` spans for separate omicron runs.
+
+    Returns (core_start, core_end, run_start, run_end) tuples. Core spans are
+    whole multiples of the chunk stride (chunk - overlap), so each run tiles
+    its data like a single run would. Runs start `psd_length` early (rounded
+    up to a stride) so the PSD is settled by the core span, and end one
+    overlap late. Only triggers inside the core span are kept when merging.
+    Runs may reach outside [first, last) up to `bounds` (the data around
+    the span), which defaults to the span itself.
+    """
+    low, high = bounds or (first, last)
+    chunk, overlap = timing
+    stride = max(chunk - overlap, 1)
+    strides = max(1, math.ceil(max(last - first - overlap, 0) / stride))
+    workers = max(1, min(workers, strides))
+    per_worker = math.ceil(strides / workers)
+    lead = math.ceil(max(psd_length, overlap // 2) / stride) * stride
+    plans = []
+    for i in range(workers):
+        core_start = first + i * per_worker * stride
+        if core_start >= last:
+            break
+        core_end = last if i == workers - 1 else min(last, core_start + per_worker * stride)
+        plans.append((core_start, core_end, max(low, core_start - lead), min(high, core_end + overlap)))
+    return plans
+
+
+def find_trigger_files(directory, fmt):
+    extensions = TRIGGER_EXTENSIONS.get(fmt, (f".{fmt}",))
+    found = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, f) for f in files if f.endswith(extensions))
+    return sorted(found)
+
+
+def read_triggers(files, fmt):
+    if fmt == "root":
+        return EventTable.read(files, format="root", treename="triggers")
+    if fmt == "hdf5":
+        return EventTable.read(files, format="hdf5", path="triggers")
+    return EventTable.read(files, format="ligolw", tablename="sngl_burst")
+
+
+def trigger_times(table):
+    if "time" in table.colnames:
+        return np.asarray(table["time"], dtype=float)
+    return np.asarray(table["peak_time"], dtype=float) + np.asarray(table["peak_time_ns"], dtype=float) * 1e-9
+
+
+def merge_triggers(parts, fmt, dest, base=None):
+    """Combine the triggers of several runs into one HDF5 table at `dest`.
+
+    `parts` is [(output directory, core_start, core_end)]; each run only
+    contributes triggers inside its own core span, so overlaps count once.
+    With `base` (an earlier merged table) its triggers are kept too, except
+    inside the new core spans. Returns the number of triggers written.
+    """
+    tables = []
+    spans = []
+    for directory, start, end in parts:
+        spans.append((start, end))
+        files = find_trigger_files(directory, fmt)
+        if not files:
+            continue
+        table = read_triggers(files, fmt)
+        times = trigger_times(table)
+        tables.append(table[(times >= start) & (times < end)])
+    if base is not None and os.path.exists(base):
+        table = EventTable.read(base, format="hdf5", path="triggers")
+        times = trigger_times(table)
+        keep = np.ones(len(table), dtype=bool)
+        for start, end in spans:
+            keep &= (times < start) | (times >= end)
+        tables.insert(0, table[keep])
+    if not tables:
+        return 0
+    merged = vstack(tables, join_type="exact") if len(tables) > 1 else tables[0]
+    merged = merged[np.argsort(trigger_times(merged), kind="stable")]
+    _write_table(merged, dest)
+    return len(merged)
+
+
+def filter_triggers(source, fmt, dest, snr_min=None, frequency_range=None):
+    """Write the triggers of `source` (a trigger table, or a run directory
+    holding `fmt` files) with snr >= snr_min and frequency inside
+    `frequency_range` to an HDF5 table at `dest`. Returns the number kept.
+    """
+    files = [source] if os.path.isfile(source) else find_trigger_files(source, fmt)
+    if not files:
+        return 0
+    table = read_triggers(files, fmt)
+    keep = np.ones(len(table), dtype=bool)
+    if snr_min is not None:
+        keep &= np.asarray(table["snr"], dtype=float) >= snr_min
+    if frequency_range is not None:
+        low, high = frequency_range
+        frequency = np.asarray(table["frequency" if "frequency" in table.colnames else "peak_frequency"], dtype=float)
+        keep &= (frequency >= low) & (frequency <= high)
+    table = table[keep]
+    table = table[np.argsort(trigger_times(table), kind="stable")]
+    _write_table(table, dest)
+    return len(table)
+
+
+def _write_table(table, dest):
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    table.write(tmp_path, format="hdf5", path="triggers", overwrite=True)
+    os.replace(tmp_path, dest)  # readers of an existing store never see a partial file
+
+
+async def run_omicron_parallel_async(ffl_path, config="config.txt", output_dir=OMICRON_OUT, workers=None,
+                                     run_id=None, on_progress=None, should_stop=None, spans=None,
+                                     merge_into=None):
+    """Run omicron over an FFL as several processes, one per CPU core by
+    default, then merge their triggers into one table.
+
+    `spans` limits the analysis to [(start, end, low, high)] intervals, where
+    low/high bound how far a run may read around the interval for PSD
+    estimation; by default every contiguous block of data at least PSDLENGTH
+    long is analysed and the gaps between them are skipped. At most `workers`
+    processes run at once. Each gets its own config snapshot and log under
+    <output_dir>/run-<run_id>/part-N, and its log lines are prefixed with the
+    part number. With `merge_into`, triggers are merged into that existing
+    table instead of a new one in the run directory.
+    """
+    if not os.path.exists(ffl_path):
+        yield "[ERROR] .ffl file not found"
+        return
+    span = ffl_span(ffl_path)
+    if span is None:
+        yield "[ERROR] Empty .ffl"
+        return
+    first_time, last_time = span
+    workers = workers or os.cpu_count() or 1
+    run_dir = run_directory(output_dir, run_id)
+    config, config_path = prepare_run(ffl_path, config, run_dir)
+    if spans is None:
+        segments = ffl_segments(ffl_path)
+        blocks = data_blocks(segments, config.psd_length)
+        if not blocks:
+            yield f"[ERROR] No stretch of data in the .ffl lasts PSDLENGTH ({config.psd_length} s)"
+            return
+        yield f"[INFO] Data in {describe_blocks(blocks, segments)}"
+        spans = [(start, end, start, end) for start, end in blocks]
+    total = sum(end - start for start, end, _, _ in spans) or 1
+    plans = []
+    for start, end, low, high in spans:
+        share = max(1, round(workers * (end - start) / total))
+        plans.extend(plan_chunks(start, end, config.timing, config.psd_length, share, bounds=(low, high)))
+    yield (f"[INFO] Starting OMICRON as {len(plans)} part(s) on up to {workers} core(s) "
+           f"for {first_time}-{last_time} with {config_path}")
+
+    posix = platform.system() != "Windows"
+    parts = [{"dir": os.path.join(run_dir, f"part-{i + 1}"), "core": (core_start, core_end),
+              "run": (run_start, run_end), "process": None, "percent": 0.0}
+             for i, (core_start, core_end, run_start, run_end) in enumerate(plans)]
+    try:
+        while True:
+            # Start queued parts while fewer than `workers` are running
+            running = [p for p in parts if p["process"] is not None and p["process"].returncode is None]
+            failed = any(p["process"] is not None and p["process"].returncode not in (None, 0) for p in parts)
+            for i, part in enumerate(parts):
+                if len(running) >= workers or failed:
+                    break  # a failed part means no merge, so don't start more
+                if part["process"] is not None:
+                    continue
+                _, part_config_path = prepare_run(ffl_path, config, part["dir"])
+                log_path = os.path.join(part["dir"], "omicron.out")
+                with open(log_path, "wb") as out:
+                    part["process"] = await asyncio.create_subprocess_exec(
+                        *omicron_command(*part["run"], part_config_path),
+                        stdout=out, stderr=subprocess.STDOUT, start_new_session=posix)
+                track_process(part["process"].pid)
+                part["waiter"] = asyncio.ensure_future(part["process"].wait())
+                part["tail"] = LogTail(log_path)
+                running.append(part)
+                yield (f"[INFO] Part {i + 1}: {part['run'][0]}-{part['run'][1]} "
+                       f"(keeping {part['core'][0]}-{part['core'][1]})")
+
+            started = [p for p in parts if p["process"] is not None]
+            for i, part in enumerate(parts):
+                if part["process"] is None:
+                    continue
+                for line in part["tail"].read_lines(final=part["process"].returncode is not None):
+                    progress = parse_progress(line, *part["run"])
+                    if "percent" in progress:
+                        part["percent"] = progress["percent"]
+                        if on_progress is not None:
+                            on_progress({"percent": round(sum(p["percent"] for p in parts) / len(parts), 1),
+                                         "parts_done": len(started) - len(running)})
+                    yield f"[{i + 1}/{len(parts)}] {line}"
+            if not running and (failed or len(started) == len(parts)):
+                break
+            if should_stop is not None and should_stop():
+                yield "[WARNING] Stopping OMICRON"
+                return
+            if running:
+                await asyncio.wait([p["waiter"] for p in running],
+                                   timeout=OMICRON_POLL, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for part in parts:
+            if part["process"] is None:
+                continue
+            part["tail"].close()
+            if part["process"].returncode is None:
+                _kill(part["process"], posix)
+                await part["process"].wait()
+
+    failed = [i + 1 for i, p in enumerate(parts) if p["process"] is None or p["process"].returncode != 0]
+    if failed:
+        yield f"[ERROR] OMICRON failed in part(s) {', '.join(map(str, failed))}"
+        return
+
+    if merge_into is not None:
+        merged_path = merge_into
+    else:
+        channel = next((c for c in config.channels if ":" in c), "triggers").replace(":", "_")
+        merged_path = os.path.join(run_dir, f"{channel}_OMICRON-{first_time}-{last_time - first_time}.h5")
+    yield "[INFO] Merging triggers..."
+    count = await asyncio.get_running_loop().run_in_executor(
+        None, merge_triggers, [(p["dir"], *p["core"]) for p in parts], config.output_format, merged_path,
+        merge_into)
+    if on_progress is not None:
+        on_progress({"percent": 100.0, "parts_done": len(parts), "triggers": count, "merged": merged_path,
+                     "run_dir": run_dir, "succeeded": True})
+    yield f"[SUCCESS] OMICRON finished – {count} trigger(s) merged into {merged_path}"
+
+
+def iterate_blocking(lines):
+    """Blocking generator over an async generator, stepped on a private event
+    loop, for the desktop app and CLI which run Omicron from a plain thread."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(lines.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(lines.aclose())
+        loop.close()
+
+
+def run_omicron_parallel(*args, **kwargs):
+    """Blocking version of run_omicron_parallel_async."""
+    yield from iterate_blocking(run_omicron_parallel_async(*args, **kwargs))
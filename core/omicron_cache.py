@@ -0,0 +1,223 @@
+# core/omicron_cache.py
+# Omicron result cache. A run is keyed by its config digest plus the frames
+# it reads (path, size, checksum); submitting the same FFL with unchanged
+# settings returns the earlier run directory instead of recomputing it.
+# Cached run directories are evicted least-recently-used first once their
+# total size exceeds the budget.
+#
+# A run also serves as a superset for stricter requests: entries record the
+# config digest without the trigger filters (SNR threshold, frequency range)
+# and the filter values used, so a request that only raises the threshold or
+# narrows the band is answered by filtering the cached triggers.
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from .omicron import OMICRON_OUT, read_ffl
+
+CACHE_DIR = os.path.join(OMICRON_OUT, "cache")
+CACHE_BUDGET = int(os.environ.get("GWCLOUD_OMICRON_CACHE_BYTES", 20 * 1024 ** 3))
+HASH_CHUNK = 4 * 1024 * 1024
+# Threshold for runs asked to keep a superset of triggers
+SUPERSET_SNR_THRESHOLD = float(os.environ.get("GWCLOUD_OMICRON_SUPERSET_SNR", 5.0))
+
+logger = logging.getLogger("omicron_cache")
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _write_json(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def superset_config(config):
+    """`config` with a low SNR threshold and its band opened up to Nyquist, so
+    the run holds the triggers of any stricter request over the same frames."""
+    low, high = config.frequency_range
+    if config.sample_frequency:
+        high = max(high, config.sample_frequency / 2)
+    return config.with_params({"snr_threshold": f"{min(config.snr_threshold, SUPERSET_SNR_THRESHOLD):g}",
+                               "frequency_range": [f"{low:g}", f"{high:g}"]})
+
+
+class ResultCache:
+    def __init__(self, directory: str = CACHE_DIR, budget: int = CACHE_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._checksums_path = os.path.join(directory, "checksums.json")
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+        try:
+            with open(self._checksums_path) as f:
+                self._checksums = json.load(f)
+        except (OSError, ValueError):
+            self._checksums = {}
+
+    # --- keys ------------------------------------------------------------
+    def checksum(self, path: str) -> str:
+        """sha256 of a frame file, remembered while its size and mtime stay the same."""
+        digest, new = self._checksum(path)
+        if new:
+            self._save_checksums()
+        return digest
+
+    def _checksum(self, path: str) -> tuple[str, bool]:
+        # (digest, whether it had to be computed); new digests are kept in memory only
+        st = os.stat(path)
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            known = self._checksums.get(abs_path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2], False
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._checksums[abs_path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest, True
+
+    def _save_checksums(self):
+        with self._lock:
+            _write_json(self._checksums_path, self._checksums)
+
+    def key(self, ffl_path: str, config_digest: str, mode: str = "") -> str:
+        """Cache key for running `ffl_path` with a config. Reads every frame
+        once (later calls reuse the remembered checksums); call off the loop."""
+        h = hashlib.sha256(f"{config_digest}\n{mode}\n".encode())
+        hashed = False
+        for path, start, duration in read_ffl(ffl_path):
+            digest, new = self._checksum(path)
+            hashed = hashed or new
+            h.update(f"{path}\t{start}\t{duration}\t{os.path.getsize(path)}\t{digest}\n".encode())
+        if hashed:
+            self._save_checksums()  # once per FFL, not once per frame
+        return h.hexdigest()[:32]
+
+    # --- entries ---------------------------------------------------------
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, "entries", f"{key}.json")
+
+    def lookup(self, key: str):
+        """The run directory cached under `key`, or None."""
+        with self._lock:
+            try:
+                with open(self._entry_path(key)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if not os.path.isdir(entry["run_dir"]):
+                os.remove(self._entry_path(key))
+                return None
+            entry["last_used"] = time.time()
+            _write_json(self._entry_path(key), entry)
+            return entry["run_dir"]
+
+    def find_superset(self, base_key: str, snr_threshold: float, frequency_range):
+        """A cached run whose triggers include everything a request with these
+        filters would produce: same base key (see superset_key), a threshold no
+        higher and a band that covers `frequency_range`. Returns its superset
+        record ({"triggers", "format", "snr_threshold", "frequency_range", ...})
+        plus the run's "run_dir", or None; the smallest such superset (highest
+        threshold) wins."""
+        low, high = frequency_range
+        with self._lock:
+            best = None
+            for entry in self._entries():
+                superset = entry.get("superset")
+                if not superset or superset["base"] != base_key:
+                    continue
+                covered_low, covered_high = superset["frequency_range"]
+                if superset["snr_threshold"] > snr_threshold or covered_low > low or covered_high < high:
+                    continue
+                if not os.path.exists(superset["triggers"]):
+                    continue
+                if best is None or superset["snr_threshold"] > best["superset"]["snr_threshold"]:
+                    best = entry
+            if best is None:
+                return None
+            best["last_used"] = time.time()
+            _write_json(self._entry_path(best["key"]), best)
+            return dict(best["superset"], run_dir=best["run_dir"])
+
+    def superset_key(self, ffl_path: str, config) -> str:
+        """Key shared by every run over the same frames whose configs differ only in FILTER_KEYS."""
+        return self.key(ffl_path, config.base_digest(), "superset")
+
+    def store(self, key: str, run_dir: str, superset: dict = None):
+        """Cache a finished run's directory, then evict down to the budget.
+
+        `superset` ({"base", "snr_threshold", "frequency_range", "triggers",
+        "format"}) makes the run available to find_superset.
+        """
+        with self._lock:
+            entry = {
+                "key": key,
+                "run_dir": run_dir,
+                "size": _dir_size(run_dir),
+                "created": time.time(),
+                "last_used": time.time(),
+            }
+            if superset is not None:
+                entry["superset"] = superset
+            _write_json(self._entry_path(key), entry)
+            self._evict()
+
+    def _entries(self) -> list[dict]:
+        entries = []
+        for name in os.listdir(os.path.join(self.directory, "entries")):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, "entries", name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(e["size"] for e in entries)
+        for entry in sorted(entries, key=lambda e: e["last_used"]):
+            if total <= self.budget:
+                break
+            logger.info(f"Evicting cached Omicron run {entry['run_dir']} ({entry['size']} bytes)")
+            shutil.rmtree(entry["run_dir"], ignore_errors=True)
+            try:
+                os.remove(self._entry_path(entry["key"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the shared Omicron result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,193 @@
+# core/omicron_config.py
+# Read and write Omicron option files (config.txt). Each line is
+# "SECTION NAME<tab>value", e.g. "PARAMETER TIMING\t64 4"; the GUI also
+# writes the three-column form "PARAMETER\tTIMING\t64 4". Order is preserved
+# so a rewritten file diffs cleanly against the original.
+#
+# Runs never read the shared config.txt directly: they take a snapshot named
+# after the hash of its analysis settings plus a hash of its full content and
+# stored with the run's outputs. Snapshots are never overwritten, so edits to
+# config.txt (or another run's parameters) cannot change a run that has
+# already been submitted.
+import hashlib
+import os
+import stat
+import threading
+
+DEFAULT_TIMING = (64, 4)  # Omicron's default chunk and overlap durations, seconds
+DEFAULT_SNR_THRESHOLD = 7.0
+
+# Settings that only say where a run reads/writes, not what it computes;
+# left out of the digest so identical analyses hash the same.
+RUN_KEYS = ("OUTPUT DIRECTORY", "DATA FFL")
+
+# Settings that only decide which triggers are kept: a run with a lower
+# threshold and a wider band holds every trigger a stricter run would.
+FILTER_KEYS = ("PARAMETER SNRTHRESHOLD", "PARAMETER FREQUENCYRANGE")
+
+# Structured parameter names accepted by with_params / the web API
+PARAMETERS = {
+    "channels": "DATA CHANNELS",
+    "sample_frequency": "DATA SAMPLEFREQUENCY",
+    "timing": "PARAMETER TIMING",
+    "frequency_range": "PARAMETER FREQUENCYRANGE",
+    "q_range": "PARAMETER QRANGE",
+    "mismatch_max": "PARAMETER MISMATCHMAX",
+    "snr_threshold": "PARAMETER SNRTHRESHOLD",
+    "psd_length": "PARAMETER PSDLENGTH",
+    "output_format": "OUTPUT FORMAT",
+    "output_products": "OUTPUT PRODUCTS",
+    "output_verbosity": "OUTPUT VERBOSITY",
+}
+
+
+class OmicronConfig:
+    def __init__(self, entries=None):
+        self.entries = [list(e) for e in entries] if entries else []
+
+    @classmethod
+    def parse(cls, text: str) -> "OmicronConfig":
+        entries = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(None, 2)
+            if len(parts) < 2:
+                continue
+            entries.append([f"{parts[0]} {parts[1]}", parts[2].strip() if len(parts) > 2 else ""])
+        return cls(entries)
+
+    @classmethod
+    def read(cls, path: str) -> "OmicronConfig":
+        with open(path) as f:
+            return cls.parse(f.read())
+
+    def get(self, key: str, default=None):
+        for k, v in self.entries:
+            if k == key:
+                return v
+        return default
+
+    def set(self, key: str, value):
+        for entry in self.entries:
+            if entry[0] == key:
+                entry[1] = str(value)
+                return
+        self.entries.append([key, str(value)])
+
+    def copy(self) -> "OmicronConfig":
+        return OmicronConfig(self.entries)
+
+    def with_params(self, params: dict) -> "OmicronConfig":
+        """Copy with structured parameters applied, e.g. {"timing": [64, 4],
+        "snr_threshold": 7}. Raw keys ("PARAMETER QRANGE") are accepted too."""
+        config = self.copy()
+        for name, value in (params or {}).items():
+            key = PARAMETERS.get(name, name)
+            if key not in PARAMETERS.values() and key not in RUN_KEYS:
+                raise ValueError(f"Unknown Omicron parameter {name!r}")
+            if isinstance(value, (list, tuple)):
+                value = " ".join(str(v) for v in value)
+            config.set(key, value)
+        return config
+
+    def digest(self, exclude=()) -> str:
+        """Hash of the analysis settings, independent of order, spacing, RUN_KEYS and `exclude`."""
+        skipped = set(RUN_KEYS) | set(exclude)
+        normalized = sorted((k.upper(), " ".join(v.split())) for k, v in self.entries if k.upper() not in skipped)
+        text = "\n".join(f"{k}\t{v}" for k, v in normalized)
+        return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+    def base_digest(self) -> str:
+        """Hash of everything except the trigger filters (FILTER_KEYS); runs that
+        share it differ only in which triggers they keep."""
+        return self.digest(FILTER_KEYS)
+
+    def snapshot_path(self, directory: str) -> str:
+        """<directory>/config-<digest>-<content hash>.txt. The settings digest
+        leaves out RUN_KEYS; the content hash covers them, so configs that
+        differ only in their FFL or output directory get their own files."""
+        content = hashlib.sha256(self.render().encode()).hexdigest()[:8]
+        return os.path.join(directory, f"config-{self.digest()}-{content}.txt")
+
+    def snapshot(self, directory: str) -> str:
+        """Write this config read-only to snapshot_path(directory) and return the path.
+
+        An existing snapshot is reused, never overwritten.
+        """
+        path = self.snapshot_path(directory)
+        if os.path.exists(path):
+            return path
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        try:
+            os.replace(tmp_path, path)
+        except PermissionError:
+            # Windows: another run wrote the same snapshot first and it is read-only
+            os.chmod(tmp_path, stat.S_IWUSR | stat.S_IRUSR)
+            os.remove(tmp_path)
+            if not os.path.exists(path):
+                raise
+        return path
+
+    def render(self) -> str:
+        return "".join(f"{k}\t{v}\n" for k, v in self.entries)
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    # --- typed accessors -------------------------------------------------
+    @property
+    def timing(self) -> tuple[int, int]:
+        """(chunk duration, overlap duration) from PARAMETER TIMING."""
+        try:
+            chunk, overlap = (int(float(x)) for x in self.get("PARAMETER TIMING", "").split()[:2])
+            return chunk, overlap
+        except ValueError:
+            return DEFAULT_TIMING
+
+    @property
+    def psd_length(self) -> int:
+        """PARAMETER PSDLENGTH, defaulting to the chunk duration like Omicron does."""
+        try:
+            return int(float(self.get("PARAMETER PSDLENGTH")))
+        except (TypeError, ValueError):
+            return self.timing[0]
+
+    @property
+    def snr_threshold(self) -> float:
+        try:
+            return float(self.get("PARAMETER SNRTHRESHOLD"))
+        except (TypeError, ValueError):
+            return DEFAULT_SNR_THRESHOLD
+
+    @property
+    def sample_frequency(self):
+        try:
+            return float(self.get("DATA SAMPLEFREQUENCY"))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def frequency_range(self) -> tuple[float, float]:
+        """(low, high) from PARAMETER FREQUENCYRANGE; open-ended where unset."""
+        try:
+            low, high = (float(x) for x in self.get("PARAMETER FREQUENCYRANGE", "").split()[:2])
+            return low, high
+        except ValueError:
+            return 0.0, (self.sample_frequency or float("inf")) / 2
+
+    @property
+    def output_format(self) -> str:
+        formats = (self.get("OUTPUT FORMAT") or "root").split()
+        return formats[0] if formats else "root"
+
+    @property
+    def channels(self) -> list[str]:
+        return (self.get("DATA CHANNELS") or "").split()
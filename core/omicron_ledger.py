@@ -0,0 +1,181 @@
+# core/omicron_ledger.py
+# Which GPS intervals already have Omicron triggers, per channel and config
+# digest (see OmicronConfig.digest). Incremental runs analyse only what the
+# ledger does not cover yet and merge the new triggers into the same
+# per-channel/config trigger table, so a daily top-up costs minutes.
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from gwpy.segments import Segment, SegmentList
+
+from .omicron import OMICRON_OUT, ffl_segments, load_config, run_omicron_parallel_async
+
+try:
+    import fcntl
+except ImportError:  # Windows: the desktop app is a single process, the in-process lock is enough
+    fcntl = None
+
+LEDGER_VERSION = 1
+LEDGER_DIR = os.path.join(OMICRON_OUT, "ledger")
+LOCK_POLL = 2.0  # seconds between attempts while another run updates the same store
+
+logger = logging.getLogger("omicron_ledger")
+
+
+def _to_json(segments: SegmentList) -> list:
+    return [[int(seg[0]), int(seg[1])] for seg in segments]
+
+
+def _from_json(rows) -> SegmentList:
+    return SegmentList(Segment(start, end) for start, end in rows).coalesce()
+
+
+class TriggerLedger:
+    def __init__(self, directory: str = LEDGER_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._held = set()
+
+    def _dir(self, channel: str, digest: str) -> str:
+        return os.path.join(self.directory, channel.replace(":", "_"), digest)
+
+    def path(self, channel: str, digest: str) -> str:
+        return os.path.join(self._dir(channel, digest), "ledger.json")
+
+    def store_path(self, channel: str, digest: str) -> str:
+        """The merged trigger table for `channel` analysed with config `digest`."""
+        return os.path.join(self._dir(channel, digest), "triggers.h5")
+
+    def processed(self, channel: str, digest: str) -> SegmentList:
+        try:
+            with open(self.path(channel, digest)) as f:
+                data = json.load(f)
+            if data.get("version") == LEDGER_VERSION:
+                return _from_json(data["processed"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable ledger for {channel} ({digest}): {e}")
+        return SegmentList()
+
+    def missing(self, channel: str, digest: str, requested: SegmentList) -> SegmentList:
+        """Parts of `requested` that have no triggers yet."""
+        return (SegmentList(requested).coalesce() - self.processed(channel, digest)).coalesce()
+
+    def add(self, channel: str, digest: str, segments: SegmentList):
+        """Record `segments` as analysed (call after their triggers are merged)."""
+        with self._lock:
+            processed = (self.processed(channel, digest) | SegmentList(segments)).coalesce()
+            path = self.path(channel, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "version": LEDGER_VERSION,
+                    "channel": channel,
+                    "config": digest,
+                    "processed": _to_json(processed),
+                    "store": os.path.basename(self.store_path(channel, digest)),
+                }, f)
+            os.replace(tmp_path, path)
+
+    def try_lock(self, channel: str, digest: str):
+        """Take the channel/config store for one run without blocking.
+
+        Returns a handle for unlock(), or None while another run (in this or
+        another worker process) holds it.
+        """
+        key = (channel, digest)
+        with self._lock:
+            if key in self._held:
+                return None
+            self._held.add(key)
+        lock_file = None
+        if fcntl is not None:
+            os.makedirs(self._dir(channel, digest), exist_ok=True)
+            lock_file = open(os.path.join(self._dir(channel, digest), "lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                with self._lock:
+                    self._held.discard(key)
+                return None
+        return key, lock_file
+
+    def unlock(self, handle):
+        key, lock_file = handle
+        if lock_file is not None:
+            lock_file.close()  # releases the flock
+        with self._lock:
+            self._held.discard(key)
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> TriggerLedger:
+    """Return the shared trigger ledger."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TriggerLedger()
+        return _ledger
+
+
+async def run_omicron_incremental_async(ffl_path, channel, config="config.txt", ledger=None, output_dir=OMICRON_OUT,
+                                        workers=None, run_id=None, on_progress=None, should_stop=None):
+    """Analyse only the parts of an FFL the ledger has no triggers for yet and
+    merge them into the channel's trigger table for this config."""
+    ledger = ledger or get_ledger()
+    config = load_config(config)
+    digest = config.digest()
+    store = ledger.store_path(channel, digest)
+
+    handle = ledger.try_lock(channel, digest)
+    while handle is None:
+        if should_stop is not None and should_stop():
+            yield "[WARNING] Stopping OMICRON"
+            return
+        yield f"[INFO] Waiting for another run updating {channel} ({digest})..."
+        await asyncio.sleep(LOCK_POLL)
+        handle = ledger.try_lock(channel, digest)
+
+    try:
+        # Blocks too short for a PSD estimate can't be analysed, now or later
+        data = SegmentList(seg for seg in ffl_segments(ffl_path) if abs(seg) >= config.psd_length)
+        todo = ledger.missing(channel, digest, data)
+        if on_progress is not None:
+            on_progress({"config_hash": digest, "store": store, "new_seconds": int(abs(todo)),
+                         "requested_seconds": int(abs(data))})
+        if not todo:
+            yield f"[SUCCESS] Nothing new to analyse – {channel} already has triggers for this config in {store}"
+            return
+        yield f"[INFO] {int(abs(todo))} s of {int(abs(data))} s not analysed yet with config {digest}"
+
+        # Each new interval may read back into older data around it for the PSD
+        spans = []
+        for seg in todo:
+            around = next(d for d in data if seg[0] >= d[0] and seg[1] <= d[1])
+            spans.append((int(seg[0]), int(seg[1]), int(around[0]), int(around[1])))
+
+        merged = False
+
+        def progress(p):
+            nonlocal merged
+            merged = merged or "merged" in p
+            if on_progress is not None:
+                on_progress(p)
+
+        async for line in run_omicron_parallel_async(ffl_path, config, output_dir, workers, run_id,
+                                                     on_progress=progress, should_stop=should_stop,
+                                                     spans=spans, merge_into=store):
+            yield line
+        if merged:
+            ledger.add(channel, digest, todo)
+    finally:
+        ledger.unlock(handle)
@@ -0,0 +1,292 @@
+# core/omicron_sweep.py
+# Parameter sweeps: expand ranges of Omicron settings (SNR threshold, Q and
+# frequency ranges, mismatch, ...) into one config per combination, run them
+# side by side over the same FFL, and compare runtime and trigger statistics.
+#
+#   <output_dir>/run-<id>/run-N/           one ordinary run per combination
+#   <output_dir>/run-<id>/comparison.csv   one row per run
+#   <output_dir>/run-<id>/comparison.json
+import asyncio
+import csv
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+from .omicron import (OMICRON_OUT, OMICRON_POLL, LogTail, _kill, data_blocks, ffl_segments, ffl_span,
+                      find_trigger_files, iterate_blocking, load_config, omicron_command, parse_progress, prepare_run,
+                      read_triggers, run_directory)
+from .resources import track_process
+
+MAX_SWEEP_RUNS = 64
+# Rough peak memory of one omicron process; bounds how many run at once
+RUN_MEMORY = int(os.environ.get("GWCLOUD_OMICRON_RUN_MEMORY", 2 * 1024 ** 3))
+
+COMPARISON_COLUMNS = ["run", "config_hash", "status", "runtime_s", "triggers", "rate_hz",
+                      "snr_median", "snr_max", "frequency_median"]
+
+
+def parse_sweep_values(text: str) -> list[str]:
+    """Options from text such as "6, 7, 8", "4 100, 4 64" or "5:8:0.5"
+    (start:stop:step, stop included)."""
+    values = []
+    for option in text.split(","):
+        option = option.strip()
+        if not option:
+            continue
+        if ":" in option:
+            start, stop, *step = (float(x) for x in option.split(":"))
+            values.extend(_range(start, stop, step[0] if step else 1.0))
+        else:
+            values.append(" ".join(option.split()))
+    return values
+
+
+def _range(start, stop, step) -> list[str]:
+    if step <= 0:
+        raise ValueError("Sweep step must be positive")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return [f"{round(start + i * step, 10):g}" for i in range(max(count, 0))]
+
+
+def sweep_values(value) -> list[str]:
+    """Normalise one grid entry to a list of config values.
+
+    Accepts a text spec (see parse_sweep_values), {"start", "stop", "step"},
+    a list of options (an option may itself be a list, e.g. a Q range), or a
+    single value.
+    """
+    if isinstance(value, str):
+        return parse_sweep_values(value)
+    if isinstance(value, dict):
+        return _range(float(value["start"]), float(value["stop"]), float(value.get("step", 1)))
+    if isinstance(value, (list, tuple)):
+        return [" ".join(str(v) for v in option) if isinstance(option, (list, tuple)) else str(option)
+                for option in value]
+    return [str(value)]
+
+
+def expand_grid(config, grid: dict) -> list[tuple]:
+    """[(parameters, config)] for every combination of the grid's values."""
+    config = load_config(config)
+    names = list(grid)
+    options = [sweep_values(grid[name]) for name in names]
+    for name, values in zip(names, options):
+        if not values:
+            raise ValueError(f"No values to sweep for {name!r}")
+    combinations = list(itertools.product(*options))
+    if len(combinations) > MAX_SWEEP_RUNS:
+        raise ValueError(f"Sweep has {len(combinations)} runs, more than {MAX_SWEEP_RUNS}")
+    runs = []
+    for combination in combinations:
+        params = dict(zip(names, combination))
+        runs.append((params, config.with_params(params)))
+    return runs
+
+
+def available_memory():
+    """MemAvailable in bytes, or None where /proc/meminfo does not exist."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def sweep_workers(workers=None) -> int:
+    """Concurrent runs allowed by CPU cores and available memory."""
+    limit = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is not None:
+        limit = min(limit, max(1, memory // RUN_MEMORY))
+    return max(1, min(workers or limit, limit))
+
+
+def trigger_stats(directory: str, fmt: str, duration: float) -> dict:
+    files = find_trigger_files(directory, fmt)
+    if not files:
+        return {"triggers": 0, "rate_hz": 0.0, "snr_median": None, "snr_max": None, "frequency_median": None}
+    table = read_triggers(files, fmt)
+    if not len(table):
+        return {"triggers": 0, "rate_hz": 0.0, "snr_median": None, "snr_max": None, "frequency_median": None}
+    snr = np.asarray(table["snr"], dtype=float)
+    frequency = np.asarray(table["frequency" if "frequency" in table.colnames else "peak_frequency"], dtype=float)
+    count = len(table)
+    return {
+        "triggers": count,
+        "rate_hz": round(count / duration, 6) if duration else None,
+        "snr_median": round(float(np.median(snr)), 3),
+        "snr_max": round(float(snr.max()), 3),
+        "frequency_median": round(float(np.median(frequency)), 3),
+    }
+
+
+def write_comparison(rows: list[dict], names: list[str], directory: str) -> str:
+    """Write the comparison table as CSV and JSON; returns the CSV path."""
+    path = os.path.join(directory, "comparison.csv")
+    columns = COMPARISON_COLUMNS[:1] + names + COMPARISON_COLUMNS[1:]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+    with open(os.path.join(directory, "comparison.json"), "w") as f:
+        json.dump({"columns": columns, "rows": rows}, f)
+    return path
+
+
+def format_comparison(rows: list[dict], names: list[str]) -> str:
+    """The comparison table as aligned text, for the terminal."""
+    columns = COMPARISON_COLUMNS[:1] + names + COMPARISON_COLUMNS[1:]
+    cells = [[("-" if row.get(c) is None else str(row.get(c))) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in cells)
+    return "\n".join(lines)
+
+
+async def run_omicron_sweep_async(ffl_path, config="config.txt", grid=None, output_dir=OMICRON_OUT, workers=None,
+                                  run_id=None, on_progress=None, should_stop=None):
+    """Run one omicron process per combination of `grid` over the same FFL.
+
+    At most sweep_workers(workers) runs are active at once. Each run covers
+    the FFL's contiguous blocks of at least its PSDLENGTH one after another,
+    skipping the gaps. A failed run is reported in the table and does not
+    stop the others. `on_progress`
+    receives overall progress and, when everything has finished, the
+    comparison rows and the CSV path.
+    """
+    if not os.path.exists(ffl_path):
+        yield "[ERROR] .ffl file not found"
+        return
+    span = ffl_span(ffl_path)
+    if span is None:
+        yield "[ERROR] Empty .ffl"
+        return
+    first_time, last_time = span
+    segments = ffl_segments(ffl_path)
+    runs = expand_grid(config, grid or {})
+    names = list(grid or {})
+    workers = sweep_workers(workers)
+    sweep_dir = run_directory(output_dir, run_id)
+    os.makedirs(sweep_dir, exist_ok=True)
+    yield f"[INFO] Sweeping {len(runs)} config(s) over {first_time}-{last_time}, up to {workers} at once"
+
+    posix = platform.system() != "Windows"
+    entries = [{"run": i + 1, "params": params, "config": run_config, "process": None, "percent": 0.0,
+                "dir": os.path.join(sweep_dir, f"run-{i + 1}"), "blocks": data_blocks(segments, run_config.psd_length)}
+               for i, (params, run_config) in enumerate(runs)]
+
+    async def start_block(entry):
+        # Blocks of one run go one after another into the same log and output directory
+        with open(entry["log"], "ab") as out:
+            entry["process"] = await asyncio.create_subprocess_exec(
+                *omicron_command(*entry["blocks"].pop(0), entry["config_path"]),
+                stdout=out, stderr=subprocess.STDOUT, start_new_session=posix)
+        track_process(entry["process"].pid)
+        entry["waiter"] = asyncio.ensure_future(entry["process"].wait())
+        entry["waiter"].add_done_callback(lambda _, e=entry: block_done(e))
+
+    def block_done(entry):
+        if entry["process"].returncode != 0 or not entry["blocks"]:
+            entry["ended"] = time.monotonic()
+
+    try:
+        while True:
+            for entry in entries:
+                if entry["process"] is not None and entry["process"].returncode == 0 and entry["blocks"]:
+                    await start_block(entry)
+            running = [e for e in entries if e["process"] is not None and e["process"].returncode is None]
+            for entry in entries:
+                if len(running) >= workers:
+                    break
+                if entry["process"] is not None or "started" in entry:
+                    continue
+                settings = ", ".join(f"{k}={v}" for k, v in entry["params"].items())
+                entry["started"] = time.monotonic()
+                if not entry["blocks"]:
+                    entry["ended"] = entry["started"]
+                    yield (f"[WARNING] Run {entry['run']}: {settings} – no block of data lasts "
+                           f"PSDLENGTH ({entry['config'].psd_length} s)")
+                    continue
+                _, entry["config_path"] = prepare_run(ffl_path, entry["config"], entry["dir"])
+                entry["log"] = os.path.join(entry["dir"], "omicron.out")
+                open(entry["log"], "wb").close()
+                entry["tail"] = LogTail(entry["log"])
+                entry["covered"] = sum(end - start for start, end in entry["blocks"])
+                await start_block(entry)
+                running.append(entry)
+                yield f"[INFO] Run {entry['run']}: {settings} ({entry['config'].digest()})"
+
+            started = [e for e in entries if "started" in e]
+            for entry in entries:
+                if entry["process"] is None:
+                    continue
+                for line in entry["tail"].read_lines(final=entry["process"].returncode is not None):
+                    progress = parse_progress(line, first_time, last_time)
+                    if "percent" in progress:
+                        entry["percent"] = progress["percent"]
+                        if on_progress is not None:
+                            on_progress({"percent": round(sum(e["percent"] for e in entries) / len(entries), 1),
+                                         "runs_done": len(started) - len(running)})
+                    yield f"[{entry['run']}/{len(entries)}] {line}"
+            if all("ended" in e for e in entries):
+                break
+            if should_stop is not None and should_stop():
+                yield "[WARNING] Stopping sweep"
+                return
+            if running:
+                await asyncio.wait([e["waiter"] for e in running],
+                                   timeout=OMICRON_POLL, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for entry in entries:
+            if entry["process"] is None:
+                continue
+            entry["tail"].close()
+            if entry["process"].returncode is None:
+                _kill(entry["process"], posix)
+                await entry["process"].wait()
+
+    yield "[INFO] Collecting trigger statistics..."
+    loop = asyncio.get_running_loop()
+    rows = []
+    for entry in entries:
+        if entry["process"] is None:
+            status = "skipped (no data)"
+        else:
+            status = "ok" if entry["process"].returncode == 0 else f"failed ({entry['process'].returncode})"
+        row = {"run": entry["run"], **entry["params"], "config_hash": entry["config"].digest(), "status": status,
+               "runtime_s": round(entry.get("ended", time.monotonic()) - entry["started"], 1)}
+        if status == "ok":
+            try:
+                row.update(await loop.run_in_executor(None, trigger_stats, entry["dir"],
+                                                      entry["config"].output_format, entry["covered"]))
+            except Exception as e:
+                row["status"] = f"ok (triggers unreadable: {e})"
+        rows.append(row)
+    path = write_comparison(rows, names, sweep_dir)
+    if on_progress is not None:
+        on_progress({"percent": 100.0, "runs_done": len(entries), "comparison": path, "rows": rows,
+                     "run_dir": sweep_dir, "succeeded": True})
+    for line in format_comparison(rows, names).splitlines():
+        yield line
+    skipped = [str(r["run"]) for r in rows if r["status"].startswith("skipped")]
+    failed = [str(r["run"]) for r in rows if not r["status"].startswith(("ok", "skipped"))]
+    if skipped:
+        yield f"[WARNING] Run(s) {', '.join(skipped)} skipped – no stretch of data lasts their PSDLENGTH"
+    if failed:
+        yield f"[WARNING] Run(s) {', '.join(failed)} failed – see their omicron.out"
+    yield f"[SUCCESS] Sweep finished – comparison table in {path}"
+
+
+def run_omicron_sweep(*args, **kwargs):
+    """Blocking version of run_omicron_sweep_async."""
+    yield from iterate_blocking(run_omicron_sweep_async(*args, **kwargs))
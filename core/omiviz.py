@@ -0,0 +1,266 @@
+# core/omiviz.py
+# Omiviz: plot-ready views of the trigger store. Each store partition gets
+# precomputed aggregates next to it, keyed by the partition's generation:
+#
+#   <dataset>/omiviz/p<bucket>-<generation>/L<width>_time.npy   time bin numbers (sorted)
+#                                          L<width>_freq.npy   log-frequency bin numbers
+#                                          L<width>_count.npy  triggers per tile
+#                                          L<width>_snr.npy    loudest SNR per tile
+#                                          lttb.npy            rows kept by LTTB decimation
+#
+# A view starts from the coarsest level that still gives the requested number
+# of time bins and merges its bins down to about that number, so a plot costs
+# about as much as its pixels, not its triggers.
+# Zoomed-in views below the finest level are binned from raw triggers.
+# Aggregates are small, so they are read into memory rather than mapped and
+# the cache is bounded by bytes, holding no file descriptors.
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from .trigger_store import get_trigger_store
+
+FREQ_BINS = 64
+FREQ_EDGES = np.geomspace(1.0, 16384.0, FREQ_BINS + 1)  # log-spaced, 1 Hz - 16 kHz
+LEVELS = (16, 256, 4096, 65536)  # time bin widths in seconds, finest first
+DECIMATED_POINTS = 4096   # LTTB points kept per partition for wide scatter plots
+RAW_SCATTER_LIMIT = 2_000_000  # above this many matches, scatter from the per-partition decimation
+MAX_TIME_BINS = 4000
+MAX_POINTS = 20000
+CACHE_BYTES = int(os.environ.get("GWCLOUD_OMIVIZ_CACHE_MB", 256)) * 1024 ** 2  # aggregates kept in memory
+
+logger = logging.getLogger("omiviz")
+
+
+def lttb(x, y, n: int):
+    """Indices of `n` points chosen Largest-Triangle-Three-Buckets style from x-sorted (x, y).
+
+    Each bucket is scored against the averages of its neighbouring buckets
+    rather than the point chosen in the previous one, so every bucket is
+    computed in one vectorised pass.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=float) - float(x[0])
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    # n - 2 buckets over the interior points; the first and last points are always kept
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    counts = np.diff(edges)
+    offsets = edges[:-1] - 1
+    xi, yi = x[1:-1], y[1:-1]
+    avg_x = np.add.reduceat(xi, offsets) / counts
+    avg_y = np.add.reduceat(yi, offsets) / counts
+    prev_x, prev_y = np.r_[x[0], avg_x[:-1]], np.r_[y[0], avg_y[:-1]]
+    next_x, next_y = np.r_[avg_x[1:], x[-1]], np.r_[avg_y[1:], y[-1]]
+    bucket = np.repeat(np.arange(n - 2), counts)
+    px, py = prev_x[bucket], prev_y[bucket]
+    area = np.abs((px - next_x[bucket]) * (yi - py) - (px - xi) * (next_y[bucket] - py))
+    best = np.flatnonzero(area == np.maximum.reduceat(area, offsets)[bucket])
+    first = best[np.r_[True, bucket[best][1:] != bucket[best][:-1]]]
+    return np.r_[0, first + 1, size - 1].astype(np.int64)
+
+
+def freq_bins(frequency):
+    return np.clip(np.searchsorted(FREQ_EDGES, frequency, "right") - 1, 0, FREQ_BINS - 1).astype(np.uint8)
+
+
+def bin_triggers(time, frequency, snr, width: float, origin: float = 0.0) -> dict:
+    """Sparse (time bin, frequency bin) tiles with trigger counts and loudest SNR."""
+    keep = np.isfinite(frequency) & (frequency > 0)
+    time, frequency = time[keep], frequency[keep]
+    snr = np.nan_to_num(np.asarray(snr[keep], dtype=np.float32))
+    tbin = np.floor((time - origin) / width).astype(np.int64)
+    key = tbin * FREQ_BINS + freq_bins(frequency)
+    # Sort by tile, then SNR: the last row of each tile is its loudest
+    order = np.lexsort((snr, key))
+    key, snr = key[order], snr[order]
+    last = np.flatnonzero(np.r_[key[1:] != key[:-1], True]) if len(key) else np.array([], dtype=np.int64)
+    counts = np.diff(np.r_[-1, last])
+    tiles = key[last]
+    return {"time": tiles // FREQ_BINS, "freq": (tiles % FREQ_BINS).astype(np.uint8),
+            "count": counts.astype(np.uint32), "snr": snr[last]}
+
+
+def merge_tiles(parts: list[dict]) -> dict:
+    """Combine tiles from several partitions (a bin may straddle two)."""
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return {"time": np.array([], np.int64), "freq": np.array([], np.uint8),
+                "count": np.array([], np.uint32), "snr": np.array([], np.float32)}
+    key = np.concatenate([p["time"] * FREQ_BINS + p["freq"] for p in parts])
+    count = np.concatenate([p["count"] for p in parts]).astype(np.uint64)
+    snr = np.concatenate([p["snr"] for p in parts])
+    order = np.lexsort((snr, key))
+    key, count, snr = key[order], count[order], snr[order]
+    last = np.flatnonzero(np.r_[key[1:] != key[:-1], True])
+    first = np.r_[0, last[:-1] + 1]
+    return {"time": key[last] // FREQ_BINS, "freq": (key[last] % FREQ_BINS).astype(np.uint8),
+            "count": np.add.reduceat(count, first).astype(np.uint32), "snr": snr[last]}
+
+
+class Omiviz:
+    def __init__(self, store=None):
+        self.store = store or get_trigger_store()
+        self._open = OrderedDict()  # (aggregate dir, name) -> array
+        self._open_bytes = 0
+        self._open_lock = threading.Lock()
+
+    def _aggregate_dir(self, channel: str, config: str, bucket: int, generation) -> str:
+        return os.path.join(self.store.dataset_dir(channel, config), "omiviz", f"p{bucket}-{generation}")
+
+    def build(self, channel: str, config: str, bucket: int, generation) -> str:
+        """Precompute one partition's aggregates unless they already exist."""
+        final = self._aggregate_dir(channel, config, bucket, generation)
+        if os.path.isdir(final):
+            return final
+        part = self.store.load_partition(channel, config, bucket)
+        staging = f"{final}.{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(staging)
+        for width in LEVELS:
+            for name, values in bin_triggers(part["time"], part["frequency"], part["snr"], width).items():
+                np.save(os.path.join(staging, f"L{width}_{name}.npy"), values)
+        np.save(os.path.join(staging, "lttb.npy"), lttb(part["time"], part["snr"], DECIMATED_POINTS))
+        try:
+            os.replace(staging, final)
+        except OSError:  # built concurrently by another worker
+            shutil.rmtree(staging, ignore_errors=True)
+        return final
+
+    def precompute(self, channel: str, config: str) -> int:
+        """Build aggregates for every partition of a dataset and drop stale ones."""
+        config = self.store.resolve_config(channel, config)
+        current = set()
+        for bucket, stats in self.store.candidates(channel, config):
+            current.add(os.path.basename(self.build(channel, config, bucket, stats.get("generation"))))
+        root = os.path.join(self.store.dataset_dir(channel, config), "omiviz")
+        for name in os.listdir(root) if os.path.isdir(root) else ():
+            if name not in current and not name.endswith(".tmp"):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        return len(current)
+
+    def _array(self, directory: str, name: str):
+        key = (directory, name)
+        with self._open_lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+        values = np.load(os.path.join(directory, f"{name}.npy"))
+        with self._open_lock:
+            if key not in self._open:
+                self._open[key] = values
+                self._open_bytes += values.nbytes
+            while self._open_bytes > CACHE_BYTES and len(self._open) > 1:
+                self._open_bytes -= self._open.popitem(last=False)[1].nbytes
+        return values
+
+    def _span(self, channel: str, config: str, start, end):
+        partitions = self.store.candidates(channel, config)
+        if start is None:
+            start = min((s["time"][0] for _, s in partitions if s.get("time")), default=0.0)
+        if end is None:
+            end = max((s["time"][1] for _, s in partitions if s.get("time")), default=start) + 1e-3
+        return float(start), float(end)
+
+    def tiles(self, channel: str, config: str = None, start=None, end=None, bins: int = 1000,
+              fmin=None, fmax=None) -> dict:
+        """Time-frequency density tiles (trigger count and loudest SNR) over [start, end)."""
+        config = self.store.resolve_config(channel, config)
+        start, end = self._span(channel, config, start, end)
+        bins = max(1, min(int(bins), MAX_TIME_BINS))
+        target = (end - start) / bins
+        level = next((w for w in reversed(LEVELS) if w <= target), None)
+        parts = []
+        if level is None:
+            # Zoomed in below the finest level: bin the raw triggers
+            width, origin = max(target, 1e-3), start
+            for part, rows in self.store.select(channel, config, start, end, fmin=fmin, fmax=fmax):
+                parts.append(bin_triggers(part["time"][rows], part["frequency"][rows], part["snr"][rows],
+                                          width, origin))
+        else:
+            # Merge whole level bins up to the requested resolution
+            factor = max(1, int(target // level))
+            width, origin = float(level * factor), 0.0
+            for bucket, stats in self.store.candidates(channel, config, (("time", start, end),)):
+                directory = self.build(channel, config, bucket, stats.get("generation"))
+                times = self._array(directory, f"L{level}_time")
+                lo = int(np.searchsorted(times, np.floor(start / width) * factor, "left"))
+                hi = int(np.searchsorted(times, np.ceil(end / width) * factor, "left"))
+                if lo < hi:
+                    part = {name: np.asarray(self._array(directory, f"L{level}_{name}")[lo:hi])
+                            for name in ("time", "freq", "count", "snr")}
+                    part["time"] = part["time"] // factor
+                    parts.append(part)
+            if factor > 1 and len(parts) == 1:
+                parts.append(merge_tiles([]))  # a single part still has duplicate bins to merge
+        tiles = merge_tiles(parts)
+        keep = np.ones(len(tiles["time"]), dtype=bool)
+        if fmin is not None:
+            keep &= FREQ_EDGES[tiles["freq"].astype(np.int64) + 1] > fmin
+        if fmax is not None:
+            keep &= FREQ_EDGES[tiles["freq"]] < fmax
+        return {
+            "channel": channel, "config": config, "start": start, "end": end,
+            "level": level or "raw", "width": width,
+            "freq_edges": FREQ_EDGES.tolist(),
+            "time": (origin + tiles["time"][keep] * width).tolist(),
+            "freq": tiles["freq"][keep].tolist(),
+            "count": tiles["count"][keep].tolist(),
+            "snr_max": [round(float(s), 3) for s in tiles["snr"][keep]],
+        }
+
+    def scatter(self, channel: str, config: str = None, start=None, end=None, points: int = 2000,
+                snr_min=None, fmin=None, fmax=None) -> dict:
+        """Up to `points` triggers chosen by LTTB over SNR against time."""
+        config = self.store.resolve_config(channel, config)
+        points = max(3, min(int(points), MAX_POINTS))
+        total = self.store.count(channel, config, start, end, snr_min, None, fmin, fmax)
+        if total <= RAW_SCATTER_LIMIT:
+            source = "raw"
+            matches = self.store.select(channel, config, start, end, snr_min, None, fmin, fmax)
+        else:
+            # Too many to decimate on the fly: start from each partition's LTTB points
+            source = "decimated"
+            matches = []
+            bounds = (("time", start, end), ("snr", snr_min, None), ("frequency", fmin, fmax))
+            for bucket, stats in self.store.candidates(channel, config, bounds):
+                part = self.store.partition(channel, config, bucket, stats.get("generation"))
+                rows = np.asarray(self._array(self.build(channel, config, bucket, stats.get("generation")), "lttb"))
+                keep = np.ones(len(rows), dtype=bool)
+                for name, low, high in bounds:
+                    values = part[name][rows]
+                    if low is not None:
+                        keep &= values >= low
+                    if high is not None:
+                        keep &= values < high if name == "time" else values <= high
+                matches.append((part, rows[keep]))
+        columns = {name: np.concatenate([np.asarray(part[name][rows]) for part, rows in matches])
+                   if matches else np.array([]) for name in ("time", "frequency", "snr")}
+        chosen = lttb(columns["time"], columns["snr"], points)
+        return {
+            "channel": channel, "config": config, "total": int(total), "source": source,
+            "time": columns["time"][chosen].tolist(),
+            "frequency": [round(float(f), 3) for f in columns["frequency"][chosen]],
+            "snr": [round(float(s), 3) for s in np.nan_to_num(columns["snr"][chosen])],
+        }
+
+
+_omiviz = None
+_omiviz_lock = threading.Lock()
+
+
+def get_omiviz() -> Omiviz:
+    """Return the shared Omiviz view over the shared trigger store."""
+    global _omiviz
+    with _omiviz_lock:
+        if _omiviz is None:
+            _omiviz = Omiviz()
+        return _omiviz
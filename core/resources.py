@@ -0,0 +1,382 @@
+# core/resources.py
+# Resource accounting for jobs, read from /proc with no external service.
+# A monitor follows the processes a job starts (and everything they start in
+# turn) plus, for jobs run on a worker thread, that thread itself, and reports
+# wall time, CPU time, peak RSS and I/O bytes when the job ends. Where /proc
+# does not exist (Windows, macOS) only the wall time is recorded.
+#
+# Processes are sampled every SAMPLE_INTERVAL seconds. A process's CPU time
+# and I/O counters include its reaped children, so a child that exited is
+# subtracted from its parent's counters rather than added twice; whatever it
+# did after its last sample still arrives through the parent. Only the root
+# processes lose up to one interval when they exit.
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+SAMPLE_INTERVAL = float(os.environ.get("GWCLOUD_RESOURCE_SAMPLE", 1.0))
+PERCENTILES = (50, 90, 99)
+
+PROC = "/proc"
+HAVE_PROC = os.path.exists(os.path.join(PROC, "self", "stat"))
+_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+USAGE_FIELDS = ("wall_s", "cpu_s", "cpu_user_s", "cpu_system_s", "rss_peak_bytes",
+                "read_bytes", "write_bytes", "rchar", "wchar")
+IO_FIELDS = ("read_bytes", "write_bytes", "rchar", "wchar")
+
+_current = contextvars.ContextVar("resource_monitor", default=None)
+
+logger = logging.getLogger("resources")
+
+
+def _read_stat(path):
+    """Fields of a /proc stat file after the command name, or None."""
+    try:
+        with open(path) as f:
+            return f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def _read_io(path) -> dict:
+    counters = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in IO_FIELDS:
+                    counters[name] = int(value)
+    except (OSError, ValueError):
+        pass  # another user's process, or a kernel without task I/O accounting
+    return counters
+
+
+def _read_status_kb(path, field: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _cpu(stat, children=True) -> tuple[float, float]:
+    """(user, system) seconds from stat fields, including reaped children."""
+    user, system = int(stat[11]), int(stat[12])
+    if children:
+        user, system = user + int(stat[13]), system + int(stat[14])
+    return user / _TICKS, system / _TICKS
+
+
+class ResourceMonitor:
+    """Usage of one job: the process trees under `track`ed PIDs, plus the
+    calling thread's own CPU and I/O when `thread` is True."""
+
+    def __init__(self, thread: bool = False):
+        self.thread_id = threading.get_native_id() if thread and HAVE_PROC else None
+        self._lock = threading.Lock()
+        self._roots = {}        # pid -> start time once first seen, so a reused PID isn't picked up
+        # (pid, start time) -> {"cpu": (user, system), "io": {...}, "hwm": bytes, "parent": key, "seen": n},
+        # cpu and io including reaped children, seen = number of the sample that last found it
+        self._processes = {}
+        self._rss_peak = 0      # highest total RSS of the tracked processes seen at once
+        self._samples = 0
+        self._thread_start = None
+        self._base_rss = 0
+        self._started = None
+        self._stopped = None
+
+    def track(self, pid: int):
+        """Account `pid` and its descendants to this job from now on."""
+        with self._lock:
+            self._roots.setdefault(pid, None)
+
+    # --- sampling ----------------------------------------------------------
+    def _thread_counters(self):
+        task = os.path.join(PROC, "self", "task", str(self.thread_id))
+        stat = _read_stat(os.path.join(task, "stat"))
+        if stat is None:
+            return None
+        return _cpu(stat, children=False), _read_io(os.path.join(task, "io"))
+
+    def _observe(self, table: dict):
+        """Record the current counters of every tracked process; `table` maps
+        pid -> stat fields for every process on the system."""
+        with self._lock:
+            for pid, started in self._roots.items():
+                if started is None and pid in table:
+                    self._roots[pid] = table[pid][19]
+            todo = [pid for pid, started in self._roots.items() if pid in table and table[pid][19] == started]
+        if not self._roots and self.thread_id is None:
+            return
+        with self._lock:
+            self._samples += 1
+            number = self._samples
+        children = {}
+        for pid, stat in table.items():
+            children.setdefault(int(stat[1]), []).append(pid)
+        seen = set()
+        rss = 0
+        while todo:
+            pid = todo.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            todo.extend(children.get(pid, ()))
+            stat = table[pid]
+            base = os.path.join(PROC, str(pid))
+            ppid = int(stat[1])
+            sample = {"cpu": _cpu(stat), "io": _read_io(os.path.join(base, "io")),
+                      "hwm": _read_status_kb(os.path.join(base, "status"), "VmHWM"),
+                      "parent": (ppid, table[ppid][19]) if ppid in table else None,
+                      "seen": number}
+            rss += int(stat[21]) * _PAGE
+            with self._lock:
+                self._processes[(pid, stat[19])] = sample
+        if self.thread_id is not None:
+            # Jobs on a worker thread share the server process: count how far its RSS rose
+            rss += max(0, _read_status_kb(os.path.join(PROC, "self", "status"), "VmRSS") - self._base_rss)
+        with self._lock:
+            self._rss_peak = max(self._rss_peak, rss)
+
+    def _own_usage(self, processes: dict) -> dict:
+        """key -> ((user, system), io) of each process without the children that had
+        exited by its last sample; those are already counted on their own."""
+        own = {key: (list(p["cpu"]), dict(p["io"])) for key, p in processes.items()}
+        for key, p in processes.items():
+            parent = processes.get(p["parent"])
+            # Gone by the parent's last sample, so inside the parent's counters then
+            if parent is not None and p["seen"] < parent["seen"]:
+                cpu, io = own[p["parent"]]
+                cpu[0] -= p["cpu"][0]
+                cpu[1] -= p["cpu"][1]
+                for name, value in p["io"].items():
+                    io[name] = io.get(name, 0) - value
+        return {key: ((max(0.0, cpu[0]), max(0.0, cpu[1])), {name: max(0, v) for name, v in io.items()})
+                for key, (cpu, io) in own.items()}
+
+    # --- lifetime ----------------------------------------------------------
+    def start(self):
+        self._started = time.monotonic()
+        if not HAVE_PROC:
+            return
+        if self.thread_id is not None:
+            self._thread_start = self._thread_counters()
+            self._base_rss = _read_status_kb(os.path.join(PROC, "self", "status"), "VmRSS")
+        get_sampler().add(self)
+
+    def stop(self) -> dict:
+        """Take a last sample, stop monitoring and return the usage."""
+        self._stopped = time.monotonic()
+        if not HAVE_PROC:
+            return self.usage()
+        sampler = get_sampler()
+        sampler.remove(self)
+        sampler.sample([self])
+        return self.usage()
+
+    def stop_later(self, on_done):
+        """Like stop(), but the last sample is taken on the sampler thread,
+        which then passes the usage to `on_done`. For monitors stopped on an
+        event loop, which must not scan /proc itself."""
+        self._stopped = time.monotonic()
+        if not HAVE_PROC:
+            on_done(self.usage())
+        else:
+            get_sampler().finish(self, on_done)
+
+    def usage(self) -> dict:
+        """Usage recorded up to the last sample."""
+        usage = {"wall_s": round((self._stopped or time.monotonic()) - self._started, 3)}
+        if not HAVE_PROC:
+            return usage
+        with self._lock:
+            processes = dict(self._processes)
+            rss_peak = max([self._rss_peak] + [p["hwm"] for p in processes.values()])
+            samples = self._samples
+        own = self._own_usage(processes).values()
+        user = sum(cpu[0] for cpu, _ in own)
+        system = sum(cpu[1] for cpu, _ in own)
+        io = {name: sum(counters.get(name, 0) for _, counters in own) for name in IO_FIELDS}
+        if self.thread_id is not None and self._thread_start is not None:
+            end = self._thread_counters()
+            if end is not None:
+                (user0, system0), io0 = self._thread_start
+                (user1, system1), io1 = end
+                user += user1 - user0
+                system += system1 - system0
+                for name in IO_FIELDS:
+                    io[name] += io1.get(name, 0) - io0.get(name, 0)
+        usage.update({"cpu_s": round(user + system, 3), "cpu_user_s": round(user, 3),
+                      "cpu_system_s": round(system, 3), "rss_peak_bytes": rss_peak, **io,
+                      "processes": len(processes), "samples": samples})
+        return usage
+
+
+class _Sampler:
+    """One background thread reading /proc for every active monitor."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._monitors = set()
+        self._finishing = []    # (monitor, on_done) waiting for their last sample
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        # Caller holds _lock
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="resource-sampler", daemon=True)
+            self._thread.start()
+
+    def add(self, monitor: ResourceMonitor):
+        with self._lock:
+            self._monitors.add(monitor)
+            self._ensure_thread()
+
+    def remove(self, monitor: ResourceMonitor):
+        with self._lock:
+            self._monitors.discard(monitor)
+
+    def finish(self, monitor: ResourceMonitor, on_done):
+        """Stop sampling `monitor` after one more sample, then call on_done(usage)."""
+        with self._lock:
+            self._monitors.discard(monitor)
+            self._finishing.append((monitor, on_done))
+            self._ensure_thread()
+        self._wake.set()
+
+    def sample(self, monitors=None):
+        if monitors is None:
+            with self._lock:
+                monitors = list(self._monitors)
+        if not monitors:
+            return
+        table = {}
+        for name in os.listdir(PROC):
+            if name.isdigit():
+                stat = _read_stat(os.path.join(PROC, name, "stat"))
+                if stat is not None:
+                    table[int(name)] = stat
+        for monitor in monitors:
+            monitor._observe(table)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if not self._monitors and not self._finishing:
+                    self._thread = None
+                    return
+                finishing, self._finishing = self._finishing, []
+                monitors = list(self._monitors) + [monitor for monitor, _ in finishing]
+            self._wake.clear()
+            self.sample(monitors)
+            for monitor, on_done in finishing:
+                try:
+                    on_done(monitor.usage())
+                except Exception:
+                    logger.exception("Recording resource usage failed")
+            self._wake.wait(self.interval)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> _Sampler:
+    """Return the shared /proc sampler."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = _Sampler()
+        return _sampler
+
+
+def track_process(pid: int):
+    """Account a child process to the job running in this context, if any."""
+    monitor = _current.get()
+    if monitor is not None:
+        monitor.track(pid)
+
+
+@contextlib.contextmanager
+def monitor_resources(on_done, thread: bool = False):
+    """Account everything done inside the block to one monitor and pass its
+    usage to `on_done` at the end. Processes started inside the block are
+    picked up when they are passed to track_process.
+
+    With thread=False (work on an event loop) the last sample is taken on
+    the sampler thread, so `on_done` is called from there shortly after the
+    block ends."""
+    monitor = ResourceMonitor(thread=thread)
+    token = _current.set(monitor)
+    monitor.start()
+    try:
+        yield monitor
+    finally:
+        _current.reset(token)
+        if thread:
+            on_done(monitor.stop())
+        else:
+            monitor.stop_later(on_done)
+
+
+# --- aggregation ---------------------------------------------------------
+def percentile(values: list, q: float):
+    """Linear-interpolated q-th percentile of `values`, or None if empty."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _distribution(values: list) -> dict:
+    summary = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+    present = [v for v in values if v is not None]
+    summary["max"] = max(present) if present else None
+    return {k: (round(v, 3) if v is not None else None) for k, v in summary.items()}
+
+
+def summarize(records: list[dict], by=("kind",)) -> list[dict]:
+    """Percentiles of each usage field over `records`, grouped by the `by`
+    keys. A record is a job's usage plus "kind", "channel" and, where the
+    job's data span is known, "data_seconds"; those also get their usage
+    per hour of data, the basis for a per-channel-hour cost model."""
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record.get(key) for key in by), []).append(record)
+    summary = []
+    for key, group in sorted(groups.items(), key=lambda item: tuple(str(k) for k in item[0])):
+        row = dict(zip(by, key))
+        row["jobs"] = len(group)
+        hours = [r["data_seconds"] / 3600 for r in group if r.get("data_seconds")]
+        row["data_hours"] = round(sum(hours), 3)
+        for name in USAGE_FIELDS:
+            row[name] = _distribution([r.get(name) for r in group])
+        per_hour = {}
+        for name in ("wall_s", "cpu_s", "read_bytes", "write_bytes", "rchar", "wchar"):
+            per_hour[name] = _distribution([r[name] / (r["data_seconds"] / 3600) for r in group
+                                            if r.get(name) is not None and r.get("data_seconds")])
+        row["per_data_hour"] = per_hour
+        summary.append(row)
+    return summary
+
+
+def format_usage(usage: dict) -> str:
+    """One line summary of a usage dict, for logs."""
+    if usage.get("cpu_s") is None:
+        return f"wall {usage['wall_s']:.1f} s"
+    return (f"wall {usage['wall_s']:.1f} s, CPU {usage['cpu_s']:.1f} s, "
+            f"peak RSS {usage['rss_peak_bytes'] / 1024 ** 2:.0f} MiB, "
+            f"read {usage['read_bytes'] / 1024 ** 2:.0f} MiB, written {usage['write_bytes'] / 1024 ** 2:.0f} MiB")
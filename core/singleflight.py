@@ -0,0 +1,79 @@
+# core/singleflight.py
+# Request coalescing: concurrent calls with the same key share one upstream
+# call and its result (or exception) instead of each hitting GWOSC.
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` unless a call for `key` is already in
+        flight, in which case wait for it and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking waiters so the next request after
+            # this one starts a fresh call instead of reusing a stale result.
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> dict:
+        """{key: number of callers waiting on it}, for debugging."""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
+
+    The shared call runs as its own task and each caller awaits it through
+    asyncio.shield, so a client disconnecting does not cancel the call for
+    everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> list:
+        return list(self._tasks)
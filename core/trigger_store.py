@@ -0,0 +1,431 @@
+# core/trigger_store.py
+# Columnar store for Omicron triggers. Omicron's ROOT/HDF5/XML files are
+# converted once into one .npy file per column, partitioned by channel,
+# config digest and GPS day, so later reads are memory-mapped array scans
+# instead of reopening many small trigger files.
+#
+#   uploads/triggers/<channel>/<config>/index.json        partition list + stats
+#   uploads/triggers/<channel>/<config>/p<gps day>/time.npy, frequency.npy, ...
+#   uploads/triggers/<channel>/<config>/p<gps day>/meta.json
+#
+# Queries prune partitions on the per-column min/max kept in index.json,
+# binary-search the sorted time column and filter the rest vectorised.
+# Columns are mapped one at a time as a query reads them; every map holds a
+# file descriptor, so at most OPEN_MAPS stay open between queries.
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from .omicron import TRIGGER_EXTENSIONS, find_trigger_files, read_triggers, trigger_times
+
+try:
+    import fcntl
+except ImportError:  # Windows: single desktop process
+    fcntl = None
+
+TRIGGER_STORE_DIR = "./uploads/triggers"
+PARTITION_SECONDS = 86400  # one partition per GPS day
+STORE_VERSION = 1
+MAX_QUERY_LIMIT = 10000
+OPEN_MAPS = 256  # column maps kept open between queries, one file descriptor each
+
+# Column name -> dtype. Rows in a partition are sorted by time.
+COLUMNS = {
+    "time": np.float64,
+    "frequency": np.float32,
+    "snr": np.float32,
+    "q": np.float32,
+    "duration": np.float32,
+}
+
+logger = logging.getLogger("trigger_store")
+
+
+def table_columns(table) -> dict:
+    """COLUMNS arrays from an Omicron trigger table (ROOT/HDF5 or LIGO_LW sngl_burst)."""
+    names = table.colnames
+    n = len(table)
+
+    def col(*candidates):
+        for name in candidates:
+            if name in names:
+                return np.asarray(table[name], dtype=float)
+        return np.full(n, np.nan)
+
+    if "tend" in names and "tstart" in names:
+        duration = np.asarray(table["tend"], dtype=float) - np.asarray(table["tstart"], dtype=float)
+    else:
+        duration = col("duration")
+    columns = {
+        "time": trigger_times(table),
+        "frequency": col("frequency", "peak_frequency", "central_freq"),
+        "snr": col("snr"),
+        "q": col("q"),
+        "duration": duration,
+    }
+    return {name: columns[name].astype(dtype, copy=False) for name, dtype in COLUMNS.items()}
+
+
+def outside_spans(times, spans) -> np.ndarray:
+    """Mask of `times` outside every [start, end) interval of `spans`."""
+    keep = np.ones(len(times), dtype=bool)
+    for start, end in spans:
+        keep &= (times < start) | (times >= end)
+    return keep
+
+
+def column_stats(columns: dict) -> dict:
+    stats = {"count": int(len(columns["time"]))}
+    for name, values in columns.items():
+        finite = values[np.isfinite(values)]
+        stats[name] = [float(finite.min()), float(finite.max())] if len(finite) else None
+    return stats
+
+
+class TriggerStore:
+    def __init__(self, root: str = TRIGGER_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # (dataset dir, bucket, generation, column) -> memory map
+        self._open_lock = threading.Lock()
+
+    def dataset_dir(self, channel: str, config: str = "default") -> str:
+        return os.path.join(self.root, channel.replace(":", "_"), config)
+
+    def datasets(self) -> list[dict]:
+        """[{"channel", "config", "count"}] for every dataset in the store."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for channel in sorted(os.listdir(self.root)):
+            for config in sorted(os.listdir(os.path.join(self.root, channel))):
+                index = self.index(channel, config)
+                if index["partitions"]:
+                    found.append({"channel": index.get("channel", channel), "config": config,
+                                  "count": sum(p["count"] for p in index["partitions"].values())})
+        return found
+
+    # --- reading ---------------------------------------------------------
+    def index(self, channel: str, config: str = "default") -> dict:
+        try:
+            with open(os.path.join(self.dataset_dir(channel, config), "index.json")) as f:
+                index = json.load(f)
+            if index.get("version") == STORE_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"version": STORE_VERSION, "channel": channel, "config": config, "partitions": {}}
+
+    def configs(self, channel: str) -> list[str]:
+        """Config digests with triggers for `channel`, most recently updated first."""
+        channel_dir = os.path.dirname(self.dataset_dir(channel))
+        found = []
+        for config in os.listdir(channel_dir) if os.path.isdir(channel_dir) else ():
+            try:
+                found.append((os.path.getmtime(os.path.join(channel_dir, config, "index.json")), config))
+            except OSError:
+                continue
+        return [config for _, config in sorted(found, reverse=True)]
+
+    def load_partition(self, channel: str, config: str, bucket: int, columns=None, mmap: bool = True) -> dict:
+        """Column arrays of one partition, memory-mapped by default."""
+        directory = os.path.join(self.dataset_dir(channel, config), f"p{bucket}")
+        return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                for name in (columns or COLUMNS)}
+
+    def partition(self, channel: str, config: str, bucket: int, generation) -> "_Partition":
+        """Lazily mapped columns of one partition generation, through the shared map cache."""
+        return _Partition(self, channel, config, bucket, generation)
+
+    def _column(self, channel: str, config: str, bucket: int, generation, name: str) -> np.ndarray:
+        # Rewritten partitions get a new generation, so stale maps are never reused
+        key = (self.dataset_dir(channel, config), bucket, generation, name)
+        with self._open_lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+        values = self.load_partition(channel, config, bucket, (name,))[name]
+        # Checked after mapping: a partition swapped in before this point is caught
+        if generation is not None and self._generation(channel, config, bucket) != generation:
+            raise StalePartition(f"Partition {bucket} of {channel}/{config} was rewritten during the query")
+        with self._open_lock:
+            self._open[key] = values
+            while len(self._open) > OPEN_MAPS:
+                self._open.popitem(last=False)
+        return values
+
+    def _generation(self, channel: str, config: str, bucket: int):
+        try:
+            with open(os.path.join(self.dataset_dir(channel, config), f"p{bucket}", "meta.json")) as f:
+                return json.load(f).get("generation")
+        except (OSError, ValueError):
+            return None
+
+    def resolve_config(self, channel: str, config: str = None) -> str:
+        """`config`, or the most recently updated dataset of the channel."""
+        if config is not None:
+            return config
+        configs = self.configs(channel)
+        return configs[0] if configs else "default"
+
+    def candidates(self, channel: str, config: str, bounds=()) -> list[tuple[int, dict]]:
+        """(bucket, stats) of the partitions whose min/max do not rule out
+        every row for (column, low, high) `bounds`, in time order."""
+        partitions = self.index(channel, config)["partitions"]
+        return [(bucket, partitions[str(bucket)]) for bucket in sorted(int(b) for b in partitions)
+                if _may_match(partitions[str(bucket)], bounds)]
+
+    def _scan(self, channel: str, config: str, bounds):
+        # (bucket, stats, columns, lo, hi, mask or None) for partitions with rows in range
+        start, end = bounds[0][1:]
+        for bucket, stats in self.candidates(channel, config, bounds):
+            part = self.partition(channel, config, bucket, stats.get("generation"))
+            times = part["time"]
+            lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+            hi = len(times) if end is None else int(np.searchsorted(times, end, "left"))
+            if lo >= hi:
+                continue
+            mask = None
+            for name, low, high in bounds[1:]:
+                values = part[name][lo:hi]
+                if low is not None:
+                    mask = values >= low if mask is None else mask & (values >= low)
+                if high is not None:
+                    mask = values <= high if mask is None else mask & (values <= high)
+            yield bucket, stats, part, lo, hi, mask
+
+    def select(self, channel: str, config: str, start=None, end=None, snr_min=None, snr_max=None,
+               fmin=None, fmax=None) -> list[tuple]:
+        """(partition columns, matching row numbers) for each partition with matches, in time order."""
+        bounds = (("time", start, end), ("snr", snr_min, snr_max), ("frequency", fmin, fmax))
+        matches = []
+        for _, _, part, lo, hi, mask in self._scan(channel, config, bounds):
+            rows = np.arange(lo, hi) if mask is None else lo + np.flatnonzero(mask)
+            if len(rows):
+                matches.append((part, rows))
+        return matches
+
+    def count(self, channel: str, config: str, start=None, end=None, snr_min=None, snr_max=None,
+              fmin=None, fmax=None) -> int:
+        """Number of triggers select() would return, without materialising row numbers."""
+        bounds = (("time", start, end), ("snr", snr_min, snr_max), ("frequency", fmin, fmax))
+        return sum(hi - lo if mask is None else int(np.count_nonzero(mask))
+                   for _, _, _, lo, hi, mask in self._scan(channel, config, bounds))
+
+    def query(self, channel: str, config: str = None, start=None, end=None, snr_min=None, snr_max=None,
+              fmin=None, fmax=None, offset: int = 0, limit: int = 1000, order: str = "time") -> dict:
+        """Triggers with start <= time < end and SNR/frequency inside the given bounds.
+
+        `order` is "time" (ascending) or "snr" (loudest first). Returns one page
+        of rows plus the total number of matches. With no `config`, the most
+        recently updated dataset of the channel is used.
+        """
+        if order not in ("time", "snr"):
+            raise ValueError(f"Unknown order {order!r}")
+        limit = max(0, min(int(limit), MAX_QUERY_LIMIT))
+        offset = max(0, int(offset))
+        config = self.resolve_config(channel, config)
+        matches = self.select(channel, config, start, end, snr_min, snr_max, fmin, fmax)
+        total = sum(len(rows) for _, rows in matches)
+
+        page = []  # (columns, row numbers) making up the requested page
+        if order == "time":
+            skip, wanted = offset, limit
+            for part, rows in matches:
+                if wanted <= 0:
+                    break
+                if skip >= len(rows):
+                    skip -= len(rows)
+                    continue
+                taken = rows[skip:skip + wanted]
+                page.append((part, taken))
+                skip, wanted = 0, wanted - len(taken)
+        elif matches and offset < total:
+            snr = np.concatenate([part["snr"][rows] for part, rows in matches])
+            owner = np.repeat(np.arange(len(matches)), [len(rows) for _, rows in matches])
+            position = np.concatenate([np.arange(len(rows)) for _, rows in matches])
+            snr = np.where(np.isnan(snr), -np.inf, snr)
+            needed = min(offset + limit, total)
+            top = np.argpartition(-snr, needed - 1)[:needed] if needed < total else np.arange(total)
+            top = top[np.argsort(-snr[top], kind="stable")][offset:offset + limit]
+            page = [(matches[owner[i]][0], matches[owner[i]][1][position[i]:position[i] + 1]) for i in top]
+
+        triggers = []
+        for part, rows in page:
+            values = {name: part[name][rows].tolist() for name in COLUMNS}
+            for i in range(len(rows)):
+                triggers.append({name: _json_float(values[name][i]) for name in COLUMNS})
+        return {"channel": channel, "config": config, "total": int(total),
+                "offset": offset, "limit": limit, "order": order, "triggers": triggers}
+
+    # --- writing ---------------------------------------------------------
+    def _locked(self, channel: str, config: str):
+        return _DatasetLock(self, self.dataset_dir(channel, config))
+
+    def ingest(self, columns: dict, channel: str, config: str = "default", spans=None) -> int:
+        """Add trigger columns to the store.
+
+        Existing triggers inside any of `spans` [(start, end)] (the intervals
+        the run analysed) are replaced, so ingesting the same run twice does
+        not duplicate it while triggers between those intervals are kept;
+        with spans=None the dataset is replaced entirely. Returns the number
+        of triggers stored from `columns`.
+        """
+        times = columns["time"]
+        buckets = np.floor_divide(times, PARTITION_SECONDS).astype(np.int64)
+        with self._locked(channel, config):
+            index = self.index(channel, config)
+            existing = {int(b) for b in index["partitions"]}
+            affected = set(np.unique(buckets).tolist())
+            if spans is None:
+                affected |= existing
+            else:
+                for start, end in spans:
+                    first, last = int(start // PARTITION_SECONDS), int((end - 1) // PARTITION_SECONDS)
+                    affected |= {b for b in existing if first <= b <= last}
+            for bucket in sorted(affected):
+                new = {name: values[buckets == bucket] for name, values in columns.items()}
+                if bucket in existing:
+                    old = self.load_partition(channel, config, bucket, mmap=False)
+                    keep = np.zeros(len(old["time"]), dtype=bool) if spans is None else outside_spans(old["time"], spans)
+                    new = {name: np.concatenate([old[name][keep], new[name]]) for name in COLUMNS}
+                stats = self._write_partition(channel, config, bucket, new)
+                if stats is None:
+                    index["partitions"].pop(str(bucket), None)
+                else:
+                    index["partitions"][str(bucket)] = stats
+            self._write_index(channel, config, index)
+        return int(len(times))
+
+    def _write_partition(self, channel: str, config: str, bucket: int, columns: dict):
+        dataset = self.dataset_dir(channel, config)
+        final = os.path.join(dataset, f"p{bucket}")
+        if not len(columns["time"]):
+            shutil.rmtree(final, ignore_errors=True)
+            return None
+        order = np.argsort(columns["time"], kind="stable")
+        columns = {name: np.ascontiguousarray(values[order], dtype=COLUMNS[name]) for name, values in columns.items()}
+        stats = column_stats(columns)
+        stats["generation"] = uuid.uuid4().hex[:12]
+        # Build beside the old partition and swap it in; readers holding
+        # memory maps of the old files keep a consistent view.
+        staging = f"{final}.{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(staging)
+        for name, values in columns.items():
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"version": STORE_VERSION, "bucket": bucket, "start": bucket * PARTITION_SECONDS,
+                       "end": (bucket + 1) * PARTITION_SECONDS, "sorted_by": "time", **stats}, f)
+        trash = None
+        if os.path.exists(final):
+            trash = f"{final}.{uuid.uuid4().hex[:8]}.old"
+            os.replace(final, trash)
+        os.replace(staging, final)
+        if trash:
+            shutil.rmtree(trash, ignore_errors=True)
+        return stats
+
+    def _write_index(self, channel: str, config: str, index: dict):
+        path = os.path.join(self.dataset_dir(channel, config), "index.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        index.update(version=STORE_VERSION, channel=channel, config=config)
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def ingest_source(self, source: str, fmt: str, channel: str, config: str = "default", spans=None) -> int:
+        """Ingest a trigger file, or every trigger file of `fmt` under a directory.
+
+        With fmt=None the first format with files under `source` is used.
+        """
+        if os.path.isfile(source):
+            files = [source]
+            fmt = next((f for f, extensions in TRIGGER_EXTENSIONS.items() if source.endswith(extensions)), fmt)
+        else:
+            if fmt is None:
+                fmt = next((f for f in TRIGGER_EXTENSIONS if find_trigger_files(source, f)), "root")
+            files = find_trigger_files(source, fmt)
+        if not files:
+            return 0
+        columns = table_columns(read_triggers(files, fmt))
+        count = self.ingest(columns, channel, config, spans)
+        logger.info(f"Ingested {count} triggers for {channel} ({config}) from {source}")
+        return count
+
+
+def _may_match(stats: dict, bounds) -> bool:
+    """False when a partition's min/max rule out every row for (column, low, high) bounds."""
+    for name, low, high in bounds:
+        span = stats.get(name)
+        if span is None:
+            if low is not None or high is not None:
+                return False  # column is all NaN: no row can satisfy the bound
+            continue
+        if name == "time" and high is not None and span[0] >= high:
+            return False
+        if low is not None and span[1] < low:
+            return False
+        if high is not None and span[0] > high:
+            return False
+    return True
+
+
+def _json_float(value):
+    return None if value != value else value  # NaN -> null
+
+
+class StalePartition(RuntimeError):
+    """A partition was replaced by an ingest while a query was reading it."""
+
+
+class _Partition:
+    """Columns of one partition generation, mapped on first access through
+    the store's cache so holding one does not hold file descriptors."""
+
+    def __init__(self, store: TriggerStore, channel: str, config: str, bucket: int, generation):
+        self._args = (store, channel, config, bucket, generation)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        store, channel, config, bucket, generation = self._args
+        return store._column(channel, config, bucket, generation, name)
+
+
+class _DatasetLock:
+    """Serialises writers of one dataset across threads and worker processes."""
+
+    def __init__(self, store: TriggerStore, directory: str):
+        self.store = store
+        self.directory = directory
+        self._file = None
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        os.makedirs(self.directory, exist_ok=True)
+        if fcntl is not None:
+            self._file = open(os.path.join(self.directory, "lock"), "w")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            self._file.close()
+        self.store._lock.release()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_trigger_store() -> TriggerStore:
+    """Return the shared trigger store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TriggerStore()
+        return _store
@@ -3,6 +3,7 @@ import sys
 import logging
 import socket
 import time
+import math
 import subprocess
 import json
 import threading
@@ -21,17 +22,24 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVB
                              QPushButton, QComboBox, QLineEdit, QFileDialog, QLabel, QCheckBox,
                              QTextEdit, QScrollArea, QFrame, QSlider, QMessageBox, QProgressBar,QListWidget)
 from PyQt5.QtCore import Qt, QTimer, QMetaObject, QGenericArgument, pyqtSignal, QObject
-from PyQt5.QtGui import QFont, QPalette, QColor, QLinearGradient, QBrush, QPainter
-from PyQt5.QtWidgets import QDialog
+from PyQt5.QtGui import QFont, QPalette, QColor, QLinearGradient, QBrush, QPainter, QPen
+from PyQt5.QtWidgets import QDialog, QInputDialog
 import requests_pelican as rp
 from gwdatafind import find_urls, find_types
 from PyQt5.QtCore import pyqtSignal
 import requests
 from requests.exceptions import RequestException
 import traceback
-from gwpy.detector import ChannelList, Channel
 from gwpy.timeseries import TimeSeries
-import re
+from core.datafind import get_client
+from core.nds_catalog import get_catalog
+from core.availability import get_availability_index
+from core.omicron import data_blocks, describe_blocks, ffl_segments, run_omicron, run_omicron_parallel
+from core.omicron_config import OmicronConfig
+from core.omicron_sweep import parse_sweep_values, run_omicron_sweep
+from core.resources import ResourceMonitor, format_usage, monitor_resources
+from core.trigger_store import TRIGGER_STORE_DIR, TriggerStore
+from core.omiviz import Omiviz
 
 # ANSI color codes for CLI output
 COLORS = {
@@ -49,7 +57,8 @@ logging.basicConfig(
     handlers=[
         logging.FileHandler('GWeasy_log.txt'),
         logging.StreamHandler(sys.stdout)
-    ]
+    ],
+    force=True  # core.gravfetch configures logging on import
 )
 
 # Ensure the path to the shared library is added to the system path
@@ -134,12 +143,12 @@ class TerminalWidget(QTextEdit):
         )
 
 class SplashScreen(QWidget):
-    def __init__(self, callback):
+    """Shown until the main window reports it is ready (see MainWindow.ready)."""
+    def __init__(self):
         super().__init__()
         self.setWindowTitle("GWeasy")
         self.setFixedSize(400, 250)
         self.setWindowFlags(Qt.SplashScreen | Qt.WindowStaysOnTopHint)
-        self.callback = callback
 
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignCenter)
@@ -152,8 +161,7 @@ class SplashScreen(QWidget):
         layout.addWidget(logo)
 
         self.progress = QProgressBar(self)
-        self.progress.setRange(0, 100)
-        self.progress.setValue(0)
+        self.progress.setRange(0, 0)  # Busy indicator until the window is ready
         self.progress.setStyleSheet("""
             QProgressBar {
                 border: 1px solid #CED4DA;
@@ -178,26 +186,16 @@ class SplashScreen(QWidget):
         self.setLayout(layout)
         self.setStyleSheet(f"background-color: {COLOR_BG_BOTTOM};")
 
-        self.progress_value = 0
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress)
-        self.timer.start(30)  # 5 seconds = 5000ms / 50ms = 100 steps
-
-    def update_progress(self):
-        self.progress_value += 1
-        self.progress.setValue(self.progress_value)
-        if self.progress_value >= 100:
-            self.timer.stop()
-            self.close()
-            self.callback()
-
 class MainWindow(QMainWindow):
+    ready = pyqtSignal()  # Emitted once the window is built and the event loop is serving it
+
     def __init__(self, cli_mode=False):
         super().__init__()
         self.terminal = None
         self.cli_mode = cli_mode
         if not cli_mode:
             self.init_ui()
+            QTimer.singleShot(0, self.ready.emit)
 
     def init_ui(self):
         self.setWindowTitle("GWeasy")
@@ -207,7 +205,7 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         grav_tab = GravfetchApp(self.tabs, self.append_output)
         omicron_tab = OmicronApp(self.tabs, self.append_output)
-        omiviz_tab = GradientWidget()  # Placeholder for Omiviz
+        omiviz_tab = OmivizApp(self.tabs, self.append_output)
 
         self.tabs.addTab(grav_tab, "Gravfetch")
         self.tabs.addTab(omicron_tab, "OMICRON")
@@ -276,6 +274,8 @@ class MainWindow(QMainWindow):
 
 class GravfetchApp(GradientWidget):
     log_signal = pyqtSignal(str, str)  # message, level
+    frame_types_ready = pyqtSignal(int, str, object)  # warm-up generation, detector code, frame types or Exception
+    nds_table_ready = pyqtSignal(int, str, object)    # warm-up generation, detector code, ChannelTable or Exception
 
     def __init__(self, parent, append_output_callback):
         super().__init__(parent)
@@ -294,6 +294,16 @@ class GravfetchApp(GradientWidget):
         self.selected_host = None
         self.append_output = append_output_callback
         self.log_signal.connect(self.append_output)
+        self.frame_types_ready.connect(self.on_frame_types_ready)
+        self.nds_table_ready.connect(self.on_nds_table_ready)
+        # Background metadata warm-up (frame types / NDS channel tables per detector)
+        self.warmup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gravfetch-warmup")
+        self.warmup_generation = 0
+        self.warmup_futures = []
+        self.warmup_total = 0
+        self.warmup_done = 0
+        self.osdf_pending = set()
+        self.nds_pending = set()
         # OSDF-specific attributes
         self.detectors = [
             ("LIGO-Hanford", "H"),
@@ -301,6 +311,7 @@ class GravfetchApp(GradientWidget):
             ("Virgo", "V"),
             ("KAGRA", "K"),
         ]
+        self.datafind = get_client()
         self.frame_types = {}  # Cache: {detector_code: [frame_types]}
         self.time_segments = {}  # Cache: {(detector_code, frame_type): [segments]}
         self.selected_detector = None
@@ -314,7 +325,9 @@ class GravfetchApp(GradientWidget):
             ("KAGRA", "K1"),
             ("","G1")
         ]
-        self.nds_channels = {}  # Cache: {detector_code: [(channel_name, sample_rate)]}
+        self.nds_catalog = get_catalog()
+        self.nds_availability = get_availability_index()
+        self.nds_channels = {}  # Cache: {detector_code: ChannelTable}
         self.nds_groups = {}    # Cache: {detector_code: [group_names]}
         self.nds_segments = {}  # Cache: {channel_name: [segments]}
         self.selected_nds_detector = None
@@ -333,7 +346,7 @@ class GravfetchApp(GradientWidget):
                 self.append_output(f"Failed to read history file: {e}", "error")
 
         self.setup_ui()
-        self.refresh_osdf_data() 
+        self.refresh_osdf_data()
         self.refresh_nds_data()
 
     def setup_ui(self):
@@ -343,7 +356,44 @@ class GravfetchApp(GradientWidget):
         self.tabs.addTab(self.public_tab, "Public")
         self.tabs.addTab(self.assoc_tab, "LIGO Assoc")
 
+        warmup_layout = QHBoxLayout()
+        self.warmup_progress = QProgressBar()
+        self.warmup_progress.setFormat("Loading detector metadata... %v/%m")
+        self.warmup_progress.setStyleSheet("""
+            QProgressBar {
+                border: 1px solid #CED4DA;
+                border-radius: 5px;
+                text-align: center;
+                background-color: #1C2526;
+                color: #FFFFFF;
+            }
+            QProgressBar::chunk {
+                background-color: #CED4DA;
+                border-radius: 3px;
+            }
+        """)
+        self.warmup_cancel_btn = QPushButton("Cancel")
+        self.warmup_cancel_btn.setFont(FONT_BUTTON)
+        self.warmup_cancel_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COLOR_ACCENT};
+                color: {COLOR_FG};
+                border: 1px solid {COLOR_FG};
+                border-radius: 5px;
+                padding: 4px 12px;
+            }}
+            QPushButton:hover {{
+                background-color: {COLOR_HOVER};
+            }}
+        """)
+        self.warmup_cancel_btn.clicked.connect(self.cancel_warmup)
+        warmup_layout.addWidget(self.warmup_progress)
+        warmup_layout.addWidget(self.warmup_cancel_btn)
+        self.warmup_progress.hide()
+        self.warmup_cancel_btn.hide()
+
         layout = QVBoxLayout()
+        layout.addLayout(warmup_layout)
         layout.addWidget(self.tabs)
         self.setLayout(layout)
 
@@ -894,74 +944,115 @@ class GravfetchApp(GradientWidget):
         layout.addStretch()
         self.assoc_tab.setLayout(layout)
 
+    def submit_warmup(self, fn, det_code):
+        if self.warmup_done >= self.warmup_total:
+            self.warmup_total = self.warmup_done = 0
+        self.warmup_total += 1
+        self.warmup_progress.setRange(0, self.warmup_total)
+        self.warmup_progress.setValue(self.warmup_done)
+        self.warmup_progress.show()
+        self.warmup_cancel_btn.show()
+        self.warmup_futures.append(self.warmup_executor.submit(fn, self.warmup_generation, det_code))
+
+    def warmup_step(self):
+        self.warmup_done += 1
+        self.warmup_progress.setValue(self.warmup_done)
+        if self.warmup_done >= self.warmup_total:
+            self.warmup_futures = []
+            self.warmup_progress.hide()
+            self.warmup_cancel_btn.hide()
+
+    def cancel_warmup(self):
+        # Queued lookups are dropped; lookups already running finish in the
+        # background but their results are ignored (stale generation).
+        for future in self.warmup_futures:
+            future.cancel()
+        self.warmup_generation += 1
+        self.warmup_futures = []
+        self.warmup_total = self.warmup_done = 0
+        self.warmup_progress.hide()
+        self.warmup_cancel_btn.hide()
+        if self.osdf_pending:
+            self.osdf_pending.clear()
+            self.status_label_osdf.setText("OSDF refresh cancelled")
+        if self.nds_pending:
+            self.nds_pending.clear()
+            self.status_label_nds.setText("NDS refresh cancelled")
+        self.log_signal.emit("Metadata refresh cancelled", "warning")
+
     def refresh_osdf_data(self):
         self.status_label_osdf.setText("Refreshing OSDF data...")
         self.log_signal.emit("Refreshing OSDF data...", "info")
+        for _, det_code in self.detectors:
+            if det_code not in self.osdf_pending:
+                self.osdf_pending.add(det_code)
+                self.submit_warmup(self.fetch_frame_types, det_code)
+
+    def fetch_frame_types(self, generation, det_code):
+        # Runs on a warm-up worker thread: no widget access, report via signal
         try:
-            for _, det_code in self.detectors:
-                try:
-                    # Use gw_data_find to list available frame types for the detector
-                    cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", det_code, "--show-types"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    frame_types = []
-                    for line in result.stdout.strip().split("\n"):
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            frame_types.append(line)
-                    self.frame_types[det_code] = frame_types if frame_types else ["No frame types available"]
-                    self.log_signal.emit(f"Fetched {len(frame_types)} frame types for {det_code}", "info")
-                except subprocess.CalledProcessError as e:
-                    self.log_signal.emit(f"Error fetching frame types for {det_code}: {e}", "error")
-                    self.frame_types[det_code] = ["No frame types available"]
-                except Exception as e:
-                    self.log_signal.emit(f"Unexpected error fetching frame types for {det_code}: {e}", "error")
-                    self.frame_types[det_code] = ["No frame types available"]
+            result = self.datafind.frame_types(det_code)
+        except Exception as e:
+            result = e
+        self.frame_types_ready.emit(generation, det_code, result)
 
-            # Update frame type list if a detector is selected
-            if self.selected_detector_code and self.selected_detector_code in self.frame_types:
-                self.osdf_frametype_list.clear()
-                self.osdf_frametype_list.addItems(self.frame_types[self.selected_detector_code])
-                self.log_signal.emit(f"Updated frame types for {self.selected_detector_code}", "info")
+    def on_frame_types_ready(self, generation, det_code, result):
+        if generation != self.warmup_generation:
+            return
+        if isinstance(result, Exception):
+            self.log_signal.emit(f"Error fetching frame types for {det_code}: {result}", "error")
+            self.frame_types[det_code] = ["No frame types available"]
+        else:
+            self.frame_types[det_code] = result if result else ["No frame types available"]
+            self.log_signal.emit(f"Fetched {len(result)} frame types for {det_code}", "info")
 
+        # Update frame type list if this detector is selected
+        if det_code == self.selected_detector_code:
+            self.osdf_frametype_list.clear()
+            self.osdf_frametype_list.addItems(self.frame_types[det_code])
+            self.log_signal.emit(f"Updated frame types for {det_code}", "info")
+
+        self.osdf_pending.discard(det_code)
+        if not self.osdf_pending:
             self.status_label_osdf.setText("OSDF data refreshed")
             self.log_signal.emit("OSDF data refreshed successfully", "success")
-        except Exception as e:
-            self.log_signal.emit(f"Error refreshing OSDF data: {e}", "error")
-            self.status_label_osdf.setText("Idle")
+        self.warmup_step()
 
     def refresh_nds_data(self):
         self.status_label_nds.setText("Refreshing NDS data...")
         self.log_signal.emit("Refreshing NDS data...", "info")
+        for _, det_code in self.nds_detectors:
+            if det_code not in self.nds_pending:
+                self.nds_pending.add(det_code)
+                self.submit_warmup(self.fetch_nds_table, det_code)
+
+    def fetch_nds_table(self, generation, det_code):
         try:
-            for _, det_code in self.nds_detectors:
-                try:
-                    chanlist = ChannelList.query_nds2(f'{det_code}:*', host='nds.gwosc.org')
-                    groups = {}
-                    channels = []
-                    for chan in chanlist:
-                        match = re.match(r'^(H1|L1|V1|K1):([A-Z]+)-?.*', chan.name)
-                        if match:
-                            group = match.group(2)
-                            channels.append((chan.name, str(chan.sample_rate)))
-                            if group not in groups:
-                                groups[group] = []
-                            groups[group].append((chan.name, str(chan.sample_rate)))
-                    self.nds_channels[det_code] = channels
-                    self.nds_groups[det_code] = sorted(groups.keys())
-                except Exception as e:
-                    self.log_signal.emit(f"Error fetching channels for {det_code}: {e}", "error")
-                    self.nds_channels[det_code] = []
-                    self.nds_groups[det_code] = ["No groups available"]
+            result = self.nds_catalog.table(det_code)
+        except Exception as e:
+            result = e
+        self.nds_table_ready.emit(generation, det_code, result)
 
-            if self.selected_nds_detector_code and self.selected_nds_detector_code in self.nds_groups:
-                self.nds_group_list.clear()
-                self.nds_group_list.addItems(self.nds_groups[self.selected_nds_detector_code])
+    def on_nds_table_ready(self, generation, det_code, result):
+        if generation != self.warmup_generation:
+            return
+        if isinstance(result, Exception):
+            self.log_signal.emit(f"Error fetching channels for {det_code}: {result}", "error")
+            self.nds_channels.pop(det_code, None)
+            self.nds_groups[det_code] = ["No groups available"]
+        else:
+            self.nds_channels[det_code] = result
+            self.nds_groups[det_code] = result.groups()
+
+        if det_code == self.selected_nds_detector_code:
+            self.nds_group_list.clear()
+            self.nds_group_list.addItems(self.nds_groups[det_code])
 
+        self.nds_pending.discard(det_code)
+        if not self.nds_pending:
             self.status_label_nds.setText("NDS data refreshed")
             self.log_signal.emit("NDS data refreshed successfully", "success")
-        except Exception as e:
-            self.log_signal.emit(f"Error refreshing NDS data: {e}", "error")
-            self.status_label_nds.setText("Idle")
+        self.warmup_step()
 
     def on_detector_select(self, current, previous):
         if current:
@@ -998,9 +1089,9 @@ class GravfetchApp(GradientWidget):
             if (self.selected_nds_detector_code and 
                 self.selected_nds_group and 
                 self.selected_nds_group != "No groups available"):
-                channels = [(name, rate) for name, rate in self.nds_channels.get(self.selected_nds_detector_code, []) 
-                           if re.match(rf'^{self.selected_nds_detector_code}:{self.selected_nds_group}-?.*', name)]
-                self.nds_channel_list.addItems([f"{name} ({rate})" for name, rate in channels])
+                table = self.nds_channels.get(self.selected_nds_detector_code)
+                channels = table.group(self.selected_nds_group) if table is not None else []
+                self.nds_channel_list.addItems([f"{name} ({rate} Hz)" for name, rate in channels])
             else:
                 self.nds_channel_list.addItems(["No channels available"])
             self.nds_segments_list.clear()
@@ -1013,34 +1104,15 @@ class GravfetchApp(GradientWidget):
             self.osdf_segments_list.clear()
             if self.selected_detector_code and self.selected_osdf_frametype and self.selected_osdf_frametype != "No frame types available":
                 try:
-                    cmd = ["gw_data_find", "-r", "datafind.gwosc.org", "-o", self.selected_detector_code, "-t", self.selected_osdf_frametype, "--show-times"]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    segments = []
-                    display_segments = []
-                    for line in result.stdout.strip().split("\n"):
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            try:
-                                parts = line.split()
-                                if len(parts) >= 4:
-                                    seg_id, start, end, duration = parts[:4]
-                                    start, end, duration = int(start), int(end), int(duration)
-                                    segments.append(f"{start}_{end}")
-                                    display_segments.append(f"{seg_id} {start}_{end} ({duration}s)")
-                                else:
-                                    self.append_output(f"Skipping invalid segment line: {line} (insufficient fields)", "warning")
-                            except ValueError as e:
-                                self.append_output(f"Skipping invalid segment line: {line} ({e})", "warning")
-                                continue
+                    found = self.datafind.segments(self.selected_detector_code, self.selected_osdf_frametype)
+                    segments = [seg.label for seg in found]
+                    display_segments = [f"{i} {seg.label} ({seg.duration}s)" for i, seg in enumerate(found)]
                     self.time_segments[(self.selected_detector_code, self.selected_osdf_frametype)] = segments if segments else ["No segments available"]
                     self.osdf_segments_list.addItems(display_segments if display_segments else ["No segments available"])
-                except subprocess.CalledProcessError as e:
+                except Exception as e:
                     self.append_output(f"Error fetching time segments for {self.selected_detector_code}/{self.selected_osdf_frametype}: {e}", "error")
                     self.time_segments[(self.selected_detector_code, self.selected_osdf_frametype)] = ["No segments available"]
                     self.osdf_segments_list.addItems(["No segments available"])
-                except Exception as e:
-                    self.append_output(f"Unexpected error fetching time segments: {e}", "error")
-                    self.osdf_segments_list.addItems(["No segments available"])
             else:
                 self.osdf_segments_list.addItems(["No segments available"])
             self.selected_osdf_segments = []
@@ -1325,17 +1397,23 @@ class GravfetchApp(GradientWidget):
                 self.selected_nds_channel and 
                 self.selected_nds_channel != "No channels available"):
                 try:
-                    start_time = 1238112018
-                    end_time = 1238198418
-                    chanlist = ChannelList([Channel(self.selected_nds_channel)])
-                    available = chanlist.query_nds2_availability([chanlist[0]], start_time, end_time, host='nds.gwosc.org')
+                    # Use the custom GPS window when one is entered, else the default window
+                    start_time, end_time = 1238112018, 1238198418
+                    custom_start = self.nds_custom_start_edit.text().strip()
+                    custom_end = self.nds_custom_end_edit.text().strip()
+                    if custom_start and custom_end:
+                        try:
+                            start_time, end_time = int(float(custom_start)), int(float(custom_end))
+                        except ValueError:
+                            self.log_signal.emit("Invalid custom GPS times, using default availability window.", "warning")
+                    available = self.nds_availability.query(self.selected_nds_channel, start_time, end_time)
                     segments = []
                     display_segments = []
-                    for chan in available:
-                        for i, (start, end) in enumerate(available[chan]):
-                            duration = end - start
-                            segments.append(f"{start}_{end}")
-                            display_segments.append(f"{i+1} {start}_{end} ({duration}s)")
+                    for i, (start, end) in enumerate(available):
+                        start, end = int(start), int(end)
+                        duration = end - start
+                        segments.append(f"{start}_{end}")
+                        display_segments.append(f"{i+1} {start}_{end} ({duration}s)")
                     self.nds_segments[self.selected_nds_channel] = segments if segments else ["No segments available"]
                     self.nds_segments_list.addItems(display_segments if display_segments else ["No segments available"])
                 except Exception as e:
@@ -1927,9 +2005,17 @@ class OmicronApp(QWidget):
                 }}
             """)
             start_btn.clicked.connect(self.run_omicron_script)
+            sweep_btn = QPushButton("Parameter Sweep")
+            sweep_btn.setFont(FONT_BUTTON)
+            sweep_btn.setStyleSheet(start_btn.styleSheet())
+            sweep_btn.clicked.connect(self.open_sweep_dialog)
             button_layout.addWidget(custom_segs_btn)
             button_layout.addWidget(save_btn)
             button_layout.addWidget(start_btn)
+            button_layout.addWidget(sweep_btn)
+            self.parallel_checkbox = QCheckBox(f"Parallel ({os.cpu_count() or 1} cores)")
+            self.parallel_checkbox.setToolTip("Split the FFL span into chunks and run one OMICRON process per CPU core")
+            button_layout.addWidget(self.parallel_checkbox)
             layout.addLayout(button_layout)
 
             param_frame = QFrame()
@@ -2170,6 +2256,9 @@ class OmicronApp(QWidget):
         self.append_output_signal.emit("Starting OMICRON script...\n", "info")
         threading.Thread(target=self.start_omicron_process, daemon=True).start()
 
+    def report_resources(self, usage):
+        self.append_output_signal.emit(f"Resources: {format_usage(usage)}\n", "info")
+
     def start_omicron_process(self):
         try:
             ffl_widget = self.ui_elements["DATA FFL"]
@@ -2184,12 +2273,36 @@ class OmicronApp(QWidget):
                 self.append_output_signal.emit("Error: Invalid .ffl file format.\n", "error")
                 self.show_message_box_signal.emit("Error", "Invalid .ffl file format.", "critical")
                 return
-            first_time_segment = lines[0][1]
-            last_time_segment = lines[-1][1]
-            omicron_cmd_lx = f'eval "$(conda shell.bash hook)" && conda activate GWeasy && omicron {first_time_segment} {last_time_segment} ./config.txt > omicron.out 2>&1'
-            omicron_cmd = f"omicron {first_time_segment} {last_time_segment} ./config.txt > omicron.out 2>&1"
-            
+            if self.parallel_checkbox.isChecked():
+                # Chunks of the span run side by side and their triggers are merged
+                failed = False
+                with monitor_resources(self.report_resources):
+                    for line in run_omicron_parallel(ffl_file, self.config_path):
+                        failed = failed or line.startswith("[ERROR]")
+                        self.append_output_signal.emit(line + "\n", "error" if line.startswith("[ERROR]") else "info")
+                if failed:
+                    self.show_message_box_signal.emit("Error", "Parallel OMICRON run failed, see output.", "critical")
+                else:
+                    self.show_message_box_signal.emit("Success", "OMICRON process completed successfully.", "information")
+                return
+            output_dir = self.config_data.get("OUTPUT DIRECTORY") or self.default_output_dir
+
             if platform.system() == "Windows":
+                # One omicron per contiguous block of the FFL, so no time goes to the gaps
+                config = OmicronConfig.read(self.config_path)
+                segments = ffl_segments(ffl_file)
+                blocks = data_blocks(segments, config.psd_length)
+                if not blocks:
+                    message = f"No stretch of data in the .ffl lasts PSDLENGTH ({config.psd_length} s)."
+                    self.append_output_signal.emit(f"Error: {message}\n", "error")
+                    self.show_message_box_signal.emit("Error", message, "critical")
+                    return
+                self.append_output_signal.emit(f"Running over {describe_blocks(blocks, segments)}\n", "info")
+                # Run from a hash-named snapshot so later edits to config.txt can't change this run
+                config_snapshot = os.path.relpath(config.snapshot(
+                    os.path.join(output_dir, "configs"))).replace("\\", "/")
+                self.append_output_signal.emit(f"Using config snapshot {config_snapshot}\n", "info")
+
                 # Validate WSL environment
                 process = subprocess.Popen(
                     ["wsl", "--list", "--all"],
@@ -2244,29 +2357,35 @@ class OmicronApp(QWidget):
                 conda_base = os.path.dirname(os.path.dirname(conda_path))
                 conda_init = f"{conda_base}/etc/profile.d/conda.sh"
 
-                # Prepare and run Omicron command
-                omicron_cmd = f"omicron {first_time_segment} {last_time_segment} ./config.txt > omicron.out 2>&1"
-                wsl_command = f'wsl --user {username} bash -lic "source {conda_init} && conda activate base && {omicron_cmd}"'
-                self.append_output_signal.emit(f"Running: {wsl_command}\n", "info")
-
-                # Run Omicron command once, no retries
+                # Run each block once, no retries; the log collects every block
                 try:
-                    process = subprocess.Popen(
-                        wsl_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                    )
-                    while True:
-                        output = process.stdout.readline()
-                        if output == "" and process.poll() is not None:
-                            break
-                        if output:
-                            self.append_output_signal.emit(output.strip() + "\n", "info")
-                    while True:
-                        error = process.stderr.readline()
-                        if error == "" and process.poll() is not None:
+                    open("omicron.out", "w").close()
+                    monitor = ResourceMonitor()
+                    monitor.start()
+                    for first_time_segment, last_time_segment in blocks:
+                        omicron_cmd = f"omicron {first_time_segment} {last_time_segment} {config_snapshot} >> omicron.out 2>&1"
+                        wsl_command = f'wsl --user {username} bash -lic "source {conda_init} && conda activate base && {omicron_cmd}"'
+                        self.append_output_signal.emit(f"Running: {wsl_command}\n", "info")
+                        process = subprocess.Popen(
+                            wsl_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+                        )
+                        monitor.track(process.pid)
+                        while True:
+                            output = process.stdout.readline()
+                            if output == "" and process.poll() is not None:
+                                break
+                            if output:
+                                self.append_output_signal.emit(output.strip() + "\n", "info")
+                        while True:
+                            error = process.stderr.readline()
+                            if error == "" and process.poll() is not None:
+                                break
+                            if error:
+                                self.append_output_signal.emit(f"ERROR: {error.strip()}\n", "error")
+                        process.wait()
+                        if process.returncode != 0:
                             break
-                        if error:
-                            self.append_output_signal.emit(f"ERROR: {error.strip()}\n", "error")
-                    process.wait()
+                    self.report_resources(monitor.stop())
                     if process.returncode == 0:
                         self.append_output_signal.emit("OMICRON process completed successfully.\n", "success")
                         self.show_message_box_signal.emit("Success", "OMICRON process completed successfully.", "information")
@@ -2282,28 +2401,14 @@ class OmicronApp(QWidget):
             ###LINUX
             else:
                 print("Running in Linux")
-                self.append_output_signal.emit(f"Running: {omicron_cmd_lx}\n", "info")
-                process = subprocess.Popen(
-                    omicron_cmd_lx, shell=True,executable="/bin/bash", stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-                )
-                while True:
-                    output = process.stdout.readline()
-                    if output == "" and process.poll() is not None:
-                        break
-                    if output:
-                        self.append_output_signal.emit(output.strip() + "\n", "info")
-
-                while True:
-                    error = process.stderr.readline()
-                    if error == "" and process.poll() is not None:
-                        break
-                    if error:
-                        self.append_output_signal.emit(f"ERROR: {error.strip()}\n", "error")
-
-                process.wait()
-                if process.returncode != 0:
-                    self.append_output_signal.emit(f"Error: Command failed with return code {process.returncode}.\n", "error")
-                    self.show_message_box_signal.emit("Error", f"Command failed with return code {process.returncode}.", "critical")
+                # One omicron per contiguous block of the FFL, as the web service runs it
+                failed = False
+                with monitor_resources(self.report_resources):
+                    for line in run_omicron(ffl_file, self.config_path, output_dir):
+                        failed = failed or line.startswith("[ERROR]")
+                        self.append_output_signal.emit(line + "\n", "error" if line.startswith("[ERROR]") else "info")
+                if failed:
+                    self.show_message_box_signal.emit("Error", "OMICRON run failed, see output.", "critical")
                 else:
                     self.append_output_signal.emit("OMICRON process completed successfully.\n", "success")
                     self.show_message_box_signal.emit("Success", "OMICRON process completed successfully.", "information")
@@ -2342,6 +2447,70 @@ class OmicronApp(QWidget):
             self.append_output_signal.emit(f"Error loading config: {e}\n", "error")
             self.show_message_box_signal.emit("Error", f"Error loading config: {e}", "critical")
 
+    SWEEP_PARAMETERS = [("SNR Threshold:", "snr_threshold", "PARAMETER SNRTHRESHOLD"),
+                        ("Q-Range:", "q_range", "PARAMETER QRANGE"),
+                        ("Frequency Range:", "frequency_range", "PARAMETER FREQUENCYRANGE"),
+                        ("Mismatch Max:", "mismatch_max", "PARAMETER MISMATCHMAX")]
+
+    def open_sweep_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Parameter Sweep")
+        dialog.resize(460, 320)
+        dialog.setStyleSheet("""
+            QDialog {
+                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                                            stop:0 #E8ECEF, stop:1 #1C2526);
+            }
+        """)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel("Comma-separated options or start:stop:step.\nOne OMICRON run per combination.",
+                                styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        fields = {}
+        for label, name, key in self.SWEEP_PARAMETERS:
+            layout.addWidget(QLabel(label, font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+            field = QLineEdit(self.config_data.get(key, ""))
+            field.setStyleSheet(f"border: 1px solid {COLOR_FG}; border-radius: 5px; padding: 4px; background-color: #747576; color: {COLOR_FG};")
+            layout.addWidget(field)
+            fields[name] = field
+        run_btn = QPushButton("Run Sweep")
+        run_btn.setFont(FONT_BUTTON)
+        layout.addWidget(run_btn)
+
+        def start():
+            try:
+                grid = {name: parse_sweep_values(field.text()) for name, field in fields.items() if field.text().strip()}
+            except ValueError as e:
+                self.show_message_box_signal.emit("Error", f"Invalid sweep values: {e}", "critical")
+                return
+            dialog.accept()
+            self.append_output_signal.emit("Starting OMICRON parameter sweep...\n", "info")
+            threading.Thread(target=self.start_sweep_process, args=(grid,), daemon=True).start()
+
+        run_btn.clicked.connect(start)
+        dialog.exec_()
+
+    def start_sweep_process(self, grid):
+        try:
+            ffl_widget = self.ui_elements["DATA FFL"]
+            ffl_file = ffl_widget.text().strip() if ffl_widget else ""
+            if not ffl_file or not os.path.exists(ffl_file):
+                self.append_output_signal.emit("Error: No valid .ffl file selected.\n", "error")
+                self.show_message_box_signal.emit("Error", "No valid .ffl file selected.", "critical")
+                return
+            output_dir = self.config_data.get("OUTPUT DIRECTORY") or self.default_output_dir
+            result = {}
+            with monitor_resources(self.report_resources):
+                for line in run_omicron_sweep(ffl_file, self.config_path, grid, output_dir, on_progress=result.update):
+                    level = "error" if line.startswith("[ERROR]") else "warning" if line.startswith("[WARNING]") else "info"
+                    self.append_output_signal.emit(line + "\n", level)
+            if result.get("succeeded"):
+                self.show_message_box_signal.emit("Success", f"Sweep finished. Comparison table: {result['comparison']}", "information")
+            else:
+                self.show_message_box_signal.emit("Error", "Parameter sweep failed, see output.", "critical")
+        except Exception as e:
+            self.append_output_signal.emit(f"Sweep error: {e}\n", "error")
+            self.show_message_box_signal.emit("Error", f"Parameter sweep failed: {e}", "critical")
+
     def open_custom_segs_dialog(self):
         channel_dir = QFileDialog.getExistingDirectory(self, "Select Channel Directory")
         if not channel_dir:
@@ -2637,6 +2806,286 @@ class OmicronApp(QWidget):
             self.append_output_signal.emit(f"Error saving config: {e}", "error")
             self.show_message_box_signal.emit("Error", f"An error occurred while saving the config: {str(e)}", "critical")
 
+########################################################################################################################################
+#############################################################    OMIVIZ    #############################################################
+########################################################################################################################################
+
+def omiviz_colour(value):
+    """Dark blue -> electric blue -> yellow -> red for value in [0, 1]."""
+    stops = [(16, 23, 24), (0, 183, 235), (255, 193, 7), (220, 53, 69)]
+    x = min(max(value, 0.0), 1.0) * (len(stops) - 1)
+    i = min(int(x), len(stops) - 2)
+    f = x - i
+    return QColor(*(int(a + (b - a) * f) for a, b in zip(stops[i], stops[i + 1])))
+
+class TriggerPlotWidget(QWidget):
+    zoom_requested = pyqtSignal(float, float)  # GPS start, end of a dragged range
+
+    MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 70, 15, 10, 40
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(320)
+        self.data = None
+        self.kind = "density"
+        self.span = None   # (start, end, fmin, fmax) of the drawn plot
+        self.drag_from = None
+
+    def set_data(self, data, kind):
+        self.data, self.kind = data, kind
+        self.update()
+
+    def plot_rect(self):
+        return (self.MARGIN_LEFT, self.MARGIN_TOP,
+                max(1, self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT),
+                max(1, self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM))
+
+    def to_x(self, t):
+        left, _, w, _ = self.plot_rect()
+        start, end = self.span[:2]
+        return left + (t - start) / (end - start) * w
+
+    def to_y(self, f):
+        _, top, _, h = self.plot_rect()
+        lmin, lmax = math.log10(self.span[2]), math.log10(self.span[3])
+        return top + h - (math.log10(max(f, 1e-3)) - lmin) / (lmax - lmin) * h
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#000000"))
+        if not self.data or not self.data.get("time"):
+            painter.setPen(QColor(COLOR_FG))
+            painter.drawText(self.rect(), Qt.AlignCenter, "No triggers to show")
+            return
+        if self.kind == "scatter":
+            self.paint_scatter(painter)
+        else:
+            self.paint_tiles(painter)
+        self.paint_axes(painter)
+
+    def paint_tiles(self, painter):
+        data = self.data
+        edges = data["freq_edges"]
+        self.span = (data["start"], data["end"], data.get("fmin") or edges[0], data.get("fmax") or edges[-1])
+        values = data["snr_max"] if self.kind == "snr" else data["count"]
+        top = math.log10(max(max(values), 1) + 1)
+        for t, fbin, v in zip(data["time"], data["freq"], values):
+            x0, x1 = self.to_x(t), self.to_x(t + data["width"])
+            y0, y1 = self.to_y(edges[fbin + 1]), self.to_y(edges[fbin])
+            painter.fillRect(int(x0), int(y0), max(1, math.ceil(x1) - int(x0)), max(1, math.ceil(y1) - int(y0)),
+                             omiviz_colour(math.log10(v + 1) / top))
+
+    def paint_scatter(self, painter):
+        data = self.data
+        times, freqs, snrs = data["time"], data["frequency"], data["snr"]
+        start = data.get("start") if data.get("start") is not None else times[0]
+        end = data.get("end") if data.get("end") is not None else times[-1] + 1
+        fmin = data.get("fmin") or max(1.0, min(freqs))
+        fmax = data.get("fmax") or max(freqs) * 1.05
+        self.span = (start, end, fmin, max(fmax, fmin * 1.1))
+        top = math.log10(max(max(snrs), 1.1))
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        for t, f, s in zip(times, freqs, snrs):
+            painter.setBrush(omiviz_colour(math.log10(max(s, 1.0)) / top))
+            painter.drawEllipse(int(self.to_x(t)) - 2, int(self.to_y(f)) - 2, 5, 5)
+
+    def paint_axes(self, painter):
+        left, top, w, h = self.plot_rect()
+        start, end, fmin, fmax = self.span
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(QPen(QColor("#A9A9A9")))
+        painter.drawRect(left, top, w, h)
+        painter.setPen(QColor(COLOR_FG))
+        for i in range(6):
+            t = start + (end - start) * i / 5
+            painter.drawText(min(int(self.to_x(t)) - 20, left + w - 70), top + h + 16, f"{t - start:.0f} s")
+        painter.drawText(left + w // 2 - 80, top + h + 34, f"Time since GPS {start:.0f}")
+        for decade in range(math.ceil(math.log10(fmin)), math.floor(math.log10(fmax)) + 1):
+            painter.drawText(5, int(self.to_y(10 ** decade)) + 4, f"{10 ** decade:g} Hz")
+
+    def mousePressEvent(self, event):
+        self.drag_from = event.x()
+
+    def mouseReleaseEvent(self, event):
+        if self.span and self.drag_from is not None and abs(event.x() - self.drag_from) > 5:
+            left, _, w, _ = self.plot_rect()
+            start, end = self.span[:2]
+            x0, x1 = sorted((self.drag_from, event.x()))
+            self.zoom_requested.emit(start + (x0 - left) / w * (end - start), start + (x1 - left) / w * (end - start))
+        self.drag_from = None
+
+class OmivizApp(GradientWidget):
+    append_output_signal = pyqtSignal(str, str)
+    plot_ready = pyqtSignal(object, str)      # Omiviz result or Exception, view kind
+    datasets_changed = pyqtSignal()
+
+    VIEWS = {"Trigger density": "density", "Loudest SNR": "snr", "Triggers (decimated)": "scatter"}
+
+    def __init__(self, parent, append_output_callback):
+        super().__init__(parent)
+        self.store = TriggerStore()
+        self.omiviz = Omiviz(self.store)
+        self.append_output_signal.connect(append_output_callback)
+        self.plot_ready.connect(self.show_plot)
+        self.datasets_changed.connect(self.refresh_datasets)
+        self.setup_ui()
+        QTimer.singleShot(0, self.refresh_datasets)
+
+    def styled_button(self, text, slot):
+        button = QPushButton(text)
+        button.setFont(FONT_BUTTON)
+        button.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COLOR_ACCENT};
+                color: {COLOR_FG};
+                border: 1px solid {COLOR_FG};
+                border-radius: 5px;
+                padding: 6px;
+                min-height: 28px;
+            }}
+            QPushButton:hover {{
+                background-color: {COLOR_HOVER};
+            }}
+        """)
+        button.clicked.connect(slot)
+        return button
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        layout.setSpacing(8)
+        field_style = f"border: 1px solid {COLOR_FG}; border-radius: 5px; padding: 4px; background-color: #747576; color: {COLOR_FG};"
+
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Triggers:", font=FONT_LABEL, styleSheet=f"color: {COLOR_FG}; background-color: transparent;"))
+        self.dataset_combo = QComboBox()
+        self.dataset_combo.setStyleSheet(field_style)
+        row.addWidget(self.dataset_combo, 3)
+        self.view_combo = QComboBox()
+        self.view_combo.addItems(list(self.VIEWS))
+        self.view_combo.setStyleSheet(field_style)
+        self.view_combo.currentIndexChanged.connect(self.plot)
+        row.addWidget(self.view_combo, 2)
+        row.addWidget(self.styled_button("Import Triggers", self.import_triggers))
+        layout.addLayout(row)
+
+        row = QHBoxLayout()
+        self.range_fields = {}
+        for key, placeholder in (("start", "Start GPS"), ("end", "End GPS"),
+                                 ("fmin", "Min frequency (Hz)"), ("fmax", "Max frequency (Hz)")):
+            field = QLineEdit()
+            field.setPlaceholderText(placeholder)
+            field.setStyleSheet(field_style)
+            field.returnPressed.connect(self.plot)
+            self.range_fields[key] = field
+            row.addWidget(field)
+        row.addWidget(self.styled_button("Plot", self.plot))
+        row.addWidget(self.styled_button("Full Span", self.reset_zoom))
+        layout.addLayout(row)
+
+        self.plot_widget = TriggerPlotWidget()
+        self.plot_widget.zoom_requested.connect(self.zoom)
+        layout.addWidget(self.plot_widget, 1)
+        self.status_label = QLabel("", styleSheet=f"color: {COLOR_FG}; background-color: transparent;")
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+    def refresh_datasets(self):
+        current = self.dataset_combo.currentData()
+        self.dataset_combo.clear()
+        for d in self.store.datasets():
+            self.dataset_combo.addItem(f"{d['channel']} (config {d['config']}, {d['count']} triggers)",
+                                       (d["channel"], d["config"]))
+        if self.dataset_combo.count() == 0:
+            self.dataset_combo.addItem("No indexed triggers - import an Omicron output directory", None)
+        elif current is not None:
+            index = self.dataset_combo.findData(current)
+            if index >= 0:
+                self.dataset_combo.setCurrentIndex(index)
+
+    def range_value(self, key):
+        text = self.range_fields[key].text().strip()
+        try:
+            return float(text) if text else None
+        except ValueError:
+            self.append_output_signal.emit(f"Ignoring invalid {key}: {text}", "warning")
+            return None
+
+    def plot(self):
+        dataset = self.dataset_combo.currentData()
+        if dataset is None:
+            return
+        channel, config = dataset
+        kind = self.VIEWS[self.view_combo.currentText()]
+        start, end, fmin, fmax = (self.range_value(k) for k in ("start", "end", "fmin", "fmax"))
+        bins = max(100, self.plot_widget.width() - TriggerPlotWidget.MARGIN_LEFT - TriggerPlotWidget.MARGIN_RIGHT)
+        self.status_label.setText("Loading...")
+
+        def work():
+            began = time.time()
+            try:
+                if kind == "scatter":
+                    result = self.omiviz.scatter(channel, config, start, end, 4000, None, fmin, fmax)
+                    result.update(start=start, end=end)
+                else:
+                    result = self.omiviz.tiles(channel, config, start, end, bins, fmin, fmax)
+                result.update(fmin=fmin, fmax=fmax, elapsed=time.time() - began)
+            except Exception as e:
+                result = e
+            self.plot_ready.emit(result, kind)
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def show_plot(self, result, kind):
+        if isinstance(result, Exception):
+            self.status_label.setText("Plot failed")
+            self.append_output_signal.emit(f"Omiviz error: {result}", "error")
+            return
+        self.plot_widget.set_data(result, kind)
+        if kind == "scatter":
+            summary = f"{len(result['time'])} of {result['total']} triggers"
+        else:
+            summary = f"{sum(result['count'])} triggers in bins of {result['width']:.1f} s"
+        self.status_label.setText(f"{summary} - {result['elapsed'] * 1000:.0f} ms")
+
+    def zoom(self, start, end):
+        self.range_fields["start"].setText(f"{math.floor(start)}")
+        self.range_fields["end"].setText(f"{math.ceil(end)}")
+        self.plot()
+
+    def reset_zoom(self):
+        self.range_fields["start"].clear()
+        self.range_fields["end"].clear()
+        self.plot()
+
+    def import_triggers(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Omicron Output Directory", "./OmicronOut")
+        if not directory:
+            return
+        # Omicron writes each channel's triggers under a directory named after it
+        channel = os.path.basename(os.path.normpath(directory))
+        if ":" not in channel:
+            channel, ok = QInputDialog.getText(self, "Channel", "Channel these triggers belong to (e.g. H1:GDS-CALIB_STRAIN):")
+            if not ok or not channel.strip():
+                return
+            channel = channel.strip()
+
+        def work():
+            try:
+                self.append_output_signal.emit(f"Importing triggers for {channel} from {directory}...", "info")
+                count = self.store.ingest_source(directory, None, channel)
+                if count:
+                    self.omiviz.precompute(channel, "default")
+                    self.append_output_signal.emit(f"Imported {count} triggers for {channel}", "success")
+                else:
+                    self.append_output_signal.emit(f"No Omicron trigger files found in {directory}", "warning")
+                self.datasets_changed.emit()
+            except Exception as e:
+                self.append_output_signal.emit(f"Error importing triggers: {e}", "error")
+
+        threading.Thread(target=work, daemon=True).start()
+
 ########################################################################################################################################
 ##########################################################################################################################################
 ########################################################################################################################################
@@ -2661,15 +3110,25 @@ def run_cli_interactive():
 
     # Prompt for tab selection
     while True:
-        print(f"{COLORS['blue']}Select a tab to run (gravfetch, omicron, omiviz):{COLORS['reset']}")
+        print(f"{COLORS['blue']}Select a tab to run (gravfetch, omicron, omiviz, triggers):{COLORS['reset']}")
         tab = input().strip().lower()
-        if tab in ["gravfetch", "omicron", "omiviz"]:
+        if tab in ["gravfetch", "omicron", "omiviz", "triggers"]:
             break
-        print(f"{COLORS['red']}Invalid tab. Please choose 'gravfetch', 'omicron', or 'omiviz'.{COLORS['reset']}")
+        print(f"{COLORS['red']}Invalid tab. Please choose 'gravfetch', 'omicron', 'omiviz', or 'triggers'.{COLORS['reset']}")
 
     if tab == "omiviz":
-        print(f"{COLORS['yellow']}Omiviz is not implemented yet. Exiting.{COLORS['reset']}")
-        logging.warning("Omiviz tab selected but not implemented")
+        print(f"{COLORS['blue']}Enter channel (e.g., H1:GDS-CALIB_STRAIN):{COLORS['reset']}")
+        channel = input().strip()
+        print(f"{COLORS['blue']}Omicron output directory to import first (empty to use indexed triggers):{COLORS['reset']}")
+        trigger_dir = input().strip() or None
+        print(f"{COLORS['blue']}Start and end GPS time, e.g. 1262304000 1262390400 (empty for all):{COLORS['reset']}")
+        try:
+            start, end = (float(x) for x in input().split())
+        except ValueError:
+            start, end = None, None
+        args = argparse.Namespace(tab="omiviz", channel=channel, config_hash=None, trigger_store=TRIGGER_STORE_DIR,
+                                  trigger_dir=trigger_dir, start=start, end=end, fmin=None, fmax=None, output_dir=None)
+        run_cli(args)
         return
 
     if tab == "gravfetch":
@@ -2723,7 +3182,7 @@ def run_cli_interactive():
             print(f"  Time CSV: {time_csv}")
             print(f"  Output Directory: {output_dir}")
             print(f"  Segments: {', '.join(segments)}")
-            args = argparse.Namespace(tab="gravfetch", time_csv=time_csv, channel=channel, output_dir=output_dir, segments=",".join(segments), ffl_file=None)
+            args = argparse.Namespace(tab="gravfetch", time_csv=time_csv, channel=channel, output_dir=output_dir, segments=",".join(segments), ffl_file=None, workers=None)
             run_cli(args)
 
     elif tab == "omicron":
@@ -2745,9 +3204,72 @@ def run_cli_interactive():
 
         print(f"{COLORS['blue']}Running Omicron with the following parameters:{COLORS['reset']}")
         print(f"  FFL File: {ffl_file}")
-        args = argparse.Namespace(tab="omicron", time_csv=None, channel=None, output_dir=None, segments=None, ffl_file=ffl_file)
+        args = argparse.Namespace(tab="omicron", time_csv=None, channel=None, output_dir=None, segments=None, ffl_file=ffl_file, workers=None, sweep=None)
         run_cli(args)
 
+    elif tab == "triggers":
+        def ask(prompt):
+            print(f"{COLORS['blue']}{prompt}{COLORS['reset']}")
+            while True:
+                value = input().strip()
+                if not value:
+                    return None
+                try:
+                    return float(value)
+                except ValueError:
+                    print(f"{COLORS['red']}Please enter a number, or leave empty to skip.{COLORS['reset']}")
+
+        print(f"{COLORS['blue']}Enter channel (e.g., H1:GDS-CALIB_STRAIN):{COLORS['reset']}")
+        channel = input().strip()
+        args = argparse.Namespace(tab="triggers", channel=channel, config_hash=None, trigger_store=TRIGGER_STORE_DIR,
+                                  start=ask("Start GPS time (empty for all):"), end=ask("End GPS time (empty for all):"),
+                                  snr_min=ask("Minimum SNR (empty for none):"), snr_max=None,
+                                  fmin=ask("Minimum frequency in Hz (empty for none):"),
+                                  fmax=ask("Maximum frequency in Hz (empty for none):"),
+                                  order="time", offset=0, limit=50)
+        run_cli(args)
+
+OMIVIZ_SHADES = " .:-=+*#%@"
+
+def print_omiviz(tiles, rows=16):
+    """Trigger density as a character map: time left to right, frequency bottom to top."""
+    if not tiles["time"]:
+        print(f"{COLORS['yellow']}No triggers in this range.{COLORS['reset']}")
+        return
+    edges = tiles["freq_edges"]
+    low, high = min(tiles["freq"]), max(tiles["freq"]) + 1
+    per_row = max(1, math.ceil((high - low) / rows))
+    columns = max(1, round((tiles["end"] - tiles["start"]) / tiles["width"]))
+    grid = [[0] * columns for _ in range(math.ceil((high - low) / per_row))]
+    for t, f, n in zip(tiles["time"], tiles["freq"], tiles["count"]):
+        column = min(columns - 1, max(0, int((t - tiles["start"]) / tiles["width"])))
+        grid[(f - low) // per_row][column] += n
+    top = math.log10(max(max(row) for row in grid) + 1)
+    for i in reversed(range(len(grid))):
+        label = f"{edges[low + i * per_row]:>8.1f} Hz |"
+        cells = "".join(OMIVIZ_SHADES[min(len(OMIVIZ_SHADES) - 1, int(math.log10(n + 1) / top * (len(OMIVIZ_SHADES) - 1) + 0.999))]
+                        for n in grid[i])
+        print(f"{COLORS['blue']}{label}{COLORS['reset']}{cells}")
+    print(f"{' ' * 12}+{'-' * columns}")
+    print(f"{' ' * 12} GPS {tiles['start']:.0f} - {tiles['end']:.0f}, {tiles['width']:.0f} s per column, "
+          f"{sum(tiles['count'])} triggers")
+
+def print_triggers(result):
+    shown = len(result["triggers"])
+    print(f"{COLORS['green']}{result['total']} triggers for {result['channel']} (config {result['config']}), "
+          f"showing {result['offset'] + 1 if shown else 0}-{result['offset'] + shown}{COLORS['reset']}")
+    if not shown:
+        return
+    print(f"{'time':>18} {'frequency':>10} {'snr':>8} {'q':>8} {'duration':>9}")
+    for row in result["triggers"]:
+        values = [row["time"], row["frequency"], row["snr"], row["q"], row["duration"]]
+        cells = ["-" if v is None else f"{v:.{p}f}" for v, p in zip(values, (3, 2, 2, 2, 3))]
+        print(f"{cells[0]:>18} {cells[1]:>10} {cells[2]:>8} {cells[3]:>8} {cells[4]:>9}")
+
+def print_resources(usage):
+    logging.info(f"Resources: {format_usage(usage)}")
+    print(f"{COLORS['green']}Resources: {format_usage(usage)}{COLORS['reset']}")
+
 def run_cli(args):
     if args.tab == "gravfetch":
         logging.info(f"Running Gravfetch in CLI mode for channel: {args.channel}")
@@ -2808,46 +3330,117 @@ def run_cli(args):
                 logging.error("Invalid .ffl file format.")
                 print(f"{COLORS['red']}Invalid .ffl file format.{COLORS['reset']}")
                 return
-            first_time_segment = lines[0][1]
-            last_time_segment = lines[-1][1]
-            omicron_cmd = f"omicron {first_time_segment} {last_time_segment} ./config.txt > omicron.out 2>&1"
-            logging.info(f"Running: {omicron_cmd}")
-            print(f"{COLORS['blue']}Running: {omicron_cmd}{COLORS['reset']}")
-            process = subprocess.Popen(omicron_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            while True:
-                output = process.stdout.readline()
-                if output == "" and process.poll() is not None:
-                    break
-                if output:
-                    logging.info(output.strip())
-                    print(f"{COLORS['blue']}{output.strip()}{COLORS['reset']}")
-            while True:
-                error = process.stderr.readline()
-                if error == "" and process.poll() is not None:
-                    break
-                if error:
-                    logging.error(f"ERROR: {error.strip()}")
-                    print(f"{COLORS['red']}ERROR: {error.strip()}{COLORS['reset']}")
-            process.wait()
-            if process.returncode != 0:
-                logging.error(f"Command failed with return code {process.returncode}.")
-                print(f"{COLORS['red']}Command failed with return code {process.returncode}.{COLORS['reset']}")
+            if args.sweep:
+                grid = {}
+                for spec in args.sweep:
+                    name, _, values = spec.partition("=")
+                    grid[name.strip()] = parse_sweep_values(values)
+                with monitor_resources(print_resources):
+                    for line in run_omicron_sweep(args.ffl_file, "./config.txt", grid, workers=args.workers):
+                        logging.info(line)
+                        color = COLORS['red'] if line.startswith("[ERROR]") else COLORS['blue']
+                        print(f"{color}{line}{COLORS['reset']}")
+                return
+            if args.workers:
+                with monitor_resources(print_resources):
+                    for line in run_omicron_parallel(args.ffl_file, "./config.txt", workers=args.workers):
+                        logging.info(line)
+                        color = COLORS['red'] if line.startswith("[ERROR]") else COLORS['blue']
+                        print(f"{color}{line}{COLORS['reset']}")
+                return
+            # One omicron per contiguous block of the FFL, so no time goes to the gaps
+            config = OmicronConfig.read("./config.txt")
+            failed = False
+            with monitor_resources(print_resources):
+                for line in run_omicron(args.ffl_file, config, config.get("OUTPUT DIRECTORY") or "OmicronOut"):
+                    failed = failed or line.startswith("[ERROR]")
+                    logging.info(line)
+                    color = COLORS['red'] if line.startswith("[ERROR]") else COLORS['blue']
+                    print(f"{color}{line}{COLORS['reset']}")
+            if failed:
+                logging.error("OMICRON run failed.")
+                print(f"{COLORS['red']}OMICRON run failed.{COLORS['reset']}")
             else:
                 logging.info("OMICRON process completed successfully.")
                 print(f"{COLORS['green']}OMICRON process completed successfully.{COLORS['reset']}")
         except Exception as e:
             logging.error(f"Unexpected error: {e}")
             print(f"{COLORS['red']}Unexpected error: {e}{COLORS['reset']}")
+    elif args.tab == "omiviz":
+        if not args.channel:
+            print(f"{COLORS['red']}Missing required argument: channel{COLORS['reset']}")
+            return
+        store = TriggerStore(args.trigger_store)
+        omiviz = Omiviz(store)
+        config = args.config_hash
+        try:
+            if args.trigger_dir:
+                print(f"{COLORS['blue']}Importing triggers for {args.channel} from {args.trigger_dir}...{COLORS['reset']}")
+                config = config or "default"
+                count = store.ingest_source(args.trigger_dir, None, args.channel, config)
+                print(f"{COLORS['green']}Imported {count} triggers.{COLORS['reset']}")
+            if not store.configs(args.channel):
+                print(f"{COLORS['yellow']}No indexed triggers for {args.channel} in {args.trigger_store}. "
+                      f"Import an Omicron output directory with --trigger_dir.{COLORS['reset']}")
+                return
+            omiviz.precompute(args.channel, config)
+            tiles = omiviz.tiles(args.channel, config, args.start, args.end, 100, args.fmin, args.fmax)
+            print_omiviz(tiles)
+            print_triggers(store.query(args.channel, config, args.start, args.end, fmin=args.fmin, fmax=args.fmax,
+                                       limit=10, order="snr"))
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+                scatter = omiviz.scatter(args.channel, config, args.start, args.end, 4000, None, args.fmin, args.fmax)
+                tiles = omiviz.tiles(args.channel, config, args.start, args.end, 1000, args.fmin, args.fmax)
+                for name, data in (("tiles", tiles), ("scatter", scatter)):
+                    path = os.path.join(args.output_dir, f"omiviz_{args.channel.replace(':', '_')}_{name}.json")
+                    with open(path, "w") as f:
+                        json.dump(data, f)
+                    print(f"{COLORS['green']}Saved {path}{COLORS['reset']}")
+        except Exception as e:
+            logging.error(f"Omiviz error: {e}")
+            print(f"{COLORS['red']}Omiviz error: {e}{COLORS['reset']}")
+    elif args.tab == "triggers":
+        if not args.channel:
+            print(f"{COLORS['red']}Missing required argument: channel{COLORS['reset']}")
+            return
+        store = TriggerStore(args.trigger_store)
+        if not store.configs(args.channel):
+            print(f"{COLORS['yellow']}No indexed triggers for {args.channel} in {args.trigger_store}. "
+                  f"Triggers are indexed when an Omicron run from the web app finishes.{COLORS['reset']}")
+            return
+        try:
+            result = store.query(args.channel, args.config_hash, args.start, args.end, args.snr_min, args.snr_max,
+                                 args.fmin, args.fmax, args.offset, args.limit, args.order)
+        except ValueError as e:
+            print(f"{COLORS['red']}{e}{COLORS['reset']}")
+            return
+        print_triggers(result)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="GWeasy CLI")
     parser.add_argument("--cli", action="store_true", help="Run in CLI mode")
-    parser.add_argument("--tab", choices=["gravfetch", "omicron", "omiviz"], help="Specify tab to run")
+    parser.add_argument("--tab", choices=["gravfetch", "omicron", "omiviz", "triggers"], help="Specify tab to run")
     parser.add_argument("--time_csv", help="Path to time CSV file")
-    parser.add_argument("--channel", help="Channel to fetch")
-    parser.add_argument("--output_dir", help="Output directory")
+    parser.add_argument("--channel", help="Channel to fetch (or to query with --tab triggers)")
+    parser.add_argument("--output_dir", help="Output directory (with --tab omiviz: where to save plot data as JSON)")
     parser.add_argument("--segments", help="Comma-separated list of segments (e.g., start1_end1,start2_end2)")
     parser.add_argument("--ffl_file", help="Path to .ffl file for Omicron")
+    parser.add_argument("--workers", type=int, help="Run Omicron as this many parallel processes over chunks of the FFL span")
+    parser.add_argument("--sweep", action="append", metavar="PARAM=VALUES",
+                        help="Sweep an Omicron parameter, e.g. snr_threshold=6:8:1 or q_range='4 100,4 64' (repeatable)")
+    parser.add_argument("--trigger_store", default=TRIGGER_STORE_DIR, help="Trigger store to query with --tab triggers or omiviz")
+    parser.add_argument("--trigger_dir", help="Omicron output directory to import before plotting with --tab omiviz")
+    parser.add_argument("--config_hash", help="Omicron config digest to query (default: most recently indexed)")
+    parser.add_argument("--start", type=float, help="Only triggers at or after this GPS time")
+    parser.add_argument("--end", type=float, help="Only triggers before this GPS time")
+    parser.add_argument("--snr_min", type=float, help="Minimum trigger SNR")
+    parser.add_argument("--snr_max", type=float, help="Maximum trigger SNR")
+    parser.add_argument("--fmin", type=float, help="Minimum trigger frequency (Hz)")
+    parser.add_argument("--fmax", type=float, help="Maximum trigger frequency (Hz)")
+    parser.add_argument("--order", choices=["time", "snr"], default="time", help="Sort triggers by time or loudest first")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many matching triggers")
+    parser.add_argument("--limit", type=int, default=50, help="Show at most this many triggers")
     args = parser.parse_args()
 
     if args.cli:
@@ -2857,8 +3450,12 @@ if __name__ == "__main__":
             run_cli_interactive()
     else:
         app = QApplication(sys.argv)
-        splash = SplashScreen(lambda: MainWindow().show())
+        splash = SplashScreen()
         splash.show()
+        app.processEvents()
+        window = MainWindow()
+        window.ready.connect(splash.close)
+        window.show()
         sys.exit(app.exec_())
 
 
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Lets `pytest` run from the repository root import the core package.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
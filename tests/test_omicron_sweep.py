@@ -0,0 +1,52 @@
+import pytest
+
+from core.omicron_config import OmicronConfig
+from core.omicron_sweep import MAX_SWEEP_RUNS, expand_grid, parse_sweep_values, sweep_values
+
+CONFIG = OmicronConfig.parse("""
+DATA CHANNELS H1:X
+PARAMETER SNRTHRESHOLD 7
+PARAMETER QRANGE 4 128
+""")
+
+
+def test_parse_sweep_values_lists_and_ranges():
+    assert parse_sweep_values("6, 7, 8") == ["6", "7", "8"]
+    assert parse_sweep_values("4  100, 4 64") == ["4 100", "4 64"]
+    assert parse_sweep_values("5:6.5:0.5") == ["5", "5.5", "6", "6.5"]
+    assert parse_sweep_values("1:3") == ["1", "2", "3"]
+    assert parse_sweep_values("0.1:0.3:0.1, 9") == ["0.1", "0.2", "0.3", "9"]
+    assert parse_sweep_values(" , ") == []
+
+
+def test_parse_sweep_values_rejects_bad_step():
+    with pytest.raises(ValueError):
+        parse_sweep_values("1:5:0")
+
+
+def test_sweep_values_accepts_structured_entries():
+    assert sweep_values({"start": 6, "stop": 8}) == ["6", "7", "8"]
+    assert sweep_values([[4, 100], [4, 64]]) == ["4 100", "4 64"]
+    assert sweep_values(7) == ["7"]
+
+
+def test_expand_grid_every_combination():
+    runs = expand_grid(CONFIG, {"snr_threshold": "6:7", "q_range": [[4, 64], [4, 100]]})
+    assert [params for params, _ in runs] == [
+        {"snr_threshold": "6", "q_range": "4 64"}, {"snr_threshold": "6", "q_range": "4 100"},
+        {"snr_threshold": "7", "q_range": "4 64"}, {"snr_threshold": "7", "q_range": "4 100"},
+    ]
+    _, config = runs[1]
+    assert config.get("PARAMETER SNRTHRESHOLD") == "6"
+    assert config.get("PARAMETER QRANGE") == "4 100"
+    assert config.get("DATA CHANNELS") == "H1:X"
+    assert CONFIG.get("PARAMETER SNRTHRESHOLD") == "7"  # the base config is left alone
+
+
+def test_expand_grid_rejects_empty_unknown_and_oversized_grids():
+    with pytest.raises(ValueError):
+        expand_grid(CONFIG, {"snr_threshold": ""})
+    with pytest.raises(ValueError):
+        expand_grid(CONFIG, {"no_such_parameter": "1, 2"})
+    with pytest.raises(ValueError):
+        expand_grid(CONFIG, {"snr_threshold": f"1:{MAX_SWEEP_RUNS + 1}"})
@@ -0,0 +1,71 @@
+import numpy as np
+
+from core.omiviz import bin_triggers, freq_bins, lttb, merge_tiles
+
+
+def test_lttb_keeps_everything_when_asked_for_more_points():
+    assert lttb(np.arange(5.0), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_small_n_keeps_the_ends():
+    assert lttb(np.arange(10.0), np.ones(10), 2).tolist() == [0, 9]
+    assert lttb(np.arange(10.0), np.ones(10), 0).tolist() == []
+
+
+def test_lttb_picks_one_point_per_bucket_and_keeps_spikes():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[[123, 456, 789]] = [50.0, -40.0, 30.0]
+    rows = lttb(x, y, 20)
+    assert len(rows) == 20
+    assert rows[0] == 0 and rows[-1] == 999
+    assert np.all(np.diff(rows) > 0)
+    assert {123, 456, 789} <= set(rows.tolist())
+
+
+def test_lttb_ignores_nan():
+    y = np.ones(100)
+    y[10] = np.nan
+    assert len(lttb(np.arange(100.0), y, 10)) == 10
+
+
+def test_bin_triggers_counts_and_loudest_snr_per_tile():
+    time = np.array([0.5, 1.5, 2.5, 12.0, 12.5])
+    frequency = np.array([100.0, 100.0, 1000.0, 100.0, 100.0])
+    snr = np.array([6.0, 9.0, 7.0, 8.0, np.nan])
+    tiles = bin_triggers(time, frequency, snr, width=10.0)
+    f100, f1000 = int(freq_bins(100.0)), int(freq_bins(1000.0))
+    got = {(int(t), int(f)): (int(c), float(s))
+           for t, f, c, s in zip(tiles["time"], tiles["freq"], tiles["count"], tiles["snr"])}
+    assert got == {(0, f100): (2, 9.0), (0, f1000): (1, 7.0), (1, f100): (2, 8.0)}
+
+
+def test_bin_triggers_origin_and_invalid_frequencies():
+    tiles = bin_triggers(np.array([105.0, 106.0, 107.0]), np.array([50.0, 0.0, np.nan]),
+                         np.array([7.0, 8.0, 9.0]), width=2.0, origin=100.0)
+    assert tiles["time"].tolist() == [2]
+    assert tiles["count"].tolist() == [1]
+
+
+def test_bin_triggers_empty():
+    tiles = bin_triggers(np.array([]), np.array([]), np.array([]), width=1.0)
+    assert all(len(values) == 0 for values in tiles.values())
+
+
+def test_merge_tiles_combines_a_bin_split_across_partitions():
+    a = {"time": np.array([3, 4]), "freq": np.array([1, 1], np.uint8),
+         "count": np.array([2, 5], np.uint32), "snr": np.array([6.0, 7.0], np.float32)}
+    b = {"time": np.array([4, 9]), "freq": np.array([1, 2], np.uint8),
+         "count": np.array([3, 1], np.uint32), "snr": np.array([11.0, 5.0], np.float32)}
+    tiles = merge_tiles([a, b])
+    assert tiles["time"].tolist() == [3, 4, 9]
+    assert tiles["freq"].tolist() == [1, 1, 2]
+    assert tiles["count"].tolist() == [2, 8, 1]
+    assert tiles["snr"].tolist() == [6.0, 11.0, 5.0]
+
+
+def test_merge_tiles_single_and_empty():
+    part = bin_triggers(np.array([1.0]), np.array([10.0]), np.array([8.0]), width=1.0)
+    assert merge_tiles([part]) is part
+    empty = merge_tiles([])
+    assert all(len(values) == 0 for values in empty.values())
@@ -0,0 +1,58 @@
+import pytest
+
+from core.resources import ResourceMonitor, format_usage, percentile, summarize
+
+
+def test_percentile_interpolates_and_skips_none():
+    assert percentile([], 50) is None
+    assert percentile([None], 50) is None
+    assert percentile([4], 99) == 4
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([10, None, 0], 90) == pytest.approx(9.0)
+    assert percentile([3, 1, 2], 0) == 1 and percentile([3, 1, 2], 100) == 3
+
+
+def test_summarize_groups_and_normalises_per_data_hour():
+    records = [
+        {"kind": "omicron", "channel": "H1:X", "data_seconds": 3600, "wall_s": 10.0, "cpu_s": 20.0},
+        {"kind": "omicron", "channel": "H1:X", "data_seconds": 7200, "wall_s": 30.0, "cpu_s": None},
+        {"kind": "nds", "channel": "H1:X", "wall_s": 5.0},
+    ]
+    rows = {row["kind"]: row for row in summarize(records)}
+    assert set(rows) == {"omicron", "nds"}
+    omicron = rows["omicron"]
+    assert omicron["jobs"] == 2 and omicron["data_hours"] == 3.0
+    assert omicron["wall_s"] == {"p50": 20.0, "p90": 28.0, "p99": 29.8, "max": 30.0}
+    assert omicron["cpu_s"]["max"] == 20.0
+    assert omicron["per_data_hour"]["wall_s"]["max"] == 15.0
+    assert omicron["per_data_hour"]["cpu_s"]["p50"] == 20.0
+    nds = rows["nds"]
+    assert nds["data_hours"] == 0 and nds["per_data_hour"]["wall_s"]["p50"] is None
+    assert nds["rss_peak_bytes"]["max"] is None
+
+
+def test_summarize_by_several_keys():
+    records = [{"kind": "omicron", "channel": c, "wall_s": 1.0} for c in ("H1:A", "L1:B", "H1:A")]
+    rows = summarize(records, by=("kind", "channel"))
+    assert [(row["channel"], row["jobs"]) for row in rows] == [("H1:A", 2), ("L1:B", 1)]
+
+
+def test_reaped_children_are_not_counted_twice():
+    # The shell (1) ran two children; 2 was reaped before the shell's last sample,
+    # so the shell's counters already include it, while 3 was still running then
+    processes = {
+        (1, "t1"): {"cpu": (5.0, 1.0), "io": {"wchar": 700}, "parent": (0, "t0"), "seen": 4},
+        (2, "t2"): {"cpu": (3.0, 0.5), "io": {"wchar": 500}, "parent": (1, "t1"), "seen": 2},
+        (3, "t3"): {"cpu": (2.0, 0.0), "io": {"wchar": 50}, "parent": (1, "t1"), "seen": 4},
+    }
+    own = ResourceMonitor()._own_usage(processes)
+    assert own[(1, "t1")] == ((2.0, 0.5), {"wchar": 200})
+    assert sum(cpu[0] + cpu[1] for cpu, _ in own.values()) == pytest.approx(8.0)
+    assert sum(io["wchar"] for _, io in own.values()) == 750
+
+
+def test_format_usage():
+    assert format_usage({"wall_s": 1.5}) == "wall 1.5 s"
+    line = format_usage({"wall_s": 2.0, "cpu_s": 3.0, "rss_peak_bytes": 2 * 1024 ** 2,
+                         "read_bytes": 0, "write_bytes": 1024 ** 2})
+    assert line == "wall 2.0 s, CPU 3.0 s, peak RSS 2 MiB, read 0 MiB, written 1 MiB"
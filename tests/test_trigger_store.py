@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from core.trigger_store import PARTITION_SECONDS, TriggerStore, outside_spans
+
+
+def columns(times, snr=8.0, frequency=100.0):
+    times = np.asarray(times, dtype=float)
+    return {"time": times,
+            "frequency": np.broadcast_to(np.asarray(frequency, dtype=float), times.shape).copy(),
+            "snr": np.broadcast_to(np.asarray(snr, dtype=float), times.shape).copy(),
+            "q": np.ones(len(times)), "duration": np.ones(len(times))}
+
+
+def times(result):
+    return [trigger["time"] for trigger in result["triggers"]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TriggerStore(str(tmp_path))
+
+
+def test_outside_spans():
+    keep = outside_spans(np.array([5.0, 100.0, 150.0, 250.0, 300.0]), [(0, 100), (200, 300)])
+    assert keep.tolist() == [False, True, True, False, True]
+
+
+def test_query_orders_pages_and_filters(store):
+    store.ingest(columns([30.0, 10.0, 20.0, 40.0], snr=[5.0, 9.0, 7.0, 6.0],
+                         frequency=[50.0, 100.0, 200.0, 400.0]), "H1:X", "c")
+    assert times(store.query("H1:X", "c")) == [10.0, 20.0, 30.0, 40.0]
+    page = store.query("H1:X", "c", offset=1, limit=2)
+    assert page["total"] == 4 and times(page) == [20.0, 30.0]
+    assert times(store.query("H1:X", "c", order="snr")) == [10.0, 20.0, 40.0, 30.0]
+    assert times(store.query("H1:X", "c", start=15, end=40)) == [20.0, 30.0]
+    assert times(store.query("H1:X", "c", snr_min=6, fmax=200)) == [10.0, 20.0]
+    with pytest.raises(ValueError):
+        store.query("H1:X", "c", order="frequency")
+
+
+def test_query_spans_partitions(store):
+    store.ingest(columns([PARTITION_SECONDS * 2 + 1.0, 1.0, PARTITION_SECONDS + 1.0]), "H1:X", "c")
+    assert len(store.index("H1:X", "c")["partitions"]) == 3
+    result = store.query("H1:X", "c", offset=1, limit=5)
+    assert result["total"] == 3
+    assert times(result) == [PARTITION_SECONDS + 1.0, PARTITION_SECONDS * 2 + 1.0]
+    assert store.count("H1:X", "c", start=PARTITION_SECONDS) == 2
+
+
+def test_ingest_replaces_only_inside_spans(store):
+    store.ingest(columns([10.0, 50.0, 150.0, 250.0]), "H1:X", "c")
+    store.ingest(columns([15.0]), "H1:X", "c", spans=[(0, 100), (200, 300)])
+    # 150 sits in the gap between the analysed spans, so it survives
+    assert times(store.query("H1:X", "c")) == [15.0, 150.0]
+
+
+def test_ingest_twice_does_not_duplicate(store):
+    store.ingest(columns([10.0, 20.0]), "H1:X", "c", spans=[(0, 100)])
+    store.ingest(columns([10.0, 20.0]), "H1:X", "c", spans=[(0, 100)])
+    assert store.query("H1:X", "c")["total"] == 2
+
+
+def test_ingest_without_spans_replaces_dataset(store):
+    store.ingest(columns([10.0, PARTITION_SECONDS + 10.0]), "H1:X", "c")
+    store.ingest(columns([20.0]), "H1:X", "c")
+    assert times(store.query("H1:X", "c")) == [20.0]
+    assert list(store.index("H1:X", "c")["partitions"]) == ["0"]
+
+
+def test_query_sees_rewritten_partition(store):
+    store.ingest(columns([10.0]), "H1:X", "c")
+    assert times(store.query("H1:X", "c")) == [10.0]
+    store.ingest(columns([11.0, 12.0]), "H1:X", "c")
+    assert times(store.query("H1:X", "c")) == [11.0, 12.0]
+
+
+def test_query_without_config_uses_latest_dataset(store):
+    store.ingest(columns([10.0]), "H1:X", "old")
+    store.ingest(columns([20.0]), "H1:X", "new")
+    os.utime(os.path.join(store.dataset_dir("H1:X", "old"), "index.json"), (1, 1))
+    result = store.query("H1:X")
+    assert result["config"] == "new" and times(result) == [20.0]